@@ -0,0 +1,114 @@
+"""
+Benchmark file discovery on a synthetic library.
+
+Compares `juicenet.utils.get_files` against the old approach of running
+one `Path.rglob()` per extension, reporting how many directory listings
+(`os.scandir` calls) and how much wall time each one takes.
+
+Usage:
+
+```shell
+uv run python benchmarks/bench_discovery.py [--entries 100000] [--repeat 3]
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+from natsort import natsorted
+
+from juicenet.utils import get_files
+
+EXTENSIONS = ["mkv", "epub", "cbr", "cbz", "cb7", "cbt"]
+NOISE = ["srt", "ass", "nfo", "jpg", "txt", "MKV"]
+
+
+def make_library(root: Path, entries: int) -> None:
+    """
+    Create a library with roughly `entries` files and folders, 25 files per season folder
+    """
+    suffixes = EXTENSIONS + NOISE
+    created = 0
+    show = 0
+
+    while created < entries:
+        season = root / f"Show {show // 10:04d}" / f"Season {show % 10:02d}"
+        season.mkdir(parents=True)
+        created += 2
+
+        for episode in range(25):
+            suffix = suffixes[episode % len(suffixes)]
+            (season / f"Show {show:04d} - S01E{episode:02d}.{suffix}").touch()
+
+        created += 25
+        show += 1
+
+
+def rglob_per_extension(path: Path, exts: list[str]) -> list[Path]:
+    """
+    The previous implementation of `get_files`, one full walk per extension
+    """
+    files = []
+
+    for ext in exts:
+        files.extend(path.rglob(f"*.{ext.strip('.')}"))
+
+    return natsorted(files)
+
+
+@contextmanager
+def count_scandir() -> Iterator[list[int]]:
+    """
+    Count every `os.scandir` call made inside the block
+    """
+    counter = [0]
+    original = os.scandir
+
+    def scandir(*args, **kwargs):  # type: ignore[no-untyped-def]
+        counter[0] += 1
+        return original(*args, **kwargs)
+
+    os.scandir = scandir  # type: ignore[assignment]
+    try:
+        yield counter
+    finally:
+        os.scandir = original
+
+
+def bench(name: str, func: Callable[[Path, list[str]], list[Path]], root: Path, repeat: int) -> None:
+    timings = []
+
+    for _ in range(repeat):
+        with count_scandir() as counter:
+            start = time.perf_counter()
+            found = func(root, EXTENSIONS)
+            timings.append(time.perf_counter() - start)
+
+    print(f"{name:<22} files={len(found):<8} listings={counter[0]:<8} best={min(timings):.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=100_000, help="approximate number of files and folders")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix=".JUICENET_BENCH_") as tmp:
+        root = Path(tmp)
+        make_library(root, args.entries)
+        print(f"Library: {args.entries} entries, extensions: {EXTENSIONS}")
+
+        bench("rglob per extension", rglob_per_extension, root, args.repeat)
+        bench("get_files", get_files, root, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Benchmark juicenet's own orchestration overhead with stub ParPar and Nyuu executables.
+
+The stubs are tiny POSIX shell scripts that write a plausible `.par2` set and NZB
+and exit right away, so no network, CPU heavy par2 generation, or real uploads are involved.
+Time spent waiting on the stubs is measured separately and subtracted from the wall time,
+which leaves the time spent in Python: discovery, resume, scheduling, progress, and bookkeeping.
+
+Scenarios:
+
+- `episodes`: `juicenet.main.main()` over a library of `--episodes` files
+- `bdmv`: `main(bdmv=True)` over `--discs` deep BDMV trees
+- `resume`: `main()` over the same library with `--history` unrelated resume entries
+  plus the first half of the library already uploaded
+- `juicenet`: `juicenet()` called once per file for the first `--api-files` files
+- `session`: `JuicenetSession.upload_many()` over the same files
+
+Usage (POSIX only, the stubs need `/bin/sh`):
+
+```shell
+uv run python benchmarks/bench_orchestration.py [--episodes 10000] [--discs 200] [--history 100000] [--api-files 1000]
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import stat
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable
+
+import yaml
+
+import juicenet.main
+import juicenet.nyuu
+import juicenet.parpar
+from juicenet import JuicenetSession, get_files
+from juicenet import juicenet as juicenet_api
+from juicenet.api.main import console as api_console
+from juicenet.main import main as juicenet_main
+from juicenet.resume import Resume
+
+PARPAR_STUB = r"""#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --out) out="$2"; shift ;;
+    esac
+    shift
+done
+printf 'PAR2\000PKT' > "$out.par2"
+printf 'PAR2\000PKT' > "$out.vol00+01.par2"
+printf 'Calculating: 100.00%%\n' >&2
+"""
+
+NYUU_STUB = r"""#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --out) out="$2"; shift ;;
+    esac
+    shift
+done
+printf '<?xml version="1.0" encoding="UTF-8"?>\n<nzb xmlns="http://www.newzbin.com/DTD/2003/nzb"></nzb>\n' > "$out"
+printf ' 100.00%%\n' >&2
+"""
+
+
+def write_stub(path: Path, script: str) -> Path:
+    path.write_text(script, encoding="utf-8")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def write_config(root: Path) -> Path:
+    """
+    Write a juicenet config pointing at the stubs, with everything kept inside `root`
+    """
+    bin = root / "bin"
+    bin.mkdir()
+
+    for name in ("raw", "nzb", "app", "work"):
+        (root / name).mkdir()
+
+    nyuu_config = root / "nyuu.json"
+    nyuu_config.write_text(json.dumps({"dump-failed-posts": str(root / "raw")}), encoding="utf-8")
+
+    config = root / "juicenet.yaml"
+    data = {
+        "PARPAR": str(write_stub(bin / "parpar", PARPAR_STUB)),
+        "NYUU": str(write_stub(bin / "nyuu", NYUU_STUB)),
+        "NYUU_CONFIG_PRIVATE": str(nyuu_config),
+        "NZB_OUTPUT_PATH": str(root / "nzb"),
+        "APPDATA_DIR_PATH": str(root / "app"),
+        "TEMP_DIR_PATH": str(root / "work"),
+    }
+    config.write_text(yaml.safe_dump(data), encoding="utf-8")
+    return config
+
+
+def make_episodes(root: Path, episodes: int) -> None:
+    """
+    Create a library of `episodes` small files, 25 episodes and a few subtitles per season folder
+    """
+    for episode in range(episodes):
+        show, number = divmod(episode, 25)
+        season = root / f"Show {show // 10:04d}" / f"Season {show % 10:02d}"
+        if number == 0:
+            season.mkdir(parents=True)
+        name = f"Show {show:04d} - S01E{number:02d}"
+        (season / f"{name}.mkv").write_bytes(b"\x1a\x45\xdf\xa3" * 256)
+        if number % 5 == 0:
+            (season / f"{name}.srt").write_text("1\n00:00:00,000 --> 00:00:01,000\nHi\n", encoding="utf-8")
+
+
+def make_bdmvs(root: Path, discs: int) -> None:
+    """
+    Create `discs` BDMV discs, each with the usual deep folder structure.
+    Discs share their names across volumes, so every disc gets a unique size to not trip up resume.
+    """
+    for disc in range(discs):
+        volume, number = divmod(disc, 4)
+        bdmv = root / f"Show {volume // 5:03d}" / f"Vol.{volume % 5 + 1}" / f"DISC_{number + 1:02d}" / "BDMV"
+
+        for folder in ("STREAM", "PLAYLIST", "CLIPINF", "BACKUP/PLAYLIST", "BACKUP/CLIPINF", "AUXDATA", "META/DL"):
+            (bdmv / folder).mkdir(parents=True)
+
+        (bdmv / "index.bdmv").write_bytes(b"INDX0200")
+        (bdmv / "MovieObject.bdmv").write_bytes(b"MOBJ0200")
+
+        for clip in range(8):
+            (bdmv / "STREAM" / f"{clip:05d}.m2ts").write_bytes(b"\x47" * (192 + disc))
+            (bdmv / "CLIPINF" / f"{clip:05d}.clpi").write_bytes(b"HDMV0200")
+            (bdmv / "PLAYLIST" / f"{clip:05d}.mpls").write_bytes(b"MPLS0200")
+
+
+def fill_resume(config: Path, history: int, uploaded: list[Path]) -> None:
+    """
+    Add `history` unrelated entries to the resume database along with every file in `uploaded`
+    """
+    appdata = Path(yaml.safe_load(config.read_text(encoding="utf-8"))["APPDATA_DIR_PATH"])
+    resume = Resume(appdata / "juicenet.resume.sqlite", "private")
+
+    rows = [(f"Unrelated Show {i:07d}.mkv", str(1024 + i), "1", "private") for i in range(history)]
+    resume.db.execute("BEGIN")
+    resume.db.executemany("INSERT OR IGNORE INTO resume VALUES (?, ?, ?, ?)", rows)
+    resume.db.execute("COMMIT")
+
+    for file in uploaded:
+        resume.log_file_info(file)
+
+
+@contextmanager
+def time_subprocesses() -> Iterator[list[float]]:
+    """
+    Measure the time spent waiting on ParPar and Nyuu inside the block
+    """
+    spent = [0.0]
+    patched: list[tuple[Any, Callable[..., Any]]] = []
+
+    for module in (juicenet.parpar, juicenet.nyuu):
+        original = module.run
+
+        def timed(*args: Any, _original: Callable[..., Any] = original, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                spent[0] += time.perf_counter() - start
+
+        module.run = timed  # type: ignore[attr-defined]
+        patched.append((module, original))
+
+    try:
+        yield spent
+    finally:
+        for module, original in patched:
+            module.run = original  # type: ignore[attr-defined]
+
+
+def bench(name: str, files: int, func: Callable[[], object]) -> None:
+    with time_subprocesses() as spent:
+        start = time.perf_counter()
+        func()
+        wall = time.perf_counter() - start
+
+    overhead = wall - spent[0]
+    print(
+        f"{name:<10} files={files:<7} wall={wall:8.2f}s stubs={spent[0]:8.2f}s "
+        f"python={overhead:7.2f}s per-file={overhead / max(files, 1) * 1000:7.3f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--episodes", type=int, default=10_000, help="number of episodes in the library")
+    parser.add_argument("--discs", type=int, default=200, help="number of BDMV discs")
+    parser.add_argument("--history", type=int, default=100_000, help="number of unrelated resume entries")
+    parser.add_argument("--api-files", type=int, default=1_000, help="number of files uploaded through the API")
+    args = parser.parse_args()
+
+    # Keep the progress bars and logs out of the way, they're still rendered and counted
+    juicenet.main.console.quiet = True
+    api_console.quiet = True
+
+    with tempfile.TemporaryDirectory(prefix=".JUICENET_BENCH_") as tmp:
+        root = Path(tmp)
+
+        def fresh(name: str) -> Path:
+            scenario = root / name
+            scenario.mkdir()
+            return write_config(scenario)
+
+        config = fresh("episodes")
+        library = root / "episodes" / "library"
+        make_episodes(library, args.episodes)
+        episodes = get_files(library)
+        print(f"Library: {len(episodes)} episodes, {args.discs} BDMV discs, {args.history} resume entries")
+
+        bench("episodes", len(episodes), lambda: juicenet_main(library, config))
+
+        config = fresh("bdmv")
+        discs = root / "bdmv" / "library"
+        make_bdmvs(discs, args.discs)
+        bench("bdmv", args.discs, lambda: juicenet_main(discs, config, bdmv=True))
+
+        config = fresh("resume")
+        fill_resume(config, args.history, episodes[: len(episodes) // 2])
+        bench("resume", len(episodes), lambda: juicenet_main(library, config))
+
+        api_files = episodes[: args.api_files]
+
+        config = fresh("juicenet")
+        bench("juicenet", len(api_files), lambda: [juicenet_api(file, config=config) for file in api_files])
+
+        config = fresh("session")
+        bench("session", len(api_files), lambda: JuicenetSession(config=config).upload_many(api_files))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark how long it takes to import juicenet and to start the CLI.
+
+Every scenario runs in a fresh interpreter, `--runs` times, and the best and median
+wall times are reported along with the time of a bare `python -c pass` to compare against.
+
+Scenarios:
+
+- `import`: `import juicenet`
+- `help`: `juicenet --help`
+- `version`: `juicenet --version`
+
+It also fails if importing juicenet pulls in any of the heavy dependencies
+or changes the SIGINT handler or `sys.excepthook`, since both are meant to happen
+only when something is actually used.
+
+Usage:
+
+```shell
+uv run python benchmarks/bench_startup.py [--runs 20]
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Nothing from here should be imported by `import juicenet` alone
+HEAVY = ("pydantic", "rich", "loguru", "yaml", "natsort", "cyclopts", "asyncio")
+
+CHECK_SIDE_EFFECTS = f"""
+import signal, sys
+handler, hook = signal.getsignal(signal.SIGINT), sys.excepthook
+import juicenet
+heavy = sorted(name for name in {HEAVY!r} if name in sys.modules)
+assert not heavy, f"import juicenet imported {{heavy}}"
+assert signal.getsignal(signal.SIGINT) is handler, "import juicenet changed the SIGINT handler"
+assert sys.excepthook is hook, "import juicenet changed sys.excepthook"
+"""
+
+SCENARIOS = {
+    "python": [sys.executable, "-c", "pass"],
+    "import": [sys.executable, "-c", "import juicenet"],
+    "help": [sys.executable, "-m", "juicenet", "--help"],
+    "version": [sys.executable, "-m", "juicenet", "--version"],
+}
+
+
+def bench(name: str, args: list[str], runs: int) -> None:
+    times = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+
+    print(f"{name:<8} best={min(times) * 1000:7.1f}ms median={statistics.median(times) * 1000:7.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20, help="number of runs of every scenario")
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "-c", CHECK_SIDE_EFFECTS], check=True)
+
+    for name, command in SCENARIOS.items():
+        bench(name, command, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,11 @@ Library designed to simplify the process of uploading files to Usenet.
 One for All Function
 --------------------
 - juicenet
+- juicenet_async
+
+Session
+-------
+- JuicenetSession
 
 Helper Functions
 ----------------
@@ -15,6 +20,8 @@ Helper Functions
 Types
 -----
 - JuicenetConfig
+- NyuuProvider
+- ParParProfile
 - ArticleFilePath
 - JuiceBox
 - NyuuOutput
@@ -24,23 +31,32 @@ Types
 - RawOutput
 """
 
-from .api.main import juicenet
-from .api.utils import get_bdmv_discs, get_dvd_discs, get_files, get_glob_matches
-from .model import JuicenetConfig
-from .types import (
-    ArticleFilePath,
-    JuiceBox,
-    NyuuOutput,
-    NZBFilePath,
-    PAR2FilePath,
-    ParParOutput,
-    RawOutput,
-)
-from .version import get_version
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .api.main import juicenet, juicenet_async
+    from .api.session import JuicenetSession
+    from .api.utils import get_bdmv_discs, get_dvd_discs, get_files, get_glob_matches
+    from .model import JuicenetConfig, NyuuProvider, ParParProfile
+    from .types import (
+        ArticleFilePath,
+        JuiceBox,
+        NyuuOutput,
+        NZBFilePath,
+        PAR2FilePath,
+        ParParOutput,
+        RawOutput,
+    )
 
 __all__ = [
     # main
     "juicenet",
+    "juicenet_async",
+    # session
+    "JuicenetSession",
     # helpers
     "get_files",
     "get_bdmv_discs",
@@ -48,6 +64,8 @@ __all__ = [
     "get_glob_matches",
     # types
     "JuicenetConfig",
+    "NyuuProvider",
+    "ParParProfile",
     "ArticleFilePath",
     "JuiceBox",
     "NyuuOutput",
@@ -57,4 +75,43 @@ __all__ = [
     "RawOutput",
 ]
 
-__version__ = get_version()
+# Everything is imported on first access, so `import juicenet` and the CLI's `--help` and `--version`
+# don't have to pay for pydantic, rich, loguru, and friends until they're actually used
+_LAZY = {
+    "juicenet": ".api.main",
+    "juicenet_async": ".api.main",
+    "JuicenetSession": ".api.session",
+    "get_files": ".api.utils",
+    "get_bdmv_discs": ".api.utils",
+    "get_dvd_discs": ".api.utils",
+    "get_glob_matches": ".api.utils",
+    "JuicenetConfig": ".model",
+    "NyuuProvider": ".model",
+    "ParParProfile": ".model",
+    "ArticleFilePath": ".types",
+    "JuiceBox": ".types",
+    "NyuuOutput": ".types",
+    "NZBFilePath": ".types",
+    "PAR2FilePath": ".types",
+    "ParParOutput": ".types",
+    "RawOutput": ".types",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name == "__version__":
+        from .version import get_version
+
+        value = get_version()
+    elif name in _LAZY:
+        value = getattr(import_module(_LAZY[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    # Cache it so this is only ever called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return [*globals(), *__all__, "__version__"]
@@ -0,0 +1,677 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from ..config import get_dump_failed_posts, read_config
+from ..exceptions import JuicenetInputError
+from ..metrics import Metrics
+from ..model import JuicenetConfig
+from ..nyuu import Nyuu
+from ..par2cache import Par2Cache
+from ..parpar import ParPar
+from ..pipeline import Pipeline, run_in_batches
+from ..process import OutputLogs
+from ..providers import Scheduler, get_providers
+from ..resources import Governor, Priority
+from ..resume import Resume
+from ..retry import RetryPolicy
+from ..staging import Staging
+from ..types import ArticleFilePath, JuiceBox, NyuuOutput, ParParOutput, RawOutput, StrPath
+from ..utils import clear_caches, filter_empty_files, get_glob_matches, get_related_files, scan_path
+
+T = TypeVar("T")
+
+
+async def _acquire_async(acquire: Callable[..., T], release: Callable[[T], None], *args: Any) -> T:
+    """
+    Run a blocking `acquire` in a thread without leaking what it acquires if the awaiting task is cancelled.
+    The thread can't be stopped, so whatever it acquires after the cancellation is handed straight to `release`.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(acquire, *args))
+
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+
+        def on_done(done: asyncio.Future[T]) -> None:
+            if not done.cancelled() and done.exception() is None:
+                release(done.result())
+
+        future.add_done_callback(on_done)
+        raise
+
+
+class JuicenetSession:
+    """
+    A reusable session for uploading several files or folders to usenet.
+
+    The config is read, ParPar, Nyuu, and resume are set up, and failed raw articles
+    are looked up only once for the whole session instead of once for every upload.
+    Failed raw articles are reposted once, right before the first upload of the session.
+
+    Parameters
+    ----------
+    config : str or pathlib.Path or JuicenetConfig
+        The configuration to use when processing the files or directories.
+        This can either be a string representing the path to a YAML configuration file,
+        a `pathlib.Path` object pointing to a YAML configuration file,
+        or a `juicenet.JuicenetConfig` dataclass.
+    public : bool, optional
+        Whether the uploads are meant to be public or not. Uses the public config if specified,
+        falls back to using the private one if not. Default is False.
+    bdmv_naming : bool, optional
+        Whether to use an alternate naming for BDMVs. See `juicenet.juicenet` for details.
+        Does nothing for file input. Default is False.
+    resume: bool, optional
+        Whether to enable resumability. Files uploaded by previous runs will be skipped if True. Default is True.
+    skip_raw: bool, optional
+        Skip checking and reposting failed raw articles. Default is False.
+    debug : bool, optional
+        Whether to enable debug logs. Default is False.
+
+    Raises
+    ------
+    JuicenetInputError
+        Invalid config.
+
+    Examples
+    --------
+    ```python
+    from juicenet import JuicenetSession, get_files
+
+    session = JuicenetSession(config="D:/data/usenet/config/juicenet.yaml")
+
+    for upload in session.upload_many(get_files("C:/Users/raven/Videos")):
+        print(upload.nyuu.nzb)
+    ```
+    """
+
+    def __init__(
+        self,
+        *,
+        config: StrPath | JuicenetConfig,
+        public: bool = False,
+        bdmv_naming: bool = False,
+        resume: bool = True,
+        skip_raw: bool = False,
+        debug: bool = False,
+    ) -> None:
+        if isinstance(config, str):
+            _config = Path(config).resolve()
+        elif isinstance(config, Path):
+            _config = config.resolve()
+        elif isinstance(config, JuicenetConfig):
+            _config = config  # type: ignore
+        else:
+            raise JuicenetInputError("Config must be a path or a juicenet.JuicenetConfig")
+
+        # Read config file
+        self.config = read_config(_config)
+        """The validated config used by this session."""
+
+        self.bdmv_naming = bdmv_naming
+        self.skip_raw = skip_raw
+        self.debug = debug
+
+        # Decide which config file(s) to use, uploads are spread across all of them
+        self.scope = "public" if public else "private"
+        providers = get_providers(self.config, self.scope)
+        self.providers = Scheduler(
+            [provider.config for provider in providers],
+            weights=[provider.weight for provider in providers],
+            workers=[provider.workers for provider in providers],
+        )
+        # Raw articles aren't tied to any config, so they're all reposted with the first one
+        self.conf = providers[0].config
+
+        appdata_dir = self.config.appdata_dir_path
+        appdata_dir.mkdir(parents=True, exist_ok=True)
+        resume_file = appdata_dir / "juicenet.resume.sqlite"
+
+        self.work_dir: Path | None
+        if self.config.use_temp_dir:
+            self.work_dir = self.config.temp_dir_path
+        else:
+            self.work_dir = None
+
+        # Check and get `dump-failed-posts` as defined in every Nyuu config
+        dumps = dict.fromkeys(get_dump_failed_posts(conf) for conf in self.providers.providers)
+        self.raw_articles: list[ArticleFilePath] = [
+            article for dump in dumps for article in get_glob_matches(dump, ["*"])
+        ]
+
+        # Initialize Resume class
+        no_resume = not resume
+        self.resume = Resume(
+            resume_file,
+            self.scope,
+            no_resume,
+            self.config.resume_mode,
+            self.config.resume_lease,
+            self.config.resume_shared,
+        )
+
+        # Complete ParPar and Nyuu output goes to log files, only the tail is kept in memory
+        self.logs = OutputLogs(appdata_dir / "logs", self.config.output_logs_kept, self.config.output_tail_size)
+
+        # Keep par2 files around until they're uploaded so failed uploads don't have to generate them again
+        cache = None
+        if self.config.par2_cache_dir:
+            cache = Par2Cache(
+                self.config.par2_cache_dir,
+                self.config.par2_cache_max_age * 24 * 60 * 60,
+                self.config.par2_cache_max_size,
+            )
+
+        # Keep ParPar within the container's CPU and memory limits and out of the way of everything else on the host.
+        # The ParPar stage of `upload_many` and `upload_each` runs on one input at a time, `upload_many_async` raises this
+        governor = Governor(jobs=1) if self.config.parpar_governor else None
+        self.priority = Priority(self.config.child_nice, self.config.child_ionice)
+
+        # Initialize ParPar class for generating par2 files ahead
+        self.parpar = ParPar(
+            self.config.parpar,
+            self.config.parpar_args,
+            self.work_dir,
+            debug,
+            self.logs,
+            cache,
+            self.config.parpar_profiles,
+            governor,
+            self.priority,
+        )
+
+        # Failed uploads are retried in place with the same par2 files
+        self.retry = RetryPolicy(
+            self.config.nyuu_attempts, self.config.nyuu_retry_backoff, self.config.nyuu_retry_backoff_max
+        )
+
+        # Hold ParPar back when the next par2 set wouldn't fit next to the ones waiting to be uploaded
+        self.staging = Staging(
+            self.config.parpar_args, self.config.par2_cache_dir or self.work_dir, self.config.staging_reserve, cache
+        )
+
+        # Initialize Metrics class for recording per file timings and throughput
+        self.metrics = Metrics(self.config.metrics_path, self.config.metrics_textfile_path, self.scope)
+
+        self._raw_output: dict[ArticleFilePath, RawOutput] | None = None
+        self._raw_lock = threading.Lock()
+        self._raw_task: asyncio.Task[dict[ArticleFilePath, RawOutput]] | None = None
+
+    @staticmethod
+    def _get_input(path: StrPath) -> Path:
+        """
+        Validate the given input and return it as a resolved `Path`
+        """
+        if isinstance(path, str):
+            _path = Path(path).resolve()
+        elif isinstance(path, Path):
+            _path = path.resolve()
+        else:
+            raise JuicenetInputError("Path must be a string or pathlib.Path")
+
+        if not _path.exists():
+            raise JuicenetInputError(f"{_path} must be an existing file or directory")
+
+        filelist = filter_empty_files([_path])
+
+        if len(filelist) == 1:
+            return filelist[0]
+        else:
+            raise JuicenetInputError(f"{_path} is empty (0-byte)!")
+
+    def _get_nyuu(
+        self, file: Path, meta: list[str] | None = None, conf: Path | None = None, base: Path | None = None
+    ) -> Nyuu:
+        """
+        Nyuu sorts NZBs relative to the parent of each input, or `base` if given, so it's cheaply
+        initialized per input with whichever Nyuu config the input was given
+        """
+        # Force disable BDMV naming for file input
+        bdmv_naming = self.bdmv_naming and not file.is_file()
+
+        return Nyuu(
+            base or file.parent.parent,
+            self.config.nyuu,
+            conf or self.conf,
+            self.work_dir,
+            self.config.nzb_output_path,
+            self.scope,
+            self.debug,
+            bdmv_naming,
+            meta,
+            logs=self.logs,
+            retry=self.retry,
+            priority=self.priority,
+        )
+
+    def _get_raw_nyuu(self) -> Nyuu:
+        """
+        Reposting raw articles doesn't depend on any input or produce an NZB, so the base path is irrelevant
+        """
+        return Nyuu(
+            self.config.nzb_output_path,
+            self.config.nyuu,
+            self.conf,
+            self.work_dir,
+            self.config.nzb_output_path,
+            self.scope,
+            self.debug,
+            False,
+            logs=self.logs,
+            priority=self.priority,
+        )
+
+    @staticmethod
+    def _skipped(file: Path, claimed: bool = False) -> JuiceBox:
+        """
+        Output for a file that was already uploaded, or `claimed` by another process
+        """
+        return JuiceBox(
+            nyuu=NyuuOutput(nzb=None, success=False, args=[], returncode=1, stdout="", stderr=""),
+            parpar=ParParOutput(
+                par2files=[],
+                success=False,
+                filepathbase=file.parent,
+                filepathformat="basename" if file.is_file() else "path",
+                args=[],
+                returncode=1,
+                stdout="",
+                stderr="",
+            ),
+            raw={},
+            skipped=True,
+            claimed=claimed,
+        )
+
+    def _get_related_files(self, file: Path) -> list[Path] | None:
+        """
+        Related files are only looked up for file input
+        """
+        if file.is_file():
+            return get_related_files(file, exts=self.config.related_extensions)
+        return None
+
+    def repost_raw(self) -> dict[ArticleFilePath, RawOutput]:
+        """
+        Repost the failed raw articles found when the session was created.
+        This only happens once per session, later calls return the same output.
+        Returns an empty dictionary if `skip_raw` is True or if there's nothing to repost.
+        """
+        with self._raw_lock:
+            if self._raw_output is None:
+                if self.raw_articles and (not self.skip_raw):
+                    self._raw_output = run_in_batches(
+                        self.raw_articles,
+                        self._get_raw_nyuu().repost_raw_batch,
+                        batch_size=self.config.raw_batch_size,
+                        workers=self.config.nyuu_workers,
+                    )
+                else:
+                    self._raw_output = {}
+
+            return self._raw_output
+
+    async def repost_raw_async(self) -> dict[ArticleFilePath, RawOutput]:
+        """
+        Asynchronous version of `JuicenetSession.repost_raw()`
+        """
+        if self._raw_output is None:
+            if self._raw_task is None:
+                self._raw_task = asyncio.ensure_future(self._repost_raw_async())
+            self._raw_output = await self._raw_task
+
+        return self._raw_output
+
+    async def _repost_raw_async(self) -> dict[ArticleFilePath, RawOutput]:
+        """
+        Asynchronous equivalent of `run_in_batches(raw_articles, nyuu.repost_raw_batch, ...)`
+        """
+        if not self.raw_articles or self.skip_raw:
+            return {}
+
+        nyuu = self._get_raw_nyuu()
+        size = max(self.config.raw_batch_size, 1)
+        batches = [self.raw_articles[i : i + size] for i in range(0, len(self.raw_articles), size)]
+        slots = asyncio.Semaphore(max(self.config.nyuu_workers, 1))
+
+        async def repost(batch: list[ArticleFilePath]) -> dict[ArticleFilePath, RawOutput]:
+            async with slots:
+                return await nyuu.repost_raw_batch_async(batch)
+
+        results: dict[ArticleFilePath, RawOutput] = {}
+
+        for result in await asyncio.gather(*(repost(batch) for batch in batches)):
+            results.update(result)
+
+        return {article: results[article] for article in self.raw_articles if article in results}
+
+    def _generate(self, file: Path) -> tuple[list[Path] | None, ParParOutput | None]:
+        """
+        Get the related files and generate `.par2` files, or nothing if the file was already uploaded
+        """
+        with self.metrics.stage("resume", file):
+            # Files in progress on another host are skipped too
+            if self.resume.skip_reason(file) is not None:
+                return None, None
+
+        try:
+            with self.metrics.stage("related", file):
+                related_files = self._get_related_files(file)
+
+            self.staging.acquire(file, self.parpar.get_args(file), related_files)
+            try:
+                with self.metrics.stage("parpar", file):
+                    parpar_out = self.parpar.generate_par2_files(file, related_files=related_files)
+            finally:
+                self.staging.generated(file)
+        except BaseException:
+            # It's not getting uploaded, free up it's space and let someone else have a go at it
+            self.staging.release(file)
+            self.resume.release(file)
+            raise
+
+        self.metrics.record_parpar(file, parpar_out)
+        return related_files, parpar_out
+
+    def _upload(
+        self,
+        file: Path,
+        related_files: list[Path] | None,
+        parpar_out: ParParOutput | None,
+        meta: list[str] | None = None,
+        base: Path | None = None,
+    ) -> JuiceBox:
+        """
+        Upload a file along with it's `.par2` files, with `meta` as `<meta>` tags in the NZB head
+        and the NZB sorted relative to `base`, if given
+        """
+        if parpar_out is None:
+            self.metrics.done(file, skipped=True)
+            # Anything that was skipped without being uploaded was claimed by another process
+            return self._skipped(file, claimed=not self.resume.already_uploaded(file))
+
+        success = False
+        try:
+            with self.metrics.stage("nyuu", file), self.providers.use(scan_path(file).size) as conf:
+                nyuu_out = self._get_nyuu(file, meta, conf, base).upload(
+                    file=file, related_files=related_files, par2files=parpar_out.par2files
+                )
+
+            success = nyuu_out.success
+            if success:
+                # Only save it to resume if it was successful, before anyone else can claim it
+                self.resume.log_file_info(file)
+        finally:
+            if not success:
+                self.parpar.discard(parpar_out)
+            self.staging.release(file)
+            self.resume.release(file)
+
+        self.metrics.record_nyuu(file, nyuu_out)
+
+        self.metrics.done(file)
+
+        return JuiceBox(nyuu=nyuu_out, parpar=parpar_out, raw=self.repost_raw(), skipped=False)
+
+    def upload(self, path: StrPath, /) -> JuiceBox:
+        """
+        Upload a file or folder to usenet. This will always produce one NZB for one input.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The path to an existing file or folder.
+
+        Returns
+        -------
+        JuiceBox
+            Dataclass used to represent the output of Juicenet.
+            `JuiceBox.raw` holds the output of the session's raw article reposting.
+
+        Raises
+        ------
+        JuicenetInputError
+            Invalid input.
+        """
+        # Start with fresh filesystem caches for every upload
+        clear_caches()
+
+        file = self._get_input(path)
+        self.repost_raw()
+
+        return self._upload(file, *self._generate(file))
+
+    def upload_many(self, paths: Iterable[StrPath], /) -> list[JuiceBox]:
+        """
+        Upload several files or folders to usenet, one NZB for each of them.
+
+        `.par2` files are generated up to `parpar_lookahead` inputs ahead of the uploads
+        and uploads are spread across the `nyuu_providers` of the session's scope, as set in the config.
+        Without any, up to `nyuu_workers` uploads run at the same time with the session's Nyuu config.
+        ParPar waits for uploads to finish if the next set of `.par2` files
+        wouldn't fit in the working directory while leaving `staging_reserve` bytes free.
+
+        Parameters
+        ----------
+        paths : Iterable[str or pathlib.Path]
+            Paths to existing files or folders.
+
+        Returns
+        -------
+        list[JuiceBox]
+            Output for every input, in the same order as `paths`.
+
+        Raises
+        ------
+        JuicenetInputError
+            Invalid input. Every input is validated before anything is uploaded.
+        """
+        # Start with fresh filesystem caches, shared by every input in this batch
+        clear_caches()
+
+        files = [self._get_input(path) for path in paths]
+        self.repost_raw()
+
+        output: dict[Path, JuiceBox] = {}
+        self._run(files, output.__setitem__)
+
+        self.metrics.finish()
+
+        return [output[file] for file in files]
+
+    def upload_each(
+        self,
+        paths: Iterable[StrPath],
+        /,
+        callback: Callable[[Path, JuiceBox], None],
+        *,
+        base: StrPath | None = None,
+        on_error: Callable[[Path, Exception], None] | None = None,
+    ) -> None:
+        """
+        Upload files or folders as `paths` yields them, one NZB for each of them.
+
+        Unlike `JuicenetSession.upload_many()`, `paths` is consumed lazily by the ParPar stage,
+        so it can be an endless iterator that blocks until the next input shows up.
+        The filesystem caches are left alone, it's up to the iterator to clear them when things change.
+
+        Parameters
+        ----------
+        paths : Iterable[str or pathlib.Path]
+            Paths to existing files or folders.
+        callback : Callable[[pathlib.Path, JuiceBox], None]
+            Called with every input and it's output as soon as it's done, from a worker thread.
+        base : str or pathlib.Path, optional
+            Sort the NZBs relative to this directory, like `juicenet <base>` does.
+            By default, NZBs are sorted relative to every input's parent.
+        on_error : Callable[[pathlib.Path, Exception], None], optional
+            Called with every input that fails and why, from a worker thread, and the rest are still uploaded.
+            By default, the first failure stops everything and is raised.
+
+        Raises
+        ------
+        JuicenetInputError
+            Invalid input. Inputs are validated as they're consumed.
+        """
+
+        def get_inputs() -> Iterable[Path]:
+            for path in paths:
+                try:
+                    yield self._get_input(path)
+                except JuicenetInputError as error:
+                    if on_error is None:
+                        raise
+                    on_error(Path(path), error)
+
+        self.repost_raw()
+
+        self._run(get_inputs(), callback, Path(base).resolve() if base is not None else None, on_error)
+
+        self.metrics.finish()
+
+    def _run(
+        self,
+        files: Iterable[Path],
+        callback: Callable[[Path, JuiceBox], None],
+        base: Path | None = None,
+        on_error: Callable[[Path, Exception], None] | None = None,
+    ) -> None:
+        """
+        Run ParPar and Nyuu on every file, `parpar_lookahead` files apart with as many uploads at once as the providers allow.
+        Failures are handed to `on_error` and skip just that file if it's given, otherwise they stop everything.
+        """
+
+        def produce(file: Path) -> tuple[list[Path] | None, ParParOutput | None] | Exception:
+            try:
+                return self._generate(file)
+            except Exception as error:
+                if on_error is None:
+                    raise
+                return error
+
+        def consume(file: Path, result: tuple[list[Path] | None, ParParOutput | None] | Exception) -> None:
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                output = self._upload(file, *result, base=base)
+            except Exception as error:
+                if on_error is None:
+                    raise
+                on_error(file, error)
+                return
+
+            callback(file, output)
+
+        Pipeline(
+            produce=produce,
+            consume=consume,
+            lookahead=self.config.parpar_lookahead,
+            workers=self.providers.capacity,
+        ).run(files)
+
+    async def upload_async(self, path: StrPath, /) -> JuiceBox:
+        """
+        Asynchronous version of `JuicenetSession.upload()`.
+
+        ParPar and Nyuu are run with `asyncio.create_subprocess_exec` and blocking
+        filesystem work is offloaded with `asyncio.to_thread`. If the task is cancelled,
+        the running ParPar or Nyuu process is terminated before `asyncio.CancelledError` is raised.
+        """
+        # Start with fresh filesystem caches for every upload
+        clear_caches()
+
+        file = await asyncio.to_thread(self._get_input, path)
+        raw = await self.repost_raw_async()
+
+        with self.metrics.stage("resume", file):
+            # Files in progress on another host are skipped too
+            reason = await asyncio.to_thread(self.resume.skip_reason, file)
+
+        if reason is not None:
+            self.metrics.done(file, skipped=True)
+            return self._skipped(file, claimed=reason != "Already uploaded")
+
+        try:
+            with self.metrics.stage("related", file):
+                related_files = await asyncio.to_thread(self._get_related_files, file)
+
+            await _acquire_async(
+                self.staging.acquire,
+                lambda _: self.staging.release(file),
+                file,
+                self.parpar.get_args(file),
+                related_files,
+            )
+            try:
+                with self.metrics.stage("parpar", file):
+                    parpar_out = await self.parpar.generate_par2_files_async(file, related_files=related_files)
+            finally:
+                self.staging.generated(file)
+        except BaseException:
+            # It's not getting uploaded, free up it's space and let someone else have a go at it
+            self.staging.release(file)
+            self.resume.release(file)
+            raise
+
+        self.metrics.record_parpar(file, parpar_out)
+
+        success = False
+        try:
+            with self.metrics.stage("nyuu", file):
+                conf = await _acquire_async(self.providers.acquire, self.providers.release, scan_path(file).size)
+                try:
+                    nyuu_out = await self._get_nyuu(file, conf=conf).upload_async(
+                        file=file, related_files=related_files, par2files=parpar_out.par2files
+                    )
+                finally:
+                    self.providers.release(conf)
+
+            success = nyuu_out.success
+            if success:
+                # Only save it to resume if it was successful, before anyone else can claim it
+                await asyncio.to_thread(self.resume.log_file_info, file)
+        finally:
+            if not success:
+                await asyncio.to_thread(self.parpar.discard, parpar_out)
+            self.staging.release(file)
+            self.resume.release(file)
+
+        self.metrics.record_nyuu(file, nyuu_out)
+
+        self.metrics.done(file)
+
+        return JuiceBox(nyuu=nyuu_out, parpar=parpar_out, raw=raw, skipped=False)
+
+    async def upload_many_async(self, paths: Iterable[StrPath], /) -> list[JuiceBox]:
+        """
+        Asynchronous version of `JuicenetSession.upload_many()`.
+        Up to `nyuu_workers` inputs (or the sum of the workers of the `nyuu_providers`) are processed at the same time,
+        so ParPar's threads and memory are split between that many ParPar processes while it runs.
+        """
+        paths = list(paths)
+        workers = max(min(self.providers.capacity, len(paths)), 1)
+        slots = asyncio.Semaphore(workers)
+
+        async def upload(path: StrPath) -> JuiceBox:
+            async with slots:
+                return await self.upload_async(path)
+
+        governor = self.parpar.governor
+        jobs = governor.jobs if governor is not None else 1
+        if governor is not None:
+            governor.jobs = jobs * workers
+
+        try:
+            output = list(await asyncio.gather(*(upload(path) for path in paths)))
+        finally:
+            if governor is not None:
+                governor.jobs = jobs
+
+        self.metrics.finish()
+
+        return output
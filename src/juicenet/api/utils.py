@@ -4,11 +4,13 @@ from ..exceptions import JuicenetInputError
 from ..types import StrPath
 from ..utils import get_bdmv_discs as _get_bdmv_discs
 from ..utils import get_dvd_discs as _get_dvd_discs
+from ..utils import get_files as _get_files
 
 
 def get_files(path: StrPath, /, *, exts: list[str] = ["mkv"]) -> list[Path]:
     """
-    Get a list of files with specified extensions from the given path. This is recursive.
+    Get a list of files with specified extensions from the given path.
+    This is recursive and extensions are matched case-insensitively.
 
     Parameters
     ----------
@@ -46,13 +48,7 @@ def get_files(path: StrPath, /, *, exts: list[str] = ["mkv"]) -> list[Path]:
     if not basepath.is_dir():
         raise JuicenetInputError(f"{basepath} must be an directory")
 
-    files = []
-
-    for ext in exts:
-        matches = list(basepath.rglob(f"*.{ext.strip('.')}"))
-        files.extend(matches)
-
-    return files
+    return _get_files(basepath, exts)
 
 
 def get_glob_matches(path: Path, /, *, globs: list[str] = ["*.mkv"]) -> list[Path]:
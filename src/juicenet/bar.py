@@ -1,18 +1,25 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import threading
+from typing import TYPE_CHECKING, Callable
 
 from rich.progress import (
     BarColumn,
+    DownloadColumn,
     MofNCompleteColumn,
     Progress,
     SpinnerColumn,
+    TaskID,
     TaskProgressColumn,
     TextColumn,
     TimeElapsedColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
 )
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from rich.console import Console
 
 
@@ -34,3 +41,88 @@ def progress_bar(console: Console, transient: bool = False, disable: bool = Fals
 
 # The above progress_bar ends up looking like this:
 # Nyuu... ⠼ ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ 1000/1000 • 100% • 0:00:10
+
+
+def transfer_bar(console: Console, transient: bool = False, disable: bool = False) -> Progress:
+    return Progress(
+        TextColumn("[progress.description]{task.description}"),
+        SpinnerColumn(),
+        BarColumn(),
+        TextColumn("{task.fields[files]}"),
+        TextColumn("•"),
+        DownloadColumn(binary_units=True),
+        TextColumn("•"),
+        TransferSpeedColumn(),
+        TextColumn("•"),
+        TimeRemainingColumn(),
+        TextColumn("•"),
+        TimeElapsedColumn(),
+        console=console,
+        transient=transient,
+        disable=disable,
+    )
+
+
+# The above transfer_bar ends up looking like this:
+# Nyuu... ⠼ ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ 3/10 • 12.4/60.0 GiB • 41.2 MB/s • 0:19:40 • 0:05:08
+
+
+class TransferTask:
+    """
+    Byte based progress task for a batch of files on a `transfer_bar`.
+
+    ParPar and Nyuu only report their progress as a percentage, so every file's
+    progress is weighed by it's size to get the progress, throughput, and ETA of the whole batch.
+    Files can be in progress at the same time and reported from different threads.
+
+    Attributes
+    ----------
+    progress : Progress
+        The `transfer_bar` this task belongs to.
+    description : str
+        Description of the task.
+    sizes : dict[Path, int]
+        Size of every file in the batch in bytes.
+
+    Methods
+    -------
+    reporter(file: Path) -> Callable[[float], None]
+        Get a callback that reports the progress of a file, for use as `on_progress`.
+    advance(file: Path) -> None
+        Mark a file as done.
+    """
+
+    def __init__(self, progress: Progress, description: str, sizes: dict[Path, int]) -> None:
+        self.progress = progress
+        self.sizes = sizes
+        self._lock = threading.Lock()
+        self._done = 0
+        self._count = 0
+        self._running: dict[Path, float] = {}
+        self._task: TaskID = progress.add_task(description, total=sum(sizes.values()), files=f"0/{len(sizes)}")
+
+    def _refresh(self) -> None:
+        completed = self._done + sum(self.sizes[file] * fraction for file, fraction in self._running.items())
+        self.progress.update(self._task, completed=completed, files=f"{self._count}/{len(self.sizes)}")
+
+    def reporter(self, file: Path) -> Callable[[float], None]:
+        """
+        Get a callback that reports the progress of a file
+        """
+
+        def report(fraction: float) -> None:
+            with self._lock:
+                self._running[file] = fraction
+                self._refresh()
+
+        return report
+
+    def advance(self, file: Path) -> None:
+        """
+        Mark a file as done
+        """
+        with self._lock:
+            self._running.pop(file, None)
+            self._done += self.sizes[file]
+            self._count += 1
+            self._refresh()
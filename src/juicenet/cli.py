@@ -1,10 +1,11 @@
+import signal
+import sys
 from pathlib import Path
 from typing import Annotated, Optional
 
 from cyclopts import App, Group, Parameter, validators
-from cyclopts.types import ResolvedExistingFile, ResolvedExistingPath
+from cyclopts.types import ResolvedExistingDirectory, ResolvedExistingFile, ResolvedExistingPath
 
-from .main import main
 from .version import get_version
 
 app = App(
@@ -26,6 +27,19 @@ app["--version"].group = exclusive  # type: ignore
 app["--version"].help = "display application version"
 
 
+def _setup() -> None:
+    """
+    Process wide setup that's only wanted when actually running something
+    """
+    from rich.traceback import install
+
+    # Supress keyboardinterrupt traceback because I hate it
+    signal.signal(signal.SIGINT, lambda x, y: sys.exit(1))
+
+    # Install rich traceback
+    install()
+
+
 @app.default
 def cli(
     path: Annotated[
@@ -115,6 +129,20 @@ def cli(
             help="add a <meta> tag to the NZB head, can be used multiple times",
         ),
     ] = None,
+    lookahead: Annotated[
+        Optional[int],
+        Parameter(
+            help="number of files parpar can process ahead of nyuu, overrides config",
+            validator=validators.Number(gte=0),
+        ),
+    ] = None,
+    workers: Annotated[
+        Optional[int],
+        Parameter(
+            help="number of nyuu processes to run at the same time, overrides config",
+            validator=validators.Number(gte=1),
+        ),
+    ] = None,
     debug: Annotated[
         bool,
         Parameter(
@@ -146,6 +174,10 @@ def cli(
     """
     CLI for juicenet. Does a bit of input validation thanks to cyclopts and then passes it over to juicenet.
     """
+    # Imported here so `--help` and `--version` don't have to import everything
+    from .main import main
+
+    _setup()
 
     main(
         path=path,
@@ -160,9 +192,176 @@ def cli(
         bdmv=bdmv,
         dvd=dvd,
         meta=meta,
+        lookahead=lookahead,
+        workers=workers,
         debug=debug,
         move=move,
         extensions=exts,
         no_resume=no_resume,
         clear_resume=clear_resume,
     )
+
+
+@app.command
+def watch(
+    path: Annotated[
+        ResolvedExistingDirectory,
+        Parameter(
+            help="directory to watch.",
+            show_default=True,
+        ),
+    ] = Path.cwd(),
+    /,
+    *,
+    config: Annotated[
+        ResolvedExistingFile,
+        Parameter(
+            help="path to your juicenet config file",
+            env_var="JUICENET_CONFIG",
+        ),
+    ] = Path.cwd() / "juicenet.yaml",
+    public: Annotated[
+        bool,
+        Parameter(
+            help="use your public/secondary nyuu config",
+        ),
+    ] = False,
+    exts: Annotated[
+        Optional[list[str]],
+        Parameter(
+            help="file extensions to be matched, overrides config",
+        ),
+    ] = None,
+    glob: Annotated[
+        Optional[list[str]],
+        Parameter(
+            help="glob pattern(s) to be matched instead of extensions",
+        ),
+    ] = None,
+    bdmv: Annotated[
+        bool,
+        Parameter(
+            help="watch for BDMVs in path, can be used with --glob",
+        ),
+    ] = False,
+    dvd: Annotated[
+        bool,
+        Parameter(
+            help="watch for DVDs in path, can be used with --glob",
+        ),
+    ] = False,
+    settle: Annotated[
+        float,
+        Parameter(
+            help="seconds a file must stay unchanged before it's uploaded",
+            validator=validators.Number(gte=0),
+        ),
+    ] = 30,
+    interval: Annotated[
+        float,
+        Parameter(
+            help="seconds between checks for changes",
+            validator=validators.Number(gt=0),
+        ),
+    ] = 5,
+    poll: Annotated[
+        bool,
+        Parameter(
+            help="poll for changes instead of using inotify",
+        ),
+    ] = False,
+    skip_raw: Annotated[
+        bool,
+        Parameter(
+            help="skip raw article reposting",
+        ),
+    ] = False,
+    no_resume: Annotated[
+        bool,
+        Parameter(
+            help="ignore existing resume data",
+        ),
+    ] = False,
+    debug: Annotated[
+        bool,
+        Parameter(
+            env_var="JUICENET_DEBUG",
+            help="show debug logs",
+        ),
+    ] = False,
+) -> None:
+    """
+    watch a directory and upload new files or discs as they land
+    """
+    from .watch import watch
+
+    _setup()
+
+    watch(
+        path,
+        config,
+        public=public,
+        extensions=exts,
+        glob=glob,
+        bdmv=bdmv,
+        dvd=dvd,
+        settle=settle,
+        interval=interval,
+        poll=poll,
+        skip_raw=skip_raw,
+        no_resume=no_resume,
+        debug=debug,
+    )
+
+
+@app.command
+def serve(
+    *,
+    config: Annotated[
+        ResolvedExistingFile,
+        Parameter(
+            help="path to your juicenet config file",
+            env_var="JUICENET_CONFIG",
+        ),
+    ] = Path.cwd() / "juicenet.yaml",
+    host: Annotated[
+        str,
+        Parameter(
+            help="address to listen on",
+        ),
+    ] = "127.0.0.1",
+    port: Annotated[
+        int,
+        Parameter(
+            help="port to listen on",
+            validator=validators.Number(gte=0, lte=65535),
+        ),
+    ] = 8585,
+    socket: Annotated[
+        Optional[Path],
+        Parameter(
+            help="listen on a unix socket instead of --host and --port",
+        ),
+    ] = None,
+    skip_raw: Annotated[
+        bool,
+        Parameter(
+            help="skip raw article reposting",
+        ),
+    ] = False,
+    debug: Annotated[
+        bool,
+        Parameter(
+            env_var="JUICENET_DEBUG",
+            help="show debug logs",
+        ),
+    ] = False,
+) -> None:
+    """
+    accept upload jobs over http and run them from a persistent queue
+    """
+    from .serve import serve
+
+    _setup()
+
+    serve(config, host=host, port=port, unix_socket=socket, skip_raw=skip_raw, debug=debug)
@@ -0,0 +1,48 @@
+import hashlib
+import mmap
+from pathlib import Path
+
+# Size of each sample read from the head, middle, and tail of a file
+SAMPLE_SIZE = 1024 * 1024
+
+
+def fingerprint_file(file: Path) -> str:
+    """
+    Get a fast content fingerprint of a file
+
+    Hashing multi gigabyte files in full on every run is way too slow,
+    so this only hashes the file size along with `SAMPLE_SIZE` bytes from the head,
+    middle, and tail of the file. Small files are hashed in full.
+
+    Returns a hex digest like `7c2f5c0bd5d1b0e1a6b6f2b8c1e0f3a9`
+    """
+    size = file.stat().st_size
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+
+    with file.open("rb") as fp:
+        if size <= SAMPLE_SIZE * 3:
+            digest.update(fp.read())
+        else:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                middle = (size - SAMPLE_SIZE) // 2
+                digest.update(data[:SAMPLE_SIZE])
+                digest.update(data[middle : middle + SAMPLE_SIZE])
+                digest.update(data[-SAMPLE_SIZE:])
+
+    return digest.hexdigest()
+
+
+def combine_fingerprints(fingerprints: dict[str, str]) -> str:
+    """
+    Combine the fingerprints of every file in a directory into a single fingerprint
+
+    `fingerprints` maps the path of every file relative to the directory to it's fingerprint,
+    so the result depends on the contents and the layout of the directory, but not on it's name.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    for name in sorted(fingerprints):
+        digest.update(name.encode("utf-8", "surrogateescape"))
+        digest.update(fingerprints[name].encode())
+
+    return digest.hexdigest()
@@ -0,0 +1,63 @@
+"""
+Health check for `juicenet serve`.
+
+This deliberately only uses the standard library, so checking in on the server,
+i.e, from a Docker `HEALTHCHECK`, doesn't pay for importing the CLI or any of juicenet's dependencies.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import sys
+from http.client import HTTPConnection
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8585
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    def __init__(self, path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def check_health(
+    host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_socket: str | None = None, timeout: float = 5
+) -> bool:
+    """
+    Check if a `juicenet serve` listening on `host:port`, or `unix_socket` if given, is up and healthy
+    """
+    connection = (
+        _UnixHTTPConnection(unix_socket, timeout) if unix_socket else HTTPConnection(host, port, timeout=timeout)
+    )
+
+    try:
+        connection.request("GET", "/health")
+        response = connection.getresponse()
+        return response.status == 200 and json.loads(response.read()).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+    finally:
+        connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="juicenet-health", description="check if `juicenet serve` is healthy")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="host the server listens on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port the server listens on")
+    parser.add_argument("--socket", help="unix socket the server listens on, instead of --host and --port")
+    parser.add_argument("--timeout", type=float, default=5, help="seconds to wait for a response")
+    args = parser.parse_args()
+
+    sys.exit(0 if check_health(args.host, args.port, args.socket, args.timeout) else 1)
+
+
+if __name__ == "__main__":
+    main()
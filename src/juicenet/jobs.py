@@ -0,0 +1,251 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from .compat import StrEnum
+
+
+class JobState(StrEnum):
+    """
+    Lifecycle of an upload job: `queued` -> `par2` -> `uploading` -> `done` or `failed`
+    """
+
+    QUEUED = "queued"
+    PAR2 = "par2"
+    UPLOADING = "uploading"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """
+    A single upload job.
+
+    Attributes
+    ----------
+    id : int
+        Unique id of the job.
+    path : str
+        The file or folder to upload.
+    scope : str
+        Whether to use the private or public Nyuu config.
+    meta : list[str]
+        `<meta>` tags added to the NZB head.
+    state : JobState
+        Where the job currently is.
+    created : float
+        Unix time the job was submitted.
+    updated : float
+        Unix time the job last changed state.
+    nzb : str, optional
+        Path to the resulting NZB once the job is done.
+    error : str, optional
+        Why the job failed.
+    """
+
+    id: int
+    path: str
+    scope: str
+    meta: list[str]
+    state: JobState
+    created: float
+    updated: float
+    nzb: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class JobQueue:
+    """
+    A persistent queue of upload jobs in an SQLite database.
+
+    Jobs survive restarts. Jobs that were in the middle of `par2` or `uploading`
+    when the previous process went away are put back in the queue by `requeue_interrupted()`.
+
+    Attributes
+    ----------
+    path : Path
+        The path to the jobs database.
+
+    Methods
+    -------
+    submit(path: Path, scope: str, meta: Optional[list[str]] = None) -> Job
+        Add a job to the queue.
+    claim(scope: str, exclude: Iterable[str] = ()) -> Optional[Job]
+        Take the oldest queued job of a scope and move it to `par2`.
+    update(id: int, state: JobState, nzb: Optional[str] = None, error: Optional[str] = None) -> None
+        Move a job to another state.
+    get(id: int) -> Optional[Job]
+        Get a job by it's id.
+    latest(state: Optional[JobState] = None, limit: int = 100) -> list[Job]
+        Get the newest jobs, optionally only those in a given state.
+    counts() -> dict[str, int]
+        Get the number of jobs in every state.
+    requeue_interrupted() -> int
+        Put jobs that were left in `par2` or `uploading` back in the queue.
+    wait(timeout: float) -> None
+        Wait until a job is submitted or `timeout` seconds have passed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._submitted = threading.Condition(self._lock)
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """
+        Connection to the jobs database, opened on first use
+        """
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # The HTTP server and the runners use it from different threads, access is serialised with `self._lock`
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    meta TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    nzb TEXT,
+                    error TEXT
+                );
+
+                CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, scope, id);
+                """
+            )
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            path=row["path"],
+            scope=row["scope"],
+            meta=json.loads(row["meta"]),
+            state=JobState(row["state"]),
+            created=row["created"],
+            updated=row["updated"],
+            nzb=row["nzb"],
+            error=row["error"],
+        )
+
+    def submit(self, path: Path, scope: str, meta: Optional[list[str]] = None) -> Job:
+        """
+        Add a job to the queue and wake up anything waiting for one
+        """
+        now = time.time()
+
+        with self._submitted:
+            cursor = self.db.execute(
+                "INSERT INTO jobs (path, scope, meta, state, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(path), scope, json.dumps(meta or []), JobState.QUEUED, now, now),
+            )
+            self._submitted.notify_all()
+
+        return Job(cursor.lastrowid, str(path), scope, meta or [], JobState.QUEUED, now, now)  # type: ignore[arg-type]
+
+    def claim(self, scope: str, exclude: Iterable[str] = ()) -> Optional[Job]:
+        """
+        Take the oldest queued job of a scope, skipping any for the paths in `exclude`, and move it to `par2`
+        """
+        exclude = list(exclude)
+        placeholders = ", ".join("?" * len(exclude))
+
+        with self._lock:
+            # Immediate, so other processes sharing the database can't claim the same job
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    f"SELECT * FROM jobs WHERE state = ? AND scope = ? AND path NOT IN ({placeholders}) "
+                    "ORDER BY id LIMIT 1",
+                    (JobState.QUEUED, scope, *exclude),
+                ).fetchone()
+
+                if row is not None:
+                    self.db.execute(
+                        "UPDATE jobs SET state = ?, updated = ? WHERE id = ?", (JobState.PAR2, time.time(), row["id"])
+                    )
+            finally:
+                self.db.execute("COMMIT")
+
+        if row is None:
+            return None
+
+        job = self._to_job(row)
+        job.state = JobState.PAR2
+        return job
+
+    def update(self, id: int, state: JobState, nzb: Optional[str] = None, error: Optional[str] = None) -> None:
+        """
+        Move a job to another state
+        """
+        with self._lock:
+            self.db.execute(
+                "UPDATE jobs SET state = ?, updated = ?, nzb = ?, error = ? WHERE id = ?",
+                (state, time.time(), nzb, error, id),
+            )
+
+    def get(self, id: int) -> Optional[Job]:
+        """
+        Get a job by it's id
+        """
+        with self._lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (id,)).fetchone()
+        return None if row is None else self._to_job(row)
+
+    def latest(self, state: Optional[JobState] = None, limit: int = 100) -> list[Job]:
+        """
+        Get the newest jobs, optionally only those in a given state
+        """
+        with self._lock:
+            if state is None:
+                rows = self.db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = self.db.execute(
+                    "SELECT * FROM jobs WHERE state = ? ORDER BY id DESC LIMIT ?", (state, limit)
+                ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        """
+        Get the number of jobs in every state
+        """
+        with self._lock:
+            rows = self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state.value: 0 for state in JobState}
+        counts.update({state: count for state, count in rows})
+        return counts
+
+    def requeue_interrupted(self) -> int:
+        """
+        Put jobs that were left in `par2` or `uploading` by a previous process back in the queue
+        """
+        with self._lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET state = ?, updated = ? WHERE state IN (?, ?)",
+                (JobState.QUEUED, time.time(), JobState.PAR2, JobState.UPLOADING),
+            )
+        return cursor.rowcount
+
+    def wait(self, timeout: float) -> None:
+        """
+        Wait until a job is submitted or `timeout` seconds have passed
+        """
+        with self._submitted:
+            self._submitted.wait(timeout)
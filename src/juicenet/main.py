@@ -1,24 +1,32 @@
 from __future__ import annotations
 
 import json
-import signal
 import sys
 from pathlib import Path
 from pprint import pformat
+from typing import TYPE_CHECKING
 
 from loguru import logger as _loguru_logger
 from pydantic import ValidationError
 from rich.console import Console
-from rich.traceback import install
 
-from .bar import progress_bar
+from .bar import TransferTask, progress_bar, transfer_bar
 from .config import get_dump_failed_posts, read_config
 from .log import get_logger
+from .metrics import Metrics
 from .nyuu import Nyuu
+from .par2cache import Par2Cache
 from .parpar import ParPar
+from .pipeline import Pipeline, run_in_batches
+from .process import OutputLogs
+from .providers import Scheduler, get_providers
+from .resources import Governor, Priority
 from .resume import Resume
-from .types import InternalJuicenetOutput, SubprocessOutput
+from .retry import RetryPolicy
+from .staging import Staging
+from .types import InternalJuicenetOutput, ParParOutput, RawOutput, SubprocessOutput
 from .utils import (
+    clear_caches,
     delete_files,
     filter_empty_files,
     filter_par2_files,
@@ -29,14 +37,12 @@ from .utils import (
     get_related_files,
     map_file_to_pars,
     move_files,
+    scan_path,
 )
 from .version import get_version
 
-# Supress keyboardinterrupt traceback because I hate it
-signal.signal(signal.SIGINT, lambda x, y: sys.exit(1))
-
-# Install rich traceback
-install()
+if TYPE_CHECKING:
+    from loguru import Logger
 
 # Console object, used by both progressbar and loguru
 console = Console()
@@ -60,11 +66,16 @@ def main(
     no_resume: bool = False,
     clear_resume: bool = False,
     meta: list[str] | None = None,
+    lookahead: int | None = None,
+    workers: int | None = None,
 ) -> InternalJuicenetOutput:
     """
     Do stuff here
     """
 
+    # Start with fresh filesystem caches for every run
+    clear_caches()
+
     # Configure logger
     level = "DEBUG" if debug else "INFO"
     logger = get_logger(logger=_loguru_logger, level=level, sink=console)  # type: ignore
@@ -84,31 +95,31 @@ def main(
     # Get the values from config
     nyuu_bin = config_data.nyuu
     parpar_bin = config_data.parpar
-    priv_conf = config_data.nyuu_config_private
-    pub_conf = config_data.nyuu_config_public or priv_conf
     nzb_out = config_data.nzb_output_path
     exts = extensions or config_data.extensions
     related_exts = config_data.related_extensions
     parpar_args = config_data.parpar_args
+    lookahead = config_data.parpar_lookahead if lookahead is None else lookahead
+    workers = config_data.nyuu_workers if workers is None else workers
+    raw_batch_size = config_data.raw_batch_size
 
     appdata_dir = config_data.appdata_dir_path
     appdata_dir.mkdir(parents=True, exist_ok=True)
-    resume_file = appdata_dir / "juicenet.resume"
-    resume_file.touch(exist_ok=True)
+    resume_file = appdata_dir / "juicenet.resume.sqlite"
 
     if config_data.use_temp_dir:
         work_dir = config_data.temp_dir_path
     else:
         work_dir = None
 
-    # Decide which config file to use
-    configurations = {"public": pub_conf, "private": priv_conf}
+    # Decide which config file(s) to use
     scope = "public" if public else "private"
-    conf = configurations[scope]
+    providers = get_providers(config_data, scope, workers)
+    conf = providers[0].config
 
-    # Check and get `dump-failed-posts` as defined in Nyuu config
+    # Check and get `dump-failed-posts` as defined in every Nyuu config
     try:
-        dump = get_dump_failed_posts(conf)
+        dumps = list(dict.fromkeys(get_dump_failed_posts(provider.config) for provider in providers))
     except json.JSONDecodeError as error:
         logger.error(error)
         logger.error("Please check your Nyuu config and ensure it is valid")
@@ -127,9 +138,14 @@ def main(
 
     logger.info(f"Nyuu: {nyuu_bin}")
     logger.info(f"ParPar: {parpar_bin}")
-    logger.info(f"Nyuu Config: {conf}")
+    if len(providers) == 1:
+        logger.info(f"Nyuu Config: {conf}")
+    else:
+        for provider in providers:
+            logger.info(f"Nyuu Config: {provider.config} (weight: {provider.weight:g}, workers: {provider.workers})")
     logger.info(f"NZB Output: {nzb_out}")
-    logger.info(f"Raw Articles: {dump}")
+    for dump in dumps:
+        logger.info(f"Raw Articles: {dump}")
     logger.info(f"Appdata Directory: {appdata_dir}")
     logger.info(f"Working Directory: {work_dir or path}")
 
@@ -139,10 +155,12 @@ def main(
         logger.info(f"Extensions: {exts}")
 
     logger.info(f"Related Extensions: {related_exts}")
+    logger.debug(f"ParPar Lookahead: {lookahead}")
+    logger.debug(f"Nyuu Workers: {sum(provider.workers for provider in providers)}")
 
     # --clear-raw
     if clear_raw:
-        raw = get_glob_matches(dump, ["*"])
+        raw = [article for dump in dumps for article in get_glob_matches(dump, ["*"])]
         count = len(raw)
         delete_files(raw)
         logger.info(f"Deleted {count} raw articles(s)")
@@ -153,20 +171,76 @@ def main(
         logger.info(f"NZB meta tags: {meta}")
 
     # Initialize Resume class
-    resume = Resume(resume_file, scope, no_resume)
+    resume = Resume(
+        resume_file,
+        scope,
+        no_resume,
+        config_data.resume_mode,
+        config_data.resume_lease,
+        config_data.resume_shared,
+    )
+
+    # Initialize Metrics class for recording per file timings and throughput
+    metrics = Metrics(config_data.metrics_path, config_data.metrics_textfile_path, scope)
+
+    # Complete ParPar and Nyuu output goes to log files, only the tail is kept in memory
+    logs = OutputLogs(appdata_dir / "logs", config_data.output_logs_kept, config_data.output_tail_size)
+
+    # Keep par2 files around until they're uploaded so failed uploads don't have to generate them again
+    if config_data.par2_cache_dir:
+        cache = Par2Cache(
+            config_data.par2_cache_dir,
+            config_data.par2_cache_max_age * 24 * 60 * 60,
+            config_data.par2_cache_max_size,
+        )
+    else:
+        cache = None
 
-    # Initialize ParPar class for generating par2 files ahead
-    parpar = ParPar(parpar_bin, parpar_args, work_dir, debug)
+    # Keep ParPar within the container's CPU and memory limits and out of the way of everything else on the host.
+    # ParPar runs on one input at a time here, only the Nyuu stage runs several at once, so it gets everything
+    governor = Governor(jobs=1) if config_data.parpar_governor else None
+    priority = Priority(config_data.child_nice, config_data.child_ionice)
 
-    # Initialize Nyuu class for uploading stuff ahead
-    nyuu = Nyuu(path, nyuu_bin, conf, work_dir, nzb_out, scope, debug, bdmv or dvd, meta)
+    # Initialize ParPar class for generating par2 files ahead
+    parpar = ParPar(
+        parpar_bin, parpar_args, work_dir, debug, logs, cache, config_data.parpar_profiles, governor, priority
+    )
+
+    # Hold ParPar back when the next par2 set wouldn't fit next to the ones waiting to be uploaded
+    staging = Staging(parpar_args, config_data.par2_cache_dir or work_dir, config_data.staging_reserve, cache)
+
+    # Initialize Nyuu class for uploading stuff ahead, once for every config uploads are spread across
+    retry = RetryPolicy(config_data.nyuu_attempts, config_data.nyuu_retry_backoff, config_data.nyuu_retry_backoff_max)
+    uploaders = Scheduler(
+        [
+            Nyuu(
+                path,
+                nyuu_bin,
+                provider.config,
+                work_dir,
+                nzb_out,
+                scope,
+                debug,
+                bdmv or dvd,
+                meta,
+                logs,
+                retry,
+                priority,
+            )
+            for provider in providers
+        ],
+        weights=[provider.weight for provider in providers],
+        workers=[provider.workers for provider in providers],
+    )
+    # Raw articles aren't tied to any config, so they're all reposted with the first one
+    nyuu = uploaders.providers[0]
 
     if clear_resume:  # --clear-resume
         resume.clear_resume()  # Delete resume data
         sys.exit(0)
 
     # Check if there are any raw files from previous runs
-    raw_articles = get_glob_matches(dump, ["*"])
+    raw_articles = [article for dump in dumps for article in get_glob_matches(dump, ["*"])]
     raw_count = len(raw_articles)
 
     # --only-raw
@@ -175,41 +249,37 @@ def main(
         if raw_count == 0:
             logger.info("No raw articles available for reposting")
         else:
-            with progress_bar(console=console, disable=debug) as progress:
-                task_raw = progress.add_task("Raw...", total=raw_count)
-
-                for article in raw_articles:
-                    raw_out = nyuu.repost_raw(article=article)
-
-                    if raw_out.returncode == 0:
-                        logger.success(article.name)
-                    else:
-                        logger.error(article.name)
-
-                    progress.update(task_raw, advance=1)
-                    output[article] = SubprocessOutput(raw=raw_out)
+            output = _repost_raw(
+                raw_articles,
+                nyuu=nyuu,
+                batch_size=raw_batch_size,
+                workers=workers,
+                logger=logger,
+                debug=debug,
+            )
 
         return InternalJuicenetOutput(articles=output)
 
-    if path.is_file():  # juicenet "file.mkv"
-        files = [path]
+    with metrics.stage("discovery"):
+        if path.is_file():  # juicenet "file.mkv"
+            files = [path]
 
-    elif bdmv:  # --bdmv
-        pattern = glob or ["*/"]
-        files = get_bdmv_discs(path, pattern)
+        elif bdmv:  # --bdmv
+            pattern = glob or ["*/"]
+            files = get_bdmv_discs(path, pattern)
 
-    elif dvd:  # --dvd
-        pattern = glob or ["*/"]
-        files = get_dvd_discs(path, pattern)
+        elif dvd:  # --dvd
+            pattern = glob or ["*/"]
+            files = get_dvd_discs(path, pattern)
 
-    elif glob:  # --glob
-        try:
-            files = get_glob_matches(path, glob)
-        except NotImplementedError as error:
-            logger.error(error)
-            sys.exit(1)
-    else:
-        files = get_files(path, exts)
+        elif glob:  # --glob
+            try:
+                files = get_glob_matches(path, glob)
+            except NotImplementedError as error:
+                logger.error(error)
+                sys.exit(1)
+        else:
+            files = get_files(path, exts)
 
     # Remove any par2 files present in the input
     # trying to run ParPar on a par2 file doesn't go well
@@ -243,7 +313,8 @@ def main(
         )
         sys.exit(1)
 
-    files = sorted(resume.filter_uploaded_files(files))
+    with metrics.stage("filter"):
+        files = sorted(resume.filter_uploaded_files(files))
 
     if not files:
         logger.info(
@@ -257,15 +328,17 @@ def main(
 
         # If you're using parpar only then you probably don't want it going in temp
         parpar.workdir = None  # Generate par2 files next to the input files
+        parpar.cache = None
 
         output = {}
 
-        with progress_bar(console=console, disable=debug) as progress:
-            total = len(files)
-            task_parpar = progress.add_task("ParPar...", total=total)
+        with transfer_bar(console=console, disable=debug) as progress:
+            sizes = {file: scan_path(file).size for file in files}
+            task_parpar = TransferTask(progress, "ParPar...", sizes)
 
             for file in files:
-                related_files = get_related_files(file, exts=related_exts)
+                with metrics.stage("related", file):
+                    related_files = get_related_files(file, exts=related_exts)
 
                 if related_files:
                     logger.info(f"Found {len(related_files)} related files")
@@ -273,11 +346,19 @@ def main(
                 else:
                     logger.info(f"No related files found for {file.name}")
 
-                if resume.already_uploaded(file):
+                with metrics.stage("resume", file):
+                    uploaded = resume.already_uploaded(file)
+
+                if uploaded:
                     logger.info(f"Skipping: {file.name} - Already uploaded")
-                    progress.update(task_parpar, advance=1)
+                    task_parpar.advance(file)
+                    metrics.done(file, skipped=True)
                 else:
-                    parpar_out = parpar.generate_par2_files(file, related_files=related_files)
+                    with metrics.stage("parpar", file):
+                        parpar_out = parpar.generate_par2_files(
+                            file, related_files=related_files, on_progress=task_parpar.reporter(file)
+                        )
+                    metrics.record_parpar(file, parpar_out)
 
                     if parpar_out.success:
                         logger.success(file.name)
@@ -286,9 +367,11 @@ def main(
                     else:
                         logger.error(file.name)
 
-                    progress.update(task_parpar, advance=1)
+                    task_parpar.advance(file)
+                    metrics.done(file)
                     output[file] = SubprocessOutput(parpar=parpar_out)
 
+        metrics.finish()
         return InternalJuicenetOutput(files=output)
 
     if only_nyuu:  # --nyuu
@@ -297,16 +380,18 @@ def main(
         # Try to find any pre-existing `.par2` files
         par2files = map_file_to_pars(None, files)
         # Same logic as for --parpar
-        nyuu.workdir = None
+        for uploader in uploaders.providers:
+            uploader.workdir = None
 
         output = {}
 
-        with progress_bar(console=console, disable=debug) as progress:
-            total = len(files)
-            task_nyuu = progress.add_task("Nyuu...", total=total)
+        with transfer_bar(console=console, disable=debug) as progress:
+            sizes = {file: scan_path(file).size for file in files}
+            task_nyuu = TransferTask(progress, "Nyuu...", sizes)
 
-            for file in files:
-                related_files = get_related_files(file, exts=related_exts)
+            def find_related(file: Path) -> list[Path] | None:
+                with metrics.stage("related", file):
+                    related_files = get_related_files(file, exts=related_exts)
 
                 if related_files:
                     logger.info(f"Found {len(related_files)} related files")
@@ -314,120 +399,249 @@ def main(
                 else:
                     logger.info(f"No related files found for {file.name}")
 
-                if resume.already_uploaded(file):
-                    logger.info(f"Skipping: {file.name} - Already uploaded")
-                    progress.update(task_nyuu, advance=1)
+                return related_files
+
+            def upload(file: Path, related_files: list[Path] | None) -> None:
+                with metrics.stage("resume", file):
+                    # Files in progress on another host are skipped too
+                    reason = resume.skip_reason(file)
+
+                if reason is not None:
+                    logger.info(f"Skipping: {file.name} - {reason}")
+                    task_nyuu.advance(file)
+                    metrics.done(file, skipped=True)
                 else:
-                    nyuu_out = nyuu.upload(file=file, related_files=related_files, par2files=par2files[file])
+                    try:
+                        with metrics.stage("nyuu", file), uploaders.use(sizes[file]) as nyuu:
+                            nyuu_out = nyuu.upload(
+                                file=file,
+                                related_files=related_files,
+                                par2files=par2files[file],
+                                on_progress=task_nyuu.reporter(file),
+                            )
+
+                        if nyuu_out.success:
+                            # Only log to resume if process was successful, before anyone else can claim it
+                            resume.log_file_info(file)
+                    finally:
+                        resume.release(file)
+                    metrics.record_nyuu(file, nyuu_out)
 
                     if nyuu_out.success:
                         logger.success(file.name)
-                        # Only log to resume if process was successful
-                        resume.log_file_info(file)
                     else:
                         logger.error(file.name)
 
-                    progress.update(task_nyuu, advance=1)
+                    task_nyuu.advance(file)
+                    metrics.done(file)
                     output[file] = SubprocessOutput(nyuu=nyuu_out)
 
+            Pipeline(find_related, upload, workers=uploaders.capacity).run(files)
+
+        # Workers finish in any order, keep the output in the same order as the input
+        output = {file: output[file] for file in files if file in output}
+
+        metrics.finish()
         return InternalJuicenetOutput(files=output)
 
     if skip_raw:  # --skip-raw
         logger.warning("Raw article checking and reposting is being skipped")
-        output = {}
-
-        with progress_bar(console=console, disable=debug) as progress:
-            total = len(files)
-
-            task_parpar = progress.add_task("ParPar...", total=total)
-            task_nyuu = progress.add_task("Nyuu...", total=total)
-
-            for file in files:
-                related_files = get_related_files(file, exts=related_exts)
-
-                if related_files:
-                    logger.info(f"Found {len(related_files)} related files")
-                    logger.debug(pformat(related_files))
-                else:
-                    logger.info(f"No related files found for {file.name}")
-
-                if resume.already_uploaded(file):
-                    logger.info(f"Skipping: {file.name} - Already uploaded")
-                    progress.update(task_parpar, advance=1)
-                    progress.update(task_nyuu, advance=1)
-                else:
-                    parpar_out = parpar.generate_par2_files(file, related_files=related_files)
-                    progress.update(task_parpar, advance=1)
-                    nyuu_out = nyuu.upload(file=file, related_files=related_files, par2files=parpar_out.par2files)
-
-                    if nyuu_out.success:
-                        logger.success(file.name)
-                        # Only log to resume if process was successful
-                        resume.log_file_info(file)
-                    else:
-                        logger.error(file.name)
-
-                    progress.update(task_nyuu, advance=1)
-                    output[file] = SubprocessOutput(nyuu=nyuu_out, parpar=parpar_out)
-
+        output = _upload_files(
+            files,
+            parpar=parpar,
+            uploaders=uploaders,
+            resume=resume,
+            related_exts=related_exts,
+            lookahead=lookahead,
+            staging=staging,
+            metrics=metrics,
+            logger=logger,
+            debug=debug,
+        )
+        metrics.finish()
         return InternalJuicenetOutput(files=output)
 
     else:  # default
-        output = {}
-
         if raw_count:
             logger.info(f"Found {raw_count} raw article(s). Attempting to Repost...")
 
-            rawoutput = {}
+            rawoutput = _repost_raw(
+                raw_articles,
+                nyuu=nyuu,
+                batch_size=raw_batch_size,
+                workers=workers,
+                logger=logger,
+                debug=debug,
+                transient=True,
+            )
+        else:
+            rawoutput = None
 
-            with progress_bar(console=console, transient=True, disable=debug) as progress:
-                task_raw = progress.add_task("Raw...", total=raw_count)
+        output = _upload_files(
+            files,
+            parpar=parpar,
+            uploaders=uploaders,
+            resume=resume,
+            related_exts=related_exts,
+            lookahead=lookahead,
+            staging=staging,
+            metrics=metrics,
+            logger=logger,
+            debug=debug,
+        )
+        metrics.finish()
+        return InternalJuicenetOutput(files=output, articles=rawoutput)
 
-                for article in raw_articles:
-                    raw_out = nyuu.repost_raw(article=article)
 
-                    if raw_out.returncode == 0:
-                        logger.success(article.name)
-                    else:
-                        logger.error(article.name)
+def _repost_raw(
+    raw_articles: list[Path],
+    *,
+    nyuu: Nyuu,
+    batch_size: int,
+    workers: int,
+    logger: Logger,
+    debug: bool,
+    transient: bool = False,
+) -> dict[Path, SubprocessOutput]:
+    """
+    Repost raw articles from previous runs.
 
-                    progress.update(task_raw, advance=1)
-                    rawoutput[article] = SubprocessOutput(raw=raw_out)
-        else:
-            rawoutput = None
+    Articles are reposted `batch_size` at a time by a single Nyuu process,
+    with up to `workers` Nyuu processes running at the same time.
+    """
+    with progress_bar(console=console, transient=transient, disable=debug) as progress:
+        task_raw = progress.add_task("Raw...", total=len(raw_articles))
 
-        with progress_bar(console=console, disable=debug) as progress:
-            total = len(files)
+        def on_batch_done(batch: dict[Path, RawOutput]) -> None:
+            for article, raw_out in batch.items():
+                if raw_out.success:
+                    logger.success(article.name)
+                else:
+                    logger.error(article.name)
 
-            task_parpar = progress.add_task("ParPar...", total=total)
-            task_nyuu = progress.add_task("Nyuu...", total=total)
+            progress.update(task_raw, advance=len(batch))
 
-            for file in files:
-                related_files = get_related_files(file, exts=related_exts)
+        output = run_in_batches(
+            raw_articles,
+            nyuu.repost_raw_batch,
+            batch_size=batch_size,
+            workers=workers,
+            callback=on_batch_done,
+        )
 
-                if related_files:
-                    logger.info(f"Found {len(related_files)} related files")
-                    logger.debug(pformat(related_files))
-                else:
-                    logger.info(f"No related files found for {file.name}")
+    return {article: SubprocessOutput(raw=raw_out) for article, raw_out in output.items()}
+
+
+def _upload_files(
+    files: list[Path],
+    *,
+    parpar: ParPar,
+    uploaders: Scheduler[Nyuu],
+    resume: Resume,
+    related_exts: list[str],
+    lookahead: int,
+    staging: Staging,
+    metrics: Metrics,
+    logger: Logger,
+    debug: bool,
+) -> dict[Path, SubprocessOutput]:
+    """
+    Generate `.par2` files and upload every file with Nyuu.
 
-                if resume.already_uploaded(file):
-                    logger.info(f"Skipping: {file.name} - Already uploaded")
-                    progress.update(task_parpar, advance=1)
-                    progress.update(task_nyuu, advance=1)
-                else:
-                    parpar_out = parpar.generate_par2_files(file, related_files=related_files)
-                    progress.update(task_parpar, advance=1)
-                    nyuu_out = nyuu.upload(file=file, related_files=related_files, par2files=parpar_out.par2files)
+    ParPar is allowed to run ahead of Nyuu by `lookahead` files so that
+    the par2 files for the next file(s) are ready by the time the current upload finishes,
+    and uploads are spread across the Nyuu config(s) of `uploaders`, each running up to it's own number of workers.
+    ParPar also waits for uploads to free up space whenever `staging` says
+    the next par2 set wouldn't fit in the working directory.
+    """
+    output = {}
 
-                    if nyuu_out.success:
-                        logger.success(file.name)
-                        # Only log to resume if process was successful
-                        resume.log_file_info(file)
-                    else:
-                        logger.error(file.name)
+    with transfer_bar(console=console, disable=debug) as progress:
+        sizes = {file: scan_path(file).size for file in files}
 
-                    progress.update(task_nyuu, advance=1)
-                    output[file] = SubprocessOutput(nyuu=nyuu_out, parpar=parpar_out)
+        task_parpar = TransferTask(progress, "ParPar...", sizes)
+        task_nyuu = TransferTask(progress, "Nyuu...", sizes)
 
-        return InternalJuicenetOutput(files=output, articles=rawoutput)
+        # Why files were skipped by ParPar, for Nyuu to report
+        skipped: dict[Path, str] = {}
+
+        def generate(file: Path) -> tuple[list[Path] | None, ParParOutput | None]:
+            with metrics.stage("related", file):
+                related_files = get_related_files(file, exts=related_exts)
+
+            if related_files:
+                logger.info(f"Found {len(related_files)} related files")
+                logger.debug(pformat(related_files))
+            else:
+                logger.info(f"No related files found for {file.name}")
+
+            with metrics.stage("resume", file):
+                # Files in progress on another host are skipped too
+                reason = resume.skip_reason(file)
+
+            if reason is not None:
+                skipped[file] = reason
+                task_parpar.advance(file)
+                return related_files, None
+
+            try:
+                staging.acquire(file, parpar.get_args(file), related_files)
+                try:
+                    with metrics.stage("parpar", file):
+                        parpar_out = parpar.generate_par2_files(
+                            file, related_files=related_files, on_progress=task_parpar.reporter(file)
+                        )
+                finally:
+                    staging.generated(file)
+            except BaseException:
+                # It's not getting uploaded, free up it's space and let someone else have a go at it
+                staging.release(file)
+                resume.release(file)
+                raise
+            metrics.record_parpar(file, parpar_out)
+            task_parpar.advance(file)
+            return related_files, parpar_out
+
+        def upload(file: Path, generated: tuple[list[Path] | None, ParParOutput | None]) -> None:
+            related_files, parpar_out = generated
+
+            if parpar_out is None:
+                logger.info(f"Skipping: {file.name} - {skipped.pop(file)}")
+                task_nyuu.advance(file)
+                metrics.done(file, skipped=True)
+                return
+
+            success = False
+            try:
+                with metrics.stage("nyuu", file), uploaders.use(sizes[file]) as nyuu:
+                    nyuu_out = nyuu.upload(
+                        file=file,
+                        related_files=related_files,
+                        par2files=parpar_out.par2files,
+                        on_progress=task_nyuu.reporter(file),
+                    )
+
+                success = nyuu_out.success
+                if success:
+                    # Only log to resume if process was successful, before anyone else can claim it
+                    resume.log_file_info(file)
+            finally:
+                if not success:
+                    parpar.discard(parpar_out)
+                staging.release(file)
+                resume.release(file)
+            metrics.record_nyuu(file, nyuu_out)
+
+            if nyuu_out.success:
+                logger.success(file.name)
+            else:
+                logger.error(file.name)
+
+            task_nyuu.advance(file)
+            metrics.done(file)
+            output[file] = SubprocessOutput(nyuu=nyuu_out, parpar=parpar_out)
+
+        Pipeline(generate, upload, lookahead=lookahead, workers=uploaders.capacity).run(files)
+
+    # Workers finish in any order, keep the output in the same order as the input
+    return {file: output[file] for file in files if file in output}
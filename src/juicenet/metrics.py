@@ -0,0 +1,302 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+from loguru import logger
+
+from .types import NyuuOutput, ParParOutput
+from .utils import scan_path
+
+
+@dataclass
+class FileMetrics:
+    """
+    Metrics collected for a single file or folder.
+
+    Attributes
+    ----------
+    file : Path
+        The input file or folder.
+    input_bytes : int
+        Total size of the input in bytes.
+    par2_bytes : int
+        Total size of the `.par2` files generated for it in bytes.
+    durations : dict[str, float]
+        Time spent in every stage (`related`, `resume`, `parpar`, `nyuu`) in seconds.
+    parpar_returncode : int, optional
+        ParPar's exit code or `None` if ParPar wasn't run.
+    nyuu_returncode : int, optional
+        Nyuu's exit code or `None` if Nyuu wasn't run.
+    success : bool
+        `True` if every stage that was run succeeded.
+    skipped : bool
+        `True` if the file was skipped because it was already uploaded.
+    """
+
+    file: Path
+    input_bytes: int = 0
+    par2_bytes: int = 0
+    durations: dict[str, float] = field(default_factory=dict)
+    parpar_returncode: Optional[int] = None
+    nyuu_returncode: Optional[int] = None
+    success: bool = True
+    skipped: bool = False
+
+
+class Metrics:
+    """
+    Collects per stage timing and throughput metrics and exports them.
+
+    Every finished file is appended to `path` as a JSON line, as soon as it's done.
+    At the end of a run, a summary line is appended as well and, if `textfile` is set,
+    a snapshot of the totals is written there in the Prometheus text format
+    for node-exporter's textfile collector.
+
+    Attributes
+    ----------
+    path : Path, optional
+        JSON lines file to append metrics to. Nothing is written if `None`.
+    textfile : Path, optional
+        Prometheus textfile to write the totals to. Nothing is written if `None`.
+    scope : str
+        The scope of the uploads (private or public), added to every record.
+
+    Methods
+    -------
+    stage(name: str, file: Optional[Path] = None) -> Iterator[None]
+        Time a stage of a file (`related`, `resume`, `parpar`, `nyuu`),
+        or of the whole run (`discovery`, `filter`) if `file` is `None`.
+    record_parpar(file: Path, parpar: ParParOutput) -> None
+        Record the outcome of ParPar for a file.
+    record_nyuu(file: Path, nyuu: NyuuOutput) -> None
+        Record the outcome of Nyuu for a file.
+    done(file: Path, skipped: bool = False) -> None
+        Mark a file as done and write it's metrics.
+    finish() -> None
+        Write the summary of the run.
+    """
+
+    def __init__(self, path: Optional[Path], textfile: Optional[Path], scope: str) -> None:
+        self.path = path
+        self.textfile = textfile
+        self.scope = scope
+        self.run_id = uuid4().hex
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._files: dict[Path, FileMetrics] = {}
+        self._stages: dict[str, float] = {}
+        self._stage_seconds: dict[str, float] = {}
+        self._stage_bytes: dict[str, int] = {}
+        self._results = {"success": 0, "failed": 0, "skipped": 0}
+        self._par2_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether metrics are written anywhere at all
+        """
+        return self.path is not None or self.textfile is not None
+
+    def _get(self, file: Path) -> FileMetrics:
+        with self._lock:
+            if file not in self._files:
+                self._files[file] = FileMetrics(file=file, input_bytes=scan_path(file).size)
+            return self._files[file]
+
+    @contextmanager
+    def stage(self, name: str, file: Optional[Path] = None) -> Iterator[None]:
+        """
+        Time a stage of a file, or of the whole run if `file` is `None`
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.enabled:
+                if file is None:
+                    with self._lock:
+                        self._stages[name] = self._stages.get(name, 0) + elapsed
+                else:
+                    metrics = self._get(file)
+                    metrics.durations[name] = metrics.durations.get(name, 0) + elapsed
+
+    def record_parpar(self, file: Path, parpar: ParParOutput) -> None:
+        """
+        Record the outcome of ParPar for a file.
+        This must be called before Nyuu cleans up the `.par2` files.
+        """
+        if self.enabled:
+            metrics = self._get(file)
+            metrics.parpar_returncode = parpar.returncode
+            metrics.par2_bytes = sum(par2.stat().st_size for par2 in parpar.par2files if par2.is_file())
+            metrics.success = metrics.success and parpar.success
+
+    def record_nyuu(self, file: Path, nyuu: NyuuOutput) -> None:
+        """
+        Record the outcome of Nyuu for a file
+        """
+        if self.enabled:
+            metrics = self._get(file)
+            metrics.nyuu_returncode = nyuu.returncode
+            metrics.success = metrics.success and nyuu.success
+
+    def done(self, file: Path, skipped: bool = False) -> None:
+        """
+        Mark a file as done, add it to the totals, and write it's metrics
+        """
+        if not self.enabled:
+            return
+
+        metrics = self._get(file)
+        metrics.skipped = skipped
+
+        with self._lock:
+            self._files.pop(file, None)
+
+            if skipped:
+                self._results["skipped"] += 1
+            elif metrics.success:
+                self._results["success"] += 1
+            else:
+                self._results["failed"] += 1
+
+            stage_bytes = {
+                "parpar": metrics.input_bytes,
+                "nyuu": metrics.input_bytes + metrics.par2_bytes,
+            }
+
+            for stage, seconds in metrics.durations.items():
+                self._stage_seconds[stage] = self._stage_seconds.get(stage, 0) + seconds
+                if stage in stage_bytes:
+                    self._stage_bytes[stage] = self._stage_bytes.get(stage, 0) + stage_bytes[stage]
+
+            self._par2_bytes += metrics.par2_bytes
+
+        self._write(
+            {
+                "type": "file",
+                "run_id": self.run_id,
+                "timestamp": time.time(),
+                "scope": self.scope,
+                "file": str(metrics.file),
+                "input_bytes": metrics.input_bytes,
+                "par2_bytes": metrics.par2_bytes,
+                "durations": metrics.durations,
+                "throughput": {
+                    stage: stage_bytes[stage] / seconds
+                    for stage, seconds in metrics.durations.items()
+                    if stage in stage_bytes and seconds > 0
+                },
+                "parpar_returncode": metrics.parpar_returncode,
+                "nyuu_returncode": metrics.nyuu_returncode,
+                "success": metrics.success and not skipped,
+                "skipped": skipped,
+            }
+        )
+
+        self.write_textfile()
+
+    def finish(self) -> None:
+        """
+        Write the summary of the run
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            summary = {
+                "type": "run",
+                "run_id": self.run_id,
+                "timestamp": time.time(),
+                "scope": self.scope,
+                "duration": time.time() - self._start,
+                "stages": dict(self._stages),
+                "stage_seconds": dict(self._stage_seconds),
+                "stage_bytes": dict(self._stage_bytes),
+                "par2_bytes": self._par2_bytes,
+                "files": dict(self._results),
+            }
+
+        self._write(summary)
+        self.write_textfile()
+
+    def _write(self, record: dict[str, object]) -> None:
+        """
+        Append a record to the JSON lines file
+        """
+        if self.path is None:
+            return
+
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as file:
+                    file.write(line)
+        except OSError as error:
+            # Metrics are never worth failing an upload over
+            logger.warning(f"Failed to write metrics to {self.path}: {error}")
+
+    def write_textfile(self) -> None:
+        """
+        Write the totals so far to the Prometheus textfile.
+        The file is replaced atomically so node-exporter never reads a partial file.
+        """
+        if self.textfile is None:
+            return
+
+        labels = f'scope="{self.scope}"'
+
+        with self._lock:
+            lines = [
+                "# HELP juicenet_run_start_timestamp_seconds Unix time the current run started.",
+                "# TYPE juicenet_run_start_timestamp_seconds gauge",
+                f"juicenet_run_start_timestamp_seconds{{{labels}}} {self._start}",
+                "# HELP juicenet_run_duration_seconds Time elapsed since the current run started.",
+                "# TYPE juicenet_run_duration_seconds gauge",
+                f"juicenet_run_duration_seconds{{{labels}}} {time.time() - self._start}",
+                "# HELP juicenet_files Number of files processed in the current run by result.",
+                "# TYPE juicenet_files gauge",
+                *(f'juicenet_files{{{labels},result="{result}"}} {count}' for result, count in self._results.items()),
+                "# HELP juicenet_stage_seconds Time spent in every stage in the current run.",
+                "# TYPE juicenet_stage_seconds gauge",
+                *(
+                    f'juicenet_stage_seconds{{{labels},stage="{stage}"}} {seconds}'
+                    for stage, seconds in {**self._stages, **self._stage_seconds}.items()
+                ),
+                "# HELP juicenet_stage_bytes Bytes processed by every stage in the current run.",
+                "# TYPE juicenet_stage_bytes gauge",
+                *(
+                    f'juicenet_stage_bytes{{{labels},stage="{stage}"}} {size}'
+                    for stage, size in self._stage_bytes.items()
+                ),
+                "# HELP juicenet_stage_throughput_bytes_per_second Average throughput of every stage in the current run.",
+                "# TYPE juicenet_stage_throughput_bytes_per_second gauge",
+                *(
+                    f'juicenet_stage_throughput_bytes_per_second{{{labels},stage="{stage}"}} '
+                    f"{size / self._stage_seconds[stage]}"
+                    for stage, size in self._stage_bytes.items()
+                    if self._stage_seconds.get(stage)
+                ),
+                "# HELP juicenet_par2_bytes Bytes of par2 files generated in the current run.",
+                "# TYPE juicenet_par2_bytes gauge",
+                f"juicenet_par2_bytes{{{labels}}} {self._par2_bytes}",
+            ]
+
+        tmp = self.textfile.with_name(f".{self.textfile.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        try:
+            self.textfile.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            tmp.replace(self.textfile)
+        except OSError as error:
+            logger.warning(f"Failed to write metrics to {self.textfile}: {error}")
@@ -1,12 +1,75 @@
 from pathlib import Path
 from shutil import which
 from tempfile import TemporaryDirectory
-from typing import Annotated, Optional
+from typing import Annotated, Literal, Optional
 
 from pydantic import BaseModel, DirectoryPath, Field, FilePath, field_validator
 
 
 # fmt: off
+class NyuuProvider(BaseModel):
+    """
+    A Nyuu config that uploads are spread across, i.e, one for every posting account or provider
+
+    Attributes
+    ----------
+    config : FilePath
+        The path to the Nyuu configuration file
+    scope : Literal["private", "public"], optional
+        The scope this config is used for. Default is `"private"`
+    weight : float, optional
+        The share of bytes uploaded with this config, relative to the other configs of the same scope. Default is `1`
+    workers : int, optional
+        The number of Nyuu processes allowed to run with this config at the same time. Default is `1`
+    """
+
+    config: FilePath
+    """The path to the Nyuu configuration file"""
+
+    scope: Literal["private", "public"] = "private"
+    """The scope this config is used for, i.e, `--public` runs only use the `public` ones"""
+
+    weight: Annotated[float, Field(gt=0)] = 1
+    """
+    The share of bytes uploaded with this config, relative to the other configs of the same scope.
+    A config with a weight of `2` gets about twice as many bytes as one with a weight of `1`
+    """
+
+    workers: Annotated[int, Field(ge=1)] = 1
+    """
+    The number of Nyuu processes allowed to run with this config at the same time.
+    Every process opens as many connections as defined in the Nyuu config, so this should respect the account's connection cap
+    """
+
+    @field_validator("config")
+    @classmethod
+    def resolve_path(cls, path: Path) -> Path:
+            """Resolve the path to the Nyuu config"""
+            return path.expanduser().resolve()
+
+
+class ParParProfile(BaseModel):
+    """
+    ParPar arguments for inputs up to a certain size
+
+    Attributes
+    ----------
+    max_size : int, optional
+        The total size in bytes of the largest input this profile is used for. No limit if `None`
+    args : list[str]
+        The arguments to be passed to the ParPar executable instead of `parpar_args`
+    """
+
+    max_size: Optional[Annotated[int, Field(ge=0)]] = None
+    """The total size in bytes of the largest input this profile is used for. No limit if `None`"""
+
+    args: list[str]
+    """
+    The arguments to be passed to the ParPar executable instead of `parpar_args`,
+    i.e, a slice size, recovery amount, and memory limit that suit inputs of this size
+    """
+
+
 class JuicenetConfig(BaseModel):
     """
     Pydantic model for setting defaults and validating Juicenet's config
@@ -33,18 +96,66 @@ class JuicenetConfig(BaseModel):
     parpar_args : list[str], optional
         The arguments to be passed to the ParPar executable
         Ddefault is `["--overwrite", "-s700k", "--slice-size-multiple=700K", "--max-input-slices=4000", "-r1n*1.2", "-R"]`
+    parpar_profiles : list[ParParProfile], optional
+        ParPar arguments to use instead of `parpar_args` depending on the total size of the input
+    parpar_governor : bool, optional
+        Whether to limit ParPar's threads and memory to the CPUs and memory juicenet is allowed to use. Default is `True`
+    child_nice : int, optional
+        The niceness ParPar and Nyuu are run with, from `0` to `19`
+    child_ionice : Literal["best-effort", "idle"], optional
+        The IO scheduling class ParPar and Nyuu are run with
     use_temp_dir : bool, optional
         Whether or not to use a temporary directory for processing. Default is `True`
     temp_dir_path : DirectoryPath, optional
         Path to a specific temporary directory if `use_temp_dir` is `True`. If unspecified, it uses `%Temp%` or `/tmp`
     appdata_dir_path : Path, optional
         The path to the folder where Juicenet will store its data. Default is `~/.juicenet`
+    parpar_lookahead : int, optional
+        The number of files ParPar is allowed to process ahead of Nyuu. Default is `0`
+    nyuu_workers : int, optional
+        The number of Nyuu processes allowed to run at the same time. Default is `1`
+    nyuu_providers : list[NyuuProvider], optional
+        Nyuu configs that uploads are spread across instead of using `nyuu_config_private` or `nyuu_config_public`
+    nyuu_attempts : int, optional
+        The number of times an upload is attempted before it's considered failed. Default is `3`
+    nyuu_retry_backoff : float, optional
+        The number of seconds to wait before retrying a failed upload, doubled after every attempt. Default is `30`
+    nyuu_retry_backoff_max : float, optional
+        The maximum number of seconds to wait between attempts. Default is `600`
+    raw_batch_size : int, optional
+        The number of raw articles reposted by a single Nyuu process. Default is `100`
+    resume_mode : Literal["name", "fingerprint"], optional
+        How resume identifies already uploaded files. Default is `"name"`
+    resume_lease : int, optional
+        The number of seconds a claim on a file in progress lasts without being renewed. `0` disables claims. Default is `600`
+    resume_shared : bool, optional
+        Whether the resume database is shared between hosts over a network filesystem. Default is `False`
+    metrics_path : Path, optional
+        The path to a JSON lines file where per file timing and throughput metrics are appended
+    metrics_textfile_path : Path, optional
+        The path to a Prometheus textfile where a summary of the metrics is written
+    output_tail_size : int, optional
+        The number of characters of ParPar's and Nyuu's stdout and stderr kept in memory. Default is `65536`
+    output_logs_kept : int, optional
+        The number of per process log files with ParPar's and Nyuu's complete output to keep. Default is `1000`
+    staging_reserve : int, optional
+        The number of bytes to always leave free where par2 files are generated. Default is `1073741824`
+    par2_cache_dir : Path, optional
+        The path where par2 files are generated and kept until they're uploaded, so failed uploads can reuse them
+    par2_cache_max_age : int, optional
+        The number of days after which par2 files that were never uploaded are evicted. Default is `7`
+    par2_cache_max_size : int, optional
+        The total number of bytes of cached par2 files above which the oldest ones are evicted. Default is `53687091200`
+    serve_roots : list[Path], optional
+        The folders `juicenet serve` accepts jobs for. Required by `juicenet serve`
+    serve_token : str, optional
+        The token clients of `juicenet serve` have to send over TCP. Generated if unspecified
     """
 
-    parpar: Annotated[FilePath, Field(validate_default=True)] = which("parpar") # type: ignore
+    parpar: Annotated[FilePath, Field(default_factory=lambda: which("parpar"), validate_default=True)]
     """The path to the ParPar executable"""
 
-    nyuu: Annotated[FilePath, Field(validate_default=True)] = which("nyuu") # type: ignore
+    nyuu: Annotated[FilePath, Field(default_factory=lambda: which("nyuu"), validate_default=True)]
     """The path to the Nyuu executable"""
 
     nyuu_config_private: FilePath
@@ -69,16 +180,167 @@ class JuicenetConfig(BaseModel):
     parpar_args: list[str] = ["--overwrite", "-s700k", "--slice-size-multiple=700K", "--max-input-slices=4000", "-r1n*1.2", "-R"]
     """The arguments to be passed to the ParPar executable"""
 
+    parpar_profiles: list[ParParProfile] = []
+    """
+    ParPar arguments to use instead of `parpar_args` depending on the total size of the input.
+    Every input uses the profile with the smallest `max_size` it fits in, and `parpar_args` if it doesn't fit in any
+    """
+
+    parpar_governor: bool = True
+    """
+    Whether to pass ParPar `--threads` and `--memory` that fit the CPUs and memory juicenet is allowed to use,
+    as set by the CPU affinity and the cgroup v2 CPU quota and memory limit (i.e, in Docker).
+    They're split between ParPar processes that run at the same time: the CLI, `juicenet watch`, and `JuicenetSession.upload_many()`
+    run one at a time and give it everything, `JuicenetSession.upload_many_async()` runs one per Nyuu worker,
+    and `juicenet serve` runs one per scope. Anything already in the ParPar arguments is kept
+    """
+
+    child_nice: Optional[Annotated[int, Field(ge=0, le=19)]] = None
+    """
+    The niceness ParPar and Nyuu are run with, from `0` (normal) to `19` (lowest priority), through `nice`.
+    Unchanged if `None`
+    """
+
+    child_ionice: Optional[Literal["best-effort", "idle"]] = None
+    """
+    The IO scheduling class ParPar and Nyuu are run with, through `ionice`.
+    `best-effort` uses it's lowest priority and `idle` only gets disk time nothing else wants. Unchanged if `None`
+    """
+
     use_temp_dir: bool = True
     """Whether or not to use a temporary directory for processing"""
 
-    temp_dir_path: DirectoryPath = Path(TemporaryDirectory(prefix=".JUICENET_").name).resolve()
+    temp_dir_path: Annotated[DirectoryPath, Field(default_factory=lambda: Path(TemporaryDirectory(prefix=".JUICENET_").name).resolve())]
     """Path to a specific temporary directory if use_temp_dir is True. If unspecified, it uses %Temp% or /tmp"""
 
     appdata_dir_path: Path = Path.home() / ".juicenet"
     """The path to the folder where juicenet will store it's data"""
 
-    @field_validator("parpar", "nyuu", "nyuu_config_private", "nzb_output_path", "nyuu_config_public", "temp_dir_path", "appdata_dir_path")
+    parpar_lookahead: Annotated[int, Field(ge=0)] = 0
+    """
+    The number of files ParPar is allowed to process ahead of Nyuu.
+    `0` runs ParPar and Nyuu one after the other, `1` generates the par2 files
+    for the next file while the current one is being uploaded, and so on
+    """
+
+    nyuu_workers: Annotated[int, Field(ge=1)] = 1
+    """
+    The number of Nyuu processes allowed to run at the same time.
+    Keep in mind that every process opens as many connections as defined in your Nyuu config
+    """
+
+    nyuu_providers: list[NyuuProvider] = []
+    """
+    Nyuu configs that uploads are spread across at the same time, each with it's own weight and number of workers.
+    If there are any for the scope of a run, they're used instead of `nyuu_config_private` or `nyuu_config_public`
+    and `nyuu_workers` is replaced by the sum of their workers
+    """
+
+    nyuu_attempts: Annotated[int, Field(ge=1)] = 3
+    """
+    The number of times an upload is attempted before it's considered failed. `1` disables retrying.
+    Failures that would happen again anyway, like invalid arguments or rejected credentials, are never retried
+    """
+
+    nyuu_retry_backoff: Annotated[float, Field(ge=0)] = 30
+    """The number of seconds to wait before retrying a failed upload, doubled after every failed attempt"""
+
+    nyuu_retry_backoff_max: Annotated[float, Field(ge=0)] = 600
+    """The maximum number of seconds to wait between attempts"""
+
+    raw_batch_size: Annotated[int, Field(ge=1)] = 100
+    """The number of raw articles reposted by a single Nyuu process"""
+
+    resume_mode: Literal["name", "fingerprint"] = "name"
+    """
+    How resume identifies already uploaded files.
+    `name` uses the name, size, and file count while `fingerprint` uses a hash sampled from the contents,
+    which catches renamed files and files that happen to share a name and size.
+    Switching to `fingerprint` keeps the existing history: a file uploaded before the switch is recognized
+    by it's name, size, and file count the first time it's seen and by it's fingerprint from then on
+    """
+
+    resume_lease: Annotated[int, Field(ge=0)] = 600
+    """
+    The number of seconds a claim on a file lasts without being renewed.
+    Files are claimed before their par2 files are generated and other processes, or hosts sharing `appdata_dir_path`,
+    skip claimed files. Claims are renewed in the background while they're held, so this only decides how long
+    the files of a process that crashed or lost it's connection stay skipped. `0` disables claims
+    """
+
+    resume_shared: bool = False
+    """
+    Whether the resume database is shared between hosts, i.e, `appdata_dir_path` is on a network filesystem.
+    SQLite's WAL mode can't work across hosts, so a rollback journal is used instead.
+    The filesystem has to support locking (i.e, NFS with `lockd`, SMB)
+    """
+
+    metrics_path: Optional[Path] = None
+    """
+    The path to a JSON lines file where per file stage durations, input and par2 bytes,
+    and exit codes are appended, followed by a summary at the end of every run
+    """
+
+    metrics_textfile_path: Optional[Path] = None
+    """
+    The path to a Prometheus textfile (for node-exporter's textfile collector)
+    where a summary of the metrics is written. Should end in `.prom`
+    """
+
+    output_tail_size: Annotated[int, Field(ge=0)] = 64 * 1024
+    """
+    The number of characters of ParPar's and Nyuu's stdout and stderr kept in memory for every process.
+    The complete output is written to a log file in `appdata_dir_path/logs` instead
+    """
+
+    output_logs_kept: Annotated[int, Field(ge=0)] = 1000
+    """
+    The number of per process log files with ParPar's and Nyuu's complete output to keep.
+    Older ones are deleted as new ones are written. `0` disables these log files
+    """
+
+    staging_reserve: Annotated[int, Field(ge=0)] = 1024**3
+    """
+    The number of bytes to always leave free on the filesystem where par2 files are generated.
+    ParPar waits for uploads to finish and free up space if the estimated size
+    of the next par2 set would eat into this
+    """
+
+    par2_cache_dir: Optional[Path] = None
+    """
+    The path where par2 files are generated and kept until they're uploaded.
+    A failed upload leaves it's par2 files here and the next attempt reuses them
+    as long as the input files and `parpar_args` haven't changed. Disabled if `None`
+    """
+
+    par2_cache_max_age: Annotated[int, Field(ge=0)] = 7
+    """The number of days after which par2 files that were never uploaded are evicted from `par2_cache_dir`"""
+
+    par2_cache_max_size: Annotated[int, Field(ge=0)] = 50 * 1024**3
+    """
+    The total number of bytes of par2 files in `par2_cache_dir` above which the oldest ones are evicted.
+    ParPar also waits for uploads to finish if the next par2 set wouldn't fit in it
+    """
+
+    serve_roots: list[Path] = []
+    """
+    The folders `juicenet serve` accepts jobs for. A job is refused unless it's path is inside one of them,
+    after following symlinks. `juicenet serve` refuses to start if this is empty
+    """
+
+    serve_token: Optional[str] = None
+    """
+    The token clients of `juicenet serve` have to send as `Authorization: Bearer <token>` when it listens on TCP.
+    If `None`, a random one is generated and written to `juicenet.serve.token` in `appdata_dir_path`
+    """
+
+    @field_validator("serve_roots")
+    @classmethod
+    def resolve_paths(cls, paths: list[Path]) -> list[Path]:
+            """Resolve all given Path list fields"""
+            return [path.expanduser().resolve() for path in paths]
+
+    @field_validator("parpar", "nyuu", "nyuu_config_private", "nzb_output_path", "nyuu_config_public", "temp_dir_path", "appdata_dir_path", "metrics_path", "metrics_textfile_path", "par2_cache_dir")
     @classmethod
     def resolve_path(cls, path: Path) -> Path:
             """Resolve all given Path fields"""
@@ -1,11 +1,17 @@
+import asyncio
 import shlex
 import shutil
 import subprocess
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
+from uuid import uuid4
 
 from loguru import logger
 
+from .process import TAIL_SIZE, OutputLogs, run, run_async
+from .resources import Priority
+from .retry import RetryPolicy
 from .types import ArticleFilePath, NyuuOutput, NZBFilePath, PAR2FilePath, RawOutput
 from .utils import delete_files
 
@@ -34,13 +40,25 @@ class Nyuu:
         Flag indicating whether to use different naming for BDMVs.
     meta : list[str], optional
         List of <meta> tags to add to NZB head.
+    logs : OutputLogs, optional
+        Where to write Nyuu's complete output. Only a bounded tail is kept in memory either way.
+    retry : RetryPolicy, optional
+        How failed uploads are retried. Uploads are only attempted once if `None`.
+    priority : Priority, optional
+        CPU and IO priority to run Nyuu with.
 
     Methods
     -------
     upload(file: Path, par2files: list[PAR2FilePath], delete_par2files: bool = True) -> NyuuOutput
         Upload files to Usenet with Nyuu.
+    upload_async(file: Path, par2files: list[PAR2FilePath], delete_par2files: bool = True) -> NyuuOutput
+        Upload files to Usenet with Nyuu without blocking the event loop.
     repost_raw(article: ArticleFilePath) -> RawOutput
         Repost failed articles from the last run.
+    repost_raw_batch(articles: list[ArticleFilePath]) -> dict[ArticleFilePath, RawOutput]
+        Repost several failed articles from the last run with a single Nyuu process.
+    repost_raw_batch_async(articles: list[ArticleFilePath]) -> dict[ArticleFilePath, RawOutput]
+        Repost several failed articles from the last run without blocking the event loop.
     """
 
     def __init__(
@@ -54,6 +72,9 @@ class Nyuu:
         debug: bool,
         bdmv_naming: bool,
         meta: Optional[list[str]] = None,
+        logs: Optional[OutputLogs] = None,
+        retry: Optional[RetryPolicy] = None,
+        priority: Optional[Priority] = None,
     ) -> None:
         self.path = path
         self.bin = bin
@@ -64,6 +85,32 @@ class Nyuu:
         self.debug = debug
         self.bdmv_naming = bdmv_naming
         self.meta = meta
+        self.logs = logs
+        self.retry = retry or RetryPolicy()
+        self.priority = priority
+
+    @property
+    def executable(self) -> list[Any]:
+        """
+        Nyuu's binary, prefixed with whatever sets it's CPU and IO priority
+        """
+        prefix = self.priority.get_prefix() if self.priority else []
+        return [*prefix, self.bin]
+
+    @property
+    def tail(self) -> int:
+        """
+        Number of characters of Nyuu's stdout and stderr kept in memory
+        """
+        return self.logs.tail if self.logs else TAIL_SIZE
+
+    def _get_log(self, name: str) -> Optional[Path]:
+        """
+        Reserve a log file for a Nyuu process, unless it's output isn't being captured
+        """
+        if self.logs and not self.debug:
+            return self.logs.new("nyuu", name)
+        return None
 
     def _move_nzb(self, file: Path, basedir: Path, clean_nzb: str, nzb: str) -> NZBFilePath:
         """
@@ -74,7 +121,7 @@ class Nyuu:
         subdir = file.relative_to(self.path)  # /extras/specials/episode.mkv
         subdir = subdir.parent  # /extras/specials/
 
-        src = self.workdir / clean_nzb if self.workdir else basedir / clean_nzb
+        src = basedir / clean_nzb
         dst = self.outdir / self.scope / self.path.name / subdir  # ./out/private/show/extras/specials/
         dst.mkdir(parents=True, exist_ok=True)
         dst = dst / nzb  # ./out/private/show/extras/specials/episode.mkv.nzb
@@ -84,20 +131,44 @@ class Nyuu:
 
         return dst.resolve()
 
-    def upload(
+    def _get_workdir(self, file: Path) -> Path:
+        """
+        Get the working directory. This is where Nyuu
+        will be executed and the NZB will be written to
+
+        Several uploads can run at the same time and their NZBs
+        can share the same name, so every upload gets it's own
+        folder when using a seperate working and/or temporary directory.
+        """
+        if self.workdir:
+            cwd = self.workdir / uuid4().hex.upper()[:10]
+            cwd.mkdir(parents=True, exist_ok=True)
+            return cwd
+        else:
+            return file.parent
+
+    def _remove_workdir(self, cwd: Path) -> None:
+        """
+        Remove the working directory of an upload once it's done, whether it succeeded or not.
+        Only the folders made by `_get_workdir()` are removed, never the input's own folder.
+        """
+        if self.workdir:
+            shutil.rmtree(cwd, ignore_errors=True)
+
+    def _get_upload_command(
         self,
         file: Path,
         par2files: list[PAR2FilePath],
         related_files: Optional[list[Path]] = None,
-        *,
-        delete_par2files: bool = True,
-    ) -> NyuuOutput:
-        """
-        Upload files to Usenet with Nyuu
+        progress: bool = False,
+    ) -> tuple[list[Any], str, str]:
         """
+        Build the Nyuu command for uploading the given file along with
+        the final and the Nyuu friendly name of it's NZB
 
-        capture_output = not self.debug
-
+        Nyuu only reports it's progress to a terminal by default,
+        so `progress` asks it to always report it to stderr.
+        """
         nzb = f"{file.name}.nzb"
         clean_nzb = nzb.replace("`", "'")  # Nyuu doesn't like backticks
 
@@ -119,13 +190,58 @@ class Nyuu:
             for m in self.meta:
                 meta += ["--meta", m]
 
-        nyuu = [self.bin] + ["--config", self.conf] + ["--out", clean_nzb] + meta + files + par2files
+        report = ["--progress", "stderr"] if progress else []
+
+        nyuu = self.executable + ["--config", self.conf] + ["--out", clean_nzb] + report + meta + files + par2files
 
         logger.debug(shlex.join(str(arg) for arg in nyuu))
 
-        cwd = self.workdir if self.workdir else file.parent  # this is where nyuu will be executed
-        process = subprocess.run(nyuu, cwd=cwd, capture_output=capture_output, encoding="utf-8")  # type: ignore
+        return nyuu, nzb, clean_nzb
 
+    def _should_retry(
+        self,
+        file: Path,
+        cwd: Path,
+        clean_nzb: str,
+        attempt: int,
+        process: subprocess.CompletedProcess[str],
+        existing_nzb: bool,
+    ) -> Optional[float]:
+        """
+        Get the number of seconds to wait before trying a failed upload again, or `None` if it shouldn't be.
+        The retry uses the same working directory and par2 files, minus the NZB the failed attempt left behind.
+
+        An NZB that was already there before the first attempt isn't ours to delete, and Nyuu refuses
+        to overwrite it, so the upload isn't retried at all.
+        """
+        if process.returncode in [0, 32] or existing_nzb or not self.retry.should_retry(attempt, process):
+            return None
+
+        # Nyuu refuses to overwrite an existing NZB
+        (cwd / clean_nzb).unlink(missing_ok=True)
+
+        delay = self.retry.delay(attempt)
+        logger.warning(
+            f"Upload of {file.name} failed with exit code {process.returncode} "
+            f"(attempt {attempt}/{self.retry.attempts}), retrying in {delay:g}s"
+        )
+        return delay
+
+    def _get_upload_output(
+        self,
+        file: Path,
+        cwd: Path,
+        nzb: str,
+        clean_nzb: str,
+        par2files: list[PAR2FilePath],
+        process: subprocess.CompletedProcess[str],
+        delete_par2files: bool,
+        log: Optional[Path],
+        attempts: int = 1,
+    ) -> NyuuOutput:
+        """
+        Move the NZB to the output directory and clean up after a finished upload
+        """
         if process.returncode in [0, 32]:
             # move completed nzb to output dir
             outpath = self._move_nzb(file=file, basedir=cwd, clean_nzb=clean_nzb, nzb=nzb)
@@ -141,6 +257,8 @@ class Nyuu:
                 returncode=process.returncode,
                 stdout=process.stdout,
                 stderr=process.stderr,
+                log=log,
+                attempts=attempts,
             )
         else:
             return NyuuOutput(
@@ -150,7 +268,97 @@ class Nyuu:
                 returncode=process.returncode,
                 stdout=process.stdout,
                 stderr=process.stderr,
+                log=log,
+                attempts=attempts,
+            )
+
+    def upload(
+        self,
+        file: Path,
+        par2files: list[PAR2FilePath],
+        related_files: Optional[list[Path]] = None,
+        *,
+        delete_par2files: bool = True,
+        on_progress: Optional[Callable[[float], None]] = None,
+    ) -> NyuuOutput:
+        """
+        Upload files to Usenet with Nyuu
+
+        `on_progress` is called with Nyuu's progress (between 0 and 1) as it's reported.
+        Failed uploads are retried as set by `retry`, in the same working directory with the same par2 files.
+        """
+
+        capture_output = not self.debug
+
+        progress = on_progress is not None and capture_output
+        nyuu, nzb, clean_nzb = self._get_upload_command(file, par2files, related_files, progress)
+
+        cwd = self._get_workdir(file)  # this is where nyuu will be executed
+        existing_nzb = (cwd / clean_nzb).exists()
+
+        try:
+            attempt = 1
+            while True:
+                log = self._get_log(file.name)
+                process = run(
+                    nyuu, cwd=cwd, capture_output=capture_output, on_progress=on_progress, log=log, tail=self.tail
+                )
+
+                delay = self._should_retry(file, cwd, clean_nzb, attempt, process, existing_nzb)
+                if delay is None:
+                    break
+
+                time.sleep(delay)
+                attempt += 1
+
+            return self._get_upload_output(
+                file, cwd, nzb, clean_nzb, par2files, process, delete_par2files, log, attempt
+            )
+        finally:
+            self._remove_workdir(cwd)
+
+    async def upload_async(
+        self,
+        file: Path,
+        par2files: list[PAR2FilePath],
+        related_files: Optional[list[Path]] = None,
+        *,
+        delete_par2files: bool = True,
+        on_progress: Optional[Callable[[float], None]] = None,
+    ) -> NyuuOutput:
+        """
+        Asynchronous version of `Nyuu.upload()`.
+        Nyuu is killed if the awaiting task is cancelled.
+        """
+
+        capture_output = not self.debug
+
+        progress = on_progress is not None and capture_output
+        nyuu, nzb, clean_nzb = self._get_upload_command(file, par2files, related_files, progress)
+
+        cwd = self._get_workdir(file)  # this is where nyuu will be executed
+        existing_nzb = (cwd / clean_nzb).exists()
+
+        try:
+            attempt = 1
+            while True:
+                log = self._get_log(file.name)
+                process = await run_async(
+                    nyuu, cwd=cwd, capture_output=capture_output, on_progress=on_progress, log=log, tail=self.tail
+                )
+
+                delay = self._should_retry(file, cwd, clean_nzb, attempt, process, existing_nzb)
+                if delay is None:
+                    break
+
+                await asyncio.sleep(delay)
+                attempt += 1
+
+            return self._get_upload_output(
+                file, cwd, nzb, clean_nzb, par2files, process, delete_par2files, log, attempt
             )
+        finally:
+            self._remove_workdir(cwd)
 
     def repost_raw(self, article: ArticleFilePath) -> RawOutput:
         """
@@ -159,7 +367,7 @@ class Nyuu:
         capture_output = not self.debug
 
         nyuu = (
-            [self.bin]
+            self.executable
             + ["--config", self.conf]
             + [
                 "--delete-raw-posts",
@@ -170,7 +378,8 @@ class Nyuu:
 
         logger.debug(shlex.join(str(arg) for arg in nyuu))
 
-        process = subprocess.run(nyuu, capture_output=capture_output, encoding="utf-8")  # type: ignore
+        log = self._get_log(article.name)
+        process = run(nyuu, capture_output=capture_output, log=log, tail=self.tail)
 
         if process.returncode in [0, 32]:
             return RawOutput(
@@ -180,6 +389,7 @@ class Nyuu:
                 returncode=process.returncode,
                 stdout=process.stdout,
                 stderr=process.stderr,
+                log=log,
             )
         else:
             return RawOutput(
@@ -189,4 +399,74 @@ class Nyuu:
                 returncode=process.returncode,
                 stdout=process.stdout,
                 stderr=process.stderr,
+                log=log,
             )
+
+    def _get_raw_batch_command(self, articles: list[ArticleFilePath]) -> list[Any]:
+        """
+        Build the Nyuu command for reposting several raw articles at once
+        """
+        nyuu = (
+            self.executable
+            + ["--config", self.conf]
+            + ["--delete-raw-posts", "--input-raw-posts"]
+            + [article.resolve() for article in articles]
+        )
+
+        logger.debug(shlex.join(str(arg) for arg in nyuu))
+
+        return nyuu
+
+    @staticmethod
+    def _get_raw_batch_output(
+        articles: list[ArticleFilePath], process: subprocess.CompletedProcess[str], log: Optional[Path]
+    ) -> dict[ArticleFilePath, RawOutput]:
+        """
+        Nyuu deletes every article it manages to post (`--delete-raw-posts`), so an article
+        is considered successful if Nyuu exited successfully or if the article is gone afterwards.
+        """
+        output = {}
+
+        for article in articles:
+            success = process.returncode in [0, 32] or not article.exists()
+            output[article] = RawOutput(
+                article=article.resolve(),
+                success=success,
+                args=process.args,
+                returncode=process.returncode,
+                stdout=process.stdout,
+                stderr=process.stderr,
+                log=log,
+            )
+
+        return output
+
+    def repost_raw_batch(self, articles: list[ArticleFilePath]) -> dict[ArticleFilePath, RawOutput]:
+        """
+        Try to repost several failed articles from last run with a single Nyuu process
+
+        Starting Node and connecting to the server for every single article is slow,
+        so this passes all of them to one Nyuu process instead.
+        """
+        capture_output = not self.debug
+
+        nyuu = self._get_raw_batch_command(articles)
+
+        log = self._get_log("raw")
+        process = run(nyuu, capture_output=capture_output, log=log, tail=self.tail)
+
+        return self._get_raw_batch_output(articles, process, log)
+
+    async def repost_raw_batch_async(self, articles: list[ArticleFilePath]) -> dict[ArticleFilePath, RawOutput]:
+        """
+        Asynchronous version of `Nyuu.repost_raw_batch()`.
+        Nyuu is killed if the awaiting task is cancelled.
+        """
+        capture_output = not self.debug
+
+        nyuu = self._get_raw_batch_command(articles)
+
+        log = self._get_log("raw")
+        process = await run_async(nyuu, capture_output=capture_output, log=log, tail=self.tail)
+
+        return self._get_raw_batch_output(articles, process, log)
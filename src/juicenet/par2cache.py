@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from .utils import scan_path
+
+MANIFEST = "manifest.json"
+
+
+class Par2Cache:
+    """
+    A directory of `.par2` sets that haven't been uploaded yet, so a failed upload
+    can be retried without generating them all over again.
+
+    Every set lives in it's own folder named after a key made from the identity of the input
+    (path, size, and modification time of every file, including related files) and ParPar's arguments.
+    ParPar writes straight into that folder and a manifest with the name and size of every `.par2` file
+    is added once it succeeds. A set is only reused if it still matches it's manifest.
+
+    Nyuu deletes the `.par2` files after a successful upload, which leaves only the manifest behind.
+    Those leftovers, sets older than `max_age` seconds, and the oldest sets past `max_size` bytes
+    in total are evicted whenever a new set is stored.
+
+    Attributes
+    ----------
+    path : Path
+        Directory where the `.par2` sets are kept.
+    max_age : float
+        Number of seconds after which a set is evicted.
+    max_size : int
+        Total size in bytes of all sets above which the oldest ones are evicted.
+
+    Methods
+    -------
+    key(file: Path, related_files: Optional[list[Path]], args: list[str]) -> str
+        Get the key of a file's `.par2` set.
+    entry(key: str) -> Path
+        Get an empty folder for ParPar to generate a set in.
+    lookup(key: str) -> Optional[list[Path]]
+        Get the `.par2` files of a set if it's complete.
+    store(key: str, par2files: list[Path]) -> None
+        Mark a set as complete and evict stale sets.
+    size() -> int
+        Get the total size of every set in the cache.
+    """
+
+    def __init__(self, path: Path, max_age: float, max_size: int) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(file: Path, related_files: Optional[list[Path]], args: list[str]) -> str:
+        """
+        Get the key of a file's `.par2` set from the identity of it's input and ParPar's arguments
+        """
+        members = [*scan_path(file).files, *(related_files or [])]
+        identity = []
+
+        for member in members:
+            stat = member.stat()
+            identity.append([str(member.resolve()), stat.st_size, stat.st_mtime_ns])
+
+        data = json.dumps({"file": str(file.resolve()), "members": identity, "args": args})
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+    def entry(self, key: str) -> Path:
+        """
+        Get an empty folder for ParPar to generate a set in, removing any incomplete set left there
+        """
+        entry = self.path / key
+        shutil.rmtree(entry, ignore_errors=True)
+        entry.mkdir(parents=True, exist_ok=True)
+        return entry
+
+    def lookup(self, key: str) -> Optional[list[Path]]:
+        """
+        Get the `.par2` files of a set if every one of them still matches the manifest
+        """
+        entry = self.path / key
+
+        try:
+            manifest = json.loads((entry / MANIFEST).read_text(encoding="utf-8"))
+            par2files = []
+            for name, size in manifest["files"].items():
+                par2file = entry / name
+                if par2file.stat().st_size != size:
+                    raise ValueError(f"{par2file} doesn't match the manifest")
+                par2files.append(par2file)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            if entry.exists():
+                logger.debug(f"Discarding par2 cache entry {key}: {error}")
+                shutil.rmtree(entry, ignore_errors=True)
+            return None
+
+        return sorted(par2files) if par2files else None
+
+    def store(self, key: str, par2files: list[Path]) -> None:
+        """
+        Write the manifest of a set that was generated successfully and evict stale sets
+        """
+        manifest = {"files": {par2file.name: par2file.stat().st_size for par2file in par2files}}
+        tmp = self.path / key / f".{MANIFEST}.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        tmp.replace(self.path / key / MANIFEST)
+
+        self.evict(keep=key)
+
+    def size(self) -> int:
+        """
+        Get the total size in bytes of every set in the cache, complete or not
+        """
+        total = 0
+
+        for entry in self.path.iterdir() if self.path.is_dir() else []:
+            for file in entry.iterdir() if entry.is_dir() else []:
+                try:
+                    total += file.stat().st_size
+                except OSError:  # Evicted in the meantime
+                    pass
+
+        return total
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Remove uploaded, expired, and the oldest sets past `max_size`, except for `keep`
+        """
+        with self._lock:
+            now = time.time()
+            entries = []
+
+            for entry in self.path.iterdir() if self.path.is_dir() else []:
+                if not entry.is_dir() or entry.name == keep:
+                    continue
+
+                manifest = entry / MANIFEST
+                try:
+                    created = manifest.stat().st_mtime
+                    size = sum(file.stat().st_size for file in entry.iterdir() if file.name != MANIFEST)
+                except OSError:
+                    # No manifest means ParPar never finished, only clean it up once it's clearly abandoned
+                    if now - entry.stat().st_mtime > self.max_age:
+                        shutil.rmtree(entry, ignore_errors=True)
+                    continue
+
+                if size == 0 or now - created > self.max_age:
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entries.append((created, size, entry))
+
+            total = sum(size for _, size, _ in entries)
+
+            for _, size, entry in sorted(entries):
+                if total <= self.max_size:
+                    break
+                logger.debug(f"Evicting par2 cache entry {entry.name} ({size} bytes)")
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
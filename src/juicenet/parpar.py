@@ -1,13 +1,20 @@
+import asyncio
 import glob
 import shlex
+import shutil
 import subprocess
 from pathlib import Path
-from typing import Literal, Optional
+from typing import Any, Callable, Literal, Optional
 from uuid import uuid4
 
 from loguru import logger
 
+from .model import ParParProfile
+from .par2cache import Par2Cache
+from .process import TAIL_SIZE, OutputLogs, run, run_async
+from .resources import Governor, Priority
 from .types import ParParOutput
+from .utils import scan_path
 
 
 class ParPar:
@@ -24,18 +31,76 @@ class ParPar:
         Working directory for ParPar execution and .par2 file generation.
     debug : bool, optional
         Flag indicating whether to enable debug mode. Default is False.
+    logs : OutputLogs, optional
+        Where to write ParPar's complete output. Only a bounded tail is kept in memory either way.
+    cache : Par2Cache, optional
+        Where to generate `.par2` files so they can be reused if their upload fails.
+        Takes priority over `workdir`.
+    profiles : list[ParParProfile], optional
+        Arguments to use instead of `args` for inputs up to a certain size.
+    governor : Governor, optional
+        Adds a thread count and memory limit that fit the CPUs and memory juicenet is allowed to use.
+    priority : Priority, optional
+        CPU and IO priority to run ParPar with.
 
     Methods
     -------
+    get_args(file: Path) -> list[str]
+        Get the arguments for a file, based on it's total size.
     generate_par2_files(file: Path) -> ParParOutput
         Generate .par2 files with ParPar.
+    generate_par2_files_async(file: Path) -> ParParOutput
+        Generate .par2 files with ParPar without blocking the event loop.
+    discard(parpar: ParParOutput) -> None
+        Delete the .par2 files of an upload that failed.
     """
 
-    def __init__(self, bin: Path, args: list[str], workdir: Optional[Path], debug: bool = False) -> None:
+    def __init__(
+        self,
+        bin: Path,
+        args: list[str],
+        workdir: Optional[Path],
+        debug: bool = False,
+        logs: Optional[OutputLogs] = None,
+        cache: Optional[Par2Cache] = None,
+        profiles: Optional[list[ParParProfile]] = None,
+        governor: Optional[Governor] = None,
+        priority: Optional[Priority] = None,
+    ) -> None:
         self.bin = bin
         self.args = args
         self.workdir = workdir
         self.debug = debug
+        self.logs = logs
+        self.cache = cache
+        # Smallest first, so the first one an input fits in is the tightest one
+        self.profiles = sorted(
+            profiles or [], key=lambda profile: float("inf") if profile.max_size is None else profile.max_size
+        )
+        self.governor = governor
+        self.priority = priority
+
+    @property
+    def tail(self) -> int:
+        """
+        Number of characters of ParPar's stdout and stderr kept in memory
+        """
+        return self.logs.tail if self.logs else TAIL_SIZE
+
+    def get_args(self, file: Path) -> list[str]:
+        """
+        Get the arguments for a file from the smallest profile it fits in, or `args` if there's none
+        """
+        if not self.profiles:
+            return self.args
+
+        size = scan_path(file).size
+
+        for profile in self.profiles:
+            if profile.max_size is None or size <= profile.max_size:
+                return profile.args
+
+        return self.args
 
     @staticmethod
     def _get_filepath_format(file: Path) -> Literal["basename", "path"]:
@@ -70,14 +135,29 @@ class ParPar:
         else:
             return file.parent
 
-    def generate_par2_files(self, file: Path, related_files: Optional[list[Path]] = None) -> ParParOutput:
+    def _remove_workdir(self, cwd: Path) -> None:
         """
-        Generate `.par2` files with ParPar and return a dictionary of the
-        resulting `.par2` files where the key is the input file and value is
-        a list of it's `.par2` files
+        Remove a working directory made by `_get_workdir()` along with anything in it.
+        Cache entries and the input's own folder are left alone.
         """
-        capture_output = not self.debug
+        if self.cache is None and self.workdir is not None and cwd.parent == self.workdir:
+            shutil.rmtree(cwd, ignore_errors=True)
 
+    def discard(self, parpar: ParParOutput) -> None:
+        """
+        Delete the `.par2` files of an upload that failed, along with their working directory.
+        Nothing is going to reuse them, except for the cache which keeps them for the next attempt.
+        """
+        for folder in {par2file.parent for par2file in parpar.par2files}:
+            self._remove_workdir(folder)
+
+    def _get_command(
+        self, file: Path, related_files: Optional[list[Path]] = None
+    ) -> tuple[list[Any], Literal["basename", "path"], Path]:
+        """
+        Build the ParPar command for the given file along with the
+        `--filepath-format` and `--filepath-base` it uses
+        """
         filepathformat = self._get_filepath_format(file)
         filepathbase = file.parent
 
@@ -86,9 +166,14 @@ class ParPar:
         else:
             files = [file]
 
+        args = self.get_args(file)
+        limits = self.governor.get_args(args) if self.governor else []
+        prefix = self.priority.get_prefix() if self.priority else []
+
         parpar = (
-            [self.bin]
-            + self.args
+            [*prefix, self.bin]
+            + args
+            + limits
             + ["--filepath-base", filepathbase, "--filepath-format", filepathformat]
             + ["--out", file.name]
             + files
@@ -96,31 +181,144 @@ class ParPar:
 
         logger.debug(shlex.join(str(arg) for arg in parpar))
 
+        return parpar, filepathformat, filepathbase
+
+    def _get_cached(
+        self, file: Path, related_files: Optional[list[Path]]
+    ) -> tuple[Optional[str], Optional[ParParOutput]]:
+        """
+        Get the cache key for a file and it's already generated `.par2` files, if there are any
+        """
+        if self.cache is None:
+            return None, None
+
+        key = self.cache.key(file, related_files, self.get_args(file))
+        par2files = self.cache.lookup(key)
+
+        if par2files is None:
+            return key, None
+
+        logger.info(f"Reusing {len(par2files)} cached par2 file(s) for {file.name}")
+
+        cached = ParParOutput(
+            par2files=par2files,
+            filepathformat=self._get_filepath_format(file),
+            filepathbase=file.parent,
+            success=True,
+            args=[],
+            returncode=0,
+            stdout="",
+            stderr="",
+            cached=True,
+        )
+        return key, cached
+
+    def _store(self, key: Optional[str], parpar: ParParOutput) -> ParParOutput:
+        """
+        Add a successfully generated set of `.par2` files to the cache
+        """
+        if self.cache is not None and key is not None and parpar.success and parpar.par2files:
+            self.cache.store(key, parpar.par2files)
+        return parpar
+
+    @staticmethod
+    def _get_output(
+        file: Path,
+        cwd: Path,
+        filepathformat: Literal["basename", "path"],
+        filepathbase: Path,
+        process: subprocess.CompletedProcess[str],
+        log: Optional[Path],
+    ) -> ParParOutput:
+        """
+        Collect the resulting `.par2` files from the working directory
+        """
+        return ParParOutput(
+            par2files=list(cwd.glob(f"{glob.escape(file.name)}*.par2")),
+            filepathformat=filepathformat,
+            filepathbase=filepathbase,
+            success=process.returncode == 0,
+            args=process.args,
+            returncode=process.returncode,
+            stdout=process.stdout,
+            stderr=process.stderr,
+            log=log,
+        )
+
+    def generate_par2_files(
+        self,
+        file: Path,
+        related_files: Optional[list[Path]] = None,
+        on_progress: Optional[Callable[[float], None]] = None,
+    ) -> ParParOutput:
+        """
+        Generate `.par2` files with ParPar and return a dictionary of the
+        resulting `.par2` files where the key is the input file and value is
+        a list of it's `.par2` files
+
+        `on_progress` is called with ParPar's progress (between 0 and 1) as it's reported.
+        If there's a cache and it already has a complete set for this file, that's returned instead.
+        """
+        capture_output = not self.debug
+
+        key, cached = self._get_cached(file, related_files)
+        if cached is not None:
+            return cached
+
+        parpar, filepathformat, filepathbase = self._get_command(file, related_files)
+
         # Get the working directory
-        cwd = self._get_workdir(file)
+        cwd = self.cache.entry(key) if self.cache and key else self._get_workdir(file)
 
         # Execute ParPar and generate `.par2` files
-        process = subprocess.run(parpar, cwd=cwd, capture_output=capture_output, encoding="utf-8")
-
-        if process.returncode == 0:
-            return ParParOutput(
-                par2files=list(cwd.glob(f"{glob.escape(file.name)}*.par2")),
-                filepathformat=filepathformat,
-                filepathbase=filepathbase,
-                success=True,
-                args=process.args,
-                returncode=process.returncode,
-                stdout=process.stdout,
-                stderr=process.stderr,
+        log = self.logs.new("parpar", file.name) if self.logs and capture_output else None
+        try:
+            process = run(
+                parpar, cwd=cwd, capture_output=capture_output, on_progress=on_progress, log=log, tail=self.tail
             )
-        else:
-            return ParParOutput(
-                par2files=list(cwd.glob(f"{glob.escape(file.name)}*.par2")),
-                filepathformat=filepathformat,
-                filepathbase=filepathbase,
-                success=False,
-                args=process.args,
-                returncode=process.returncode,
-                stdout=process.stdout,
-                stderr=process.stderr,
+        except BaseException:
+            self._remove_workdir(cwd)
+            raise
+
+        output = self._get_output(file, cwd, filepathformat, filepathbase, process, log)
+        if not output.par2files:
+            self._remove_workdir(cwd)
+
+        return self._store(key, output)
+
+    async def generate_par2_files_async(
+        self,
+        file: Path,
+        related_files: Optional[list[Path]] = None,
+        on_progress: Optional[Callable[[float], None]] = None,
+    ) -> ParParOutput:
+        """
+        Asynchronous version of `ParPar.generate_par2_files()`.
+        ParPar is killed if the awaiting task is cancelled.
+        """
+        capture_output = not self.debug
+
+        key, cached = await asyncio.to_thread(self._get_cached, file, related_files)
+        if cached is not None:
+            return cached
+
+        parpar, filepathformat, filepathbase = self._get_command(file, related_files)
+
+        # Get the working directory
+        cwd = self.cache.entry(key) if self.cache and key else self._get_workdir(file)
+
+        # Execute ParPar and generate `.par2` files without blocking the event loop
+        log = self.logs.new("parpar", file.name) if self.logs and capture_output else None
+        try:
+            process = await run_async(
+                parpar, cwd=cwd, capture_output=capture_output, on_progress=on_progress, log=log, tail=self.tail
             )
+        except BaseException:
+            self._remove_workdir(cwd)
+            raise
+
+        output = self._get_output(file, cwd, filepathformat, filepathbase, process, log)
+        if not output.par2files:
+            self._remove_workdir(cwd)
+
+        return await asyncio.to_thread(self._store, key, output)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from queue import Queue
+from typing import Callable, Generic, TypeVar, cast
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Sentinel used by the producer to signal that every file has been processed
+_DONE = object()
+
+
+class Pipeline(Generic[T]):
+    """
+    Overlap two stages of work on a list of files.
+
+    The first stage (ParPar) runs in a background thread and is allowed to
+    run ahead of the second stage (Nyuu) by at most `lookahead` files.
+    This keeps the CPU busy generating `.par2` files while the uplink is busy
+    uploading, without letting an unbounded number of par2 sets pile up
+    in the working directory.
+
+    The second stage is executed by a pool of `workers` threads, so up to
+    `workers` files can be in the second stage at the same time.
+
+    Attributes
+    ----------
+    produce : Callable[[Path], T]
+        First stage, called once per file in a background thread.
+    consume : Callable[[Path, T], None]
+        Second stage, called once per file with the result of `produce`.
+    lookahead : int
+        Number of files the first stage may complete ahead of the second stage.
+    workers : int
+        Number of files that can go through the second stage concurrently.
+
+    Notes
+    -----
+    With `lookahead=0` and `workers=1`, both stages run one after the other in the calling thread.
+
+    Methods
+    -------
+    run(files: Iterable[Path]) -> None
+        Run both stages on every file. The first stage always processes `files` in order.
+        `files` is consumed lazily by the first stage, so it can be an endless iterator.
+    """
+
+    def __init__(
+        self,
+        produce: Callable[[Path], T],
+        consume: Callable[[Path, T], None],
+        lookahead: int = 0,
+        workers: int = 1,
+    ) -> None:
+        self.produce = produce
+        self.consume = consume
+        self.lookahead = lookahead
+        self.workers = workers
+
+    def _producer(
+        self,
+        files: Iterable[Path],
+        queue: Queue[tuple[Path, T] | BaseException | object],
+        slots: threading.Semaphore,
+        stop: threading.Event,
+    ) -> None:
+        """
+        Run the first stage on every file and hand the results over to the consumer
+        """
+        try:
+            for file in files:
+                slots.acquire()
+                if stop.is_set():
+                    return
+                queue.put((file, self.produce(file)))
+        except Exception as error:  # noqa: BLE001 - re-raised in the calling thread
+            # Only failures are handed over, interrupts like `KeyboardInterrupt` propagate as is
+            queue.put(error)
+        finally:
+            queue.put(_DONE)
+
+    def _consumer(self, file: Path, result: T, slots: threading.Semaphore) -> None:
+        """
+        Run the second stage on a single file and free up it's slot once done
+        """
+        try:
+            self.consume(file, result)
+        finally:
+            slots.release()
+
+    def run(self, files: Iterable[Path]) -> None:
+        """
+        Run both stages on every file
+        """
+        if self.lookahead <= 0 and self.workers <= 1:
+            for file in files:
+                self.consume(file, self.produce(file))
+            return
+
+        queue: Queue[tuple[Path, T] | BaseException | object] = Queue()
+        # One slot for every file being consumed plus `lookahead` files ahead of them
+        slots = threading.Semaphore(self.lookahead + self.workers)
+        stop = threading.Event()
+
+        def on_done(future: Future[None]) -> None:
+            # Surface errors from the workers in the calling thread
+            error = future.exception()
+            if error is not None:
+                stop.set()
+                queue.put(error)
+
+        producer = threading.Thread(
+            target=self._producer,
+            args=(files, queue, slots, stop),
+            name="juicenet-parpar",
+            daemon=True,
+        )
+
+        executor = ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix="juicenet-nyuu")
+        futures = []
+        producer.start()
+
+        try:
+            while True:
+                item = queue.get()
+
+                if item is _DONE:
+                    break
+
+                if isinstance(item, BaseException):
+                    raise item
+
+                file, result = cast("tuple[Path, T]", item)
+                future = executor.submit(self._consumer, file, result, slots)
+                future.add_done_callback(on_done)
+                futures.append(future)
+
+            for future in futures:
+                future.result()
+
+        except BaseException:
+            # Unblock the producer and drop anything that hasn't started yet
+            stop.set()
+            slots.release()
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+        executor.shutdown(wait=True)
+        producer.join()
+
+
+def run_in_batches(
+    items: list[Path],
+    func: Callable[[list[Path]], dict[Path, R]],
+    *,
+    batch_size: int,
+    workers: int = 1,
+    callback: Callable[[dict[Path, R]], None] | None = None,
+) -> dict[Path, R]:
+    """
+    Split `items` into batches of at most `batch_size` and run `func` on each of them,
+    with up to `workers` batches running at the same time.
+
+    `callback` is called with the result of every batch as soon as it's done.
+    Returns the combined results in the same order as `items`.
+    """
+    size = max(batch_size, 1)
+    batches = [items[i : i + size] for i in range(0, len(items), size)]
+    results: dict[Path, R] = {}
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="juicenet-batch") as executor:
+        futures = [executor.submit(func, batch) for batch in batches]
+
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                results.update(result)
+                if callback is not None:
+                    callback(result)
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return {item: results[item] for item in items if item in results}
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+import re
+import shlex
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import IO, Any, Callable, TextIO
+
+from loguru import logger
+
+# How long a cancelled process gets to exit on it's own before it's killed
+TERMINATE_TIMEOUT = 5
+
+# How much output is read from a process at a time
+CHUNK_SIZE = 64 * 1024
+
+# How much of a process's stdout and stderr is kept in memory by default
+TAIL_SIZE = 64 * 1024
+
+# ParPar and Nyuu both report their progress as a percentage, i.e, `Calculating: 12.34%` or ` 12.34% [===   ]`
+PROGRESS_PATTERN = re.compile(r"(\d{1,3}(?:\.\d+)?)\s?%")
+
+# Progress lines are redrawn in place, so only a little bit of an unterminated line is worth keeping
+MAX_LINE_LENGTH = 1024
+
+
+class ProgressParser:
+    """
+    Parse the progress reported by ParPar or Nyuu from their output as it comes in.
+
+    Both of them redraw their progress line in place with `\\r`, so the output is split
+    on both `\\r` and `\\n` and `callback` is called with the latest percentage
+    as a fraction between `0` and `1` every time a new one shows up.
+    """
+
+    def __init__(self, callback: Callable[[float], None]) -> None:
+        self.callback = callback
+        self._buffer = ""
+
+    def feed(self, text: str) -> None:
+        """
+        Feed the next chunk of output
+        """
+        *lines, self._buffer = re.split(r"[\r\n]", self._buffer + text)
+        self._buffer = self._buffer[-MAX_LINE_LENGTH:]
+
+        # The line that's currently being drawn is usually not terminated yet
+        for line in reversed([*lines, self._buffer]):
+            matches = PROGRESS_PATTERN.findall(line)
+            if matches:
+                self.callback(min(float(matches[-1]), 100) / 100)
+                return
+
+
+class OutputLogs:
+    """
+    A directory of per process log files with the complete output of ParPar and Nyuu.
+
+    Only the last `tail` characters of a process's output are kept in memory,
+    everything else only ends up in it's log file. Only the newest `keep` log files are kept,
+    older ones are deleted as new ones are created.
+
+    Attributes
+    ----------
+    path : Path
+        Directory where the log files are written.
+    keep : int
+        Number of log files to keep. `0` disables writing log files entirely.
+    tail : int
+        Number of characters of stdout and stderr to keep in memory for every process.
+
+    Methods
+    -------
+    new(tool: str, name: str) -> Optional[Path]
+        Reserve a new log file for a process.
+    """
+
+    def __init__(self, path: Path, keep: int, tail: int = TAIL_SIZE) -> None:
+        self.path = path
+        self.keep = keep
+        self.tail = tail
+        self._lock = threading.Lock()
+        self._logs: deque[Path] | None = None
+
+    def _existing(self) -> deque[Path]:
+        """
+        Log files left behind by previous runs, oldest first
+        """
+        if self._logs is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._logs = deque(sorted(self.path.glob("*.log"), key=lambda log: log.name))
+        return self._logs
+
+    def new(self, tool: str, name: str) -> Path | None:
+        """
+        Reserve a new log file for a process and delete the oldest ones past `keep`
+        """
+        if self.keep <= 0:
+            return None
+
+        # Names sort chronologically and never clash, even for files with the same name
+        safe = re.sub(r"[^\w.\- ]", "_", name)[:100]
+        log = self.path / f"{time.strftime('%Y%m%d-%H%M%S')}-{time.monotonic_ns()}-{tool}-{safe}.log"
+
+        with self._lock:
+            logs = self._existing()
+            logs.append(log)
+            while len(logs) > self.keep:
+                logs.popleft().unlink(missing_ok=True)
+
+        return log
+
+
+class _Output:
+    """
+    Keep the last `tail` characters of a stream in memory and copy everything to an optional log file
+    """
+
+    def __init__(self, tail: int, log: TextIO | None, lock: threading.Lock) -> None:
+        self.tail = tail
+        self.log = log
+        self.lock = lock
+        self._chunks: deque[str] = deque()
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        self._chunks.append(text)
+        self._size += len(text)
+
+        # Drop whole chunks that are entirely out of the tail
+        while self._chunks and self._size - len(self._chunks[0]) >= self.tail:
+            self._size -= len(self._chunks.popleft())
+
+        if self.log is not None:
+            with self.lock:
+                self.log.write(text)
+
+    def getvalue(self) -> str:
+        if self.tail <= 0:
+            return ""
+        return "".join(self._chunks)[-self.tail :]
+
+
+def _open_log(args: list[Any], log: Path | None) -> TextIO | None:
+    """
+    Open a log file and start it off with the command being run
+    """
+    if log is None:
+        return None
+
+    try:
+        file = log.open("w", encoding="utf-8", errors="replace")
+    except OSError as error:
+        logger.warning(f"Failed to open {log}: {error}")
+        return None
+
+    file.write(f"$ {shlex.join(str(arg) for arg in args)}\n")
+    return file
+
+
+def _read_stream(stream: IO[bytes], output: _Output, parser: ProgressParser | None = None) -> None:
+    """
+    Read a stream until it's closed, decoding and optionally parsing it as it comes in
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    while chunk := stream.read1(CHUNK_SIZE):  # type: ignore[attr-defined]
+        text = decoder.decode(chunk)
+        output.write(text)
+        if parser is not None:
+            parser.feed(text)
+
+    output.write(decoder.decode(b"", final=True))
+
+
+def run(
+    args: list[Any],
+    *,
+    cwd: Path | None = None,
+    capture_output: bool = True,
+    on_progress: Callable[[float], None] | None = None,
+    log: Path | None = None,
+    tail: int = TAIL_SIZE,
+) -> subprocess.CompletedProcess[str]:
+    """
+    Equivalent of `subprocess.run(args, cwd=cwd, capture_output=capture_output, encoding="utf-8")`
+    that uses a bounded amount of memory for the captured output.
+
+    The output is read incrementally and only the last `tail` characters of stdout and stderr
+    are returned. If `log` is given, the complete output is written there as it comes in.
+    If `on_progress` is given, it's called with the progress reported by the process, see `ProgressParser`.
+    """
+    if not capture_output:
+        return subprocess.run(args, cwd=cwd, encoding="utf-8", check=False)
+
+    lock = threading.Lock()
+    log_file = _open_log(args, log)
+    stdout = _Output(tail, log_file, lock)
+    stderr = _Output(tail, log_file, lock)
+    parser = ProgressParser(on_progress) if on_progress is not None else None
+
+    try:
+        with subprocess.Popen(args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+            # Drain stdout on the side so the process never blocks on a full pipe
+            reader = threading.Thread(target=_read_stream, args=(process.stdout, stdout), daemon=True)
+            reader.start()
+            _read_stream(process.stderr, stderr, parser)  # type: ignore[arg-type]
+            reader.join()
+            returncode = process.wait()
+    finally:
+        if log_file is not None:
+            log_file.close()
+
+    return subprocess.CompletedProcess(
+        args=args, returncode=returncode, stdout=stdout.getvalue(), stderr=stderr.getvalue()
+    )
+
+
+async def _read_stream_async(
+    stream: asyncio.StreamReader, output: _Output, parser: ProgressParser | None = None
+) -> None:
+    """
+    Asynchronous version of `_read_stream()`
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    while chunk := await stream.read(CHUNK_SIZE):
+        text = decoder.decode(chunk)
+        output.write(text)
+        if parser is not None:
+            parser.feed(text)
+
+    output.write(decoder.decode(b"", final=True))
+
+
+async def run_async(
+    args: list[Any],
+    *,
+    cwd: Path | None = None,
+    capture_output: bool = True,
+    on_progress: Callable[[float], None] | None = None,
+    log: Path | None = None,
+    tail: int = TAIL_SIZE,
+) -> subprocess.CompletedProcess[str]:
+    """
+    Asynchronous equivalent of `run()`
+
+    If the awaiting task is cancelled, the process is terminated (and killed if it
+    doesn't exit within `TERMINATE_TIMEOUT` seconds) before the cancellation is propagated.
+    """
+    pipe = asyncio.subprocess.PIPE if capture_output else None
+
+    process = await asyncio.create_subprocess_exec(*args, cwd=cwd, stdout=pipe, stderr=pipe)
+
+    lock = threading.Lock()
+    log_file = _open_log(args, log) if capture_output else None
+    stdout = _Output(tail, log_file, lock)
+    stderr = _Output(tail, log_file, lock)
+    parser = ProgressParser(on_progress) if on_progress is not None else None
+
+    try:
+        if process.stdout is not None and process.stderr is not None:
+            await asyncio.gather(
+                _read_stream_async(process.stdout, stdout),
+                _read_stream_async(process.stderr, stderr, parser),
+            )
+        await process.wait()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), timeout=TERMINATE_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        raise
+    finally:
+        if log_file is not None:
+            log_file.close()
+
+    return subprocess.CompletedProcess(
+        args=args,
+        returncode=process.returncode,  # type: ignore[arg-type]
+        stdout=stdout.getvalue() if capture_output else None,
+        stderr=stderr.getvalue() if capture_output else None,
+    )
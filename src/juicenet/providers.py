@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Generic, TypeVar
+
+from loguru import logger
+
+from .model import JuicenetConfig, NyuuProvider
+
+T = TypeVar("T")
+
+
+class Scheduler(Generic[T]):
+    """
+    Spread uploads across several providers at the same time.
+
+    Every provider gets a share of the uploaded bytes proportional to it's `weight`
+    and never runs more than it's `workers` uploads at once. Each upload goes to the provider
+    that's furthest behind on it's share and has a free worker, so a slow or busy provider
+    doesn't hold up the others. If every provider is busy, it waits for the first one to free up.
+
+    Attributes
+    ----------
+    providers : list[T]
+        Whatever an upload needs to use a provider, i.e, a Nyuu config.
+    weights : list[float]
+        Share of the bytes of every provider.
+    workers : list[int]
+        Number of uploads every provider is allowed to run at the same time.
+
+    Methods
+    -------
+    acquire(size: int = 1) -> T
+        Wait for a provider to upload `size` bytes with.
+    release(provider: T) -> None
+        Give back a provider once an upload is done with it.
+    use(size: int = 1) -> Iterator[T]
+        Context manager around `acquire()` and `release()`.
+    """
+
+    def __init__(self, providers: list[T], weights: list[float], workers: list[int]) -> None:
+        if not providers or not len(providers) == len(weights) == len(workers):
+            raise ValueError("Every provider needs exactly one weight and one number of workers")
+
+        self.providers = providers
+        self.weights = weights
+        self.workers = workers
+        self._condition = threading.Condition()
+        self._active = [0] * len(providers)
+        self._assigned = [0] * len(providers)
+
+    @property
+    def capacity(self) -> int:
+        """
+        Number of uploads that can run at the same time across every provider
+        """
+        return sum(self.workers)
+
+    def acquire(self, size: int = 1) -> T:
+        """
+        Wait for a provider with a free worker and return the one that's furthest behind on it's share
+        """
+        with self._condition:
+            while True:
+                free = [i for i, active in enumerate(self._active) if active < self.workers[i]]
+                if free:
+                    break
+                self._condition.wait()
+
+            # Ties go to the provider with the most weight, then the first one listed
+            index = min(free, key=lambda i: ((self._assigned[i] + size) / self.weights[i], -self.weights[i], i))
+            self._active[index] += 1
+            self._assigned[index] += size
+
+        logger.debug(f"Provider {index + 1}/{len(self.providers)}: {self.providers[index]}")
+        return self.providers[index]
+
+    def release(self, provider: T) -> None:
+        """
+        Give back a provider once an upload is done with it
+        """
+        with self._condition:
+            # The same provider can be listed more than once, free up whichever instance is in use
+            index = next(i for i, p in enumerate(self.providers) if p is provider and self._active[i] > 0)
+            self._active[index] -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def use(self, size: int = 1) -> Iterator[T]:
+        """
+        Use a provider for the duration of the `with` block
+        """
+        provider = self.acquire(size)
+        try:
+            yield provider
+        finally:
+            self.release(provider)
+
+
+def get_providers(config: JuicenetConfig, scope: str, workers: int | None = None) -> list[NyuuProvider]:
+    """
+    Get the Nyuu configs uploads of a scope are spread across. Without any `nyuu_providers` for the scope,
+    that's just `nyuu_config_private` or `nyuu_config_public` with `workers` (or `nyuu_workers`) workers
+    """
+    providers = [provider for provider in config.nyuu_providers if provider.scope == scope]
+
+    if providers:
+        return providers
+
+    if scope == "public":
+        conf = config.nyuu_config_public or config.nyuu_config_private
+    else:
+        conf = config.nyuu_config_private
+
+    return [NyuuProvider(config=conf, scope=scope, workers=workers or config.nyuu_workers)]  # type: ignore[arg-type]
@@ -0,0 +1,217 @@
+import math
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Literal, Optional
+
+from loguru import logger
+
+# Where the unified (v2) cgroup hierarchy is mounted
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+# Share of the memory limit ParPar is allowed to use for recovery data.
+# The rest is left for ParPar's read buffers, Nyuu, and juicenet itself
+PARPAR_MEMORY_SHARE = 0.5
+
+# ParPar won't do anything useful with less than this
+MIN_PARPAR_MEMORY = 64 * 1024**2
+
+# `ionice` classes, see ionice(1)
+IONICE_CLASSES = {"best-effort": ["-c", "2", "-n", "7"], "idle": ["-c", "3"]}
+
+
+def _get_cgroup_dirs() -> list[Path]:
+    """
+    Get the cgroup v2 directory of this process and every one above it, innermost first.
+    Empty if cgroup v2 isn't available, i.e, on cgroup v1 hosts or outside of Linux
+    """
+    try:
+        lines = Path("/proc/self/cgroup").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+
+    for line in lines:
+        # The v2 hierarchy is always `0::/path`
+        if line.startswith("0::"):
+            path = CGROUP_ROOT / line[3:].lstrip("/")
+            dirs = [path, *path.parents]
+            return [directory for directory in dirs if directory.is_relative_to(CGROUP_ROOT) and directory.is_dir()]
+
+    return []
+
+
+def _read_cgroup_file(directory: Path, name: str) -> Optional[str]:
+    try:
+        return (directory / name).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def get_cpu_limit() -> float:
+    """
+    Get the number of CPUs this process can actually use: the smaller of the CPUs it's allowed to run on
+    and the tightest `cpu.max` quota of it's cgroups
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus: float = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+
+    for directory in _get_cgroup_dirs():
+        value = _read_cgroup_file(directory, "cpu.max")
+        if value is None:
+            continue
+
+        quota, _, period = value.partition(" ")
+        if quota != "max" and period:
+            cpus = min(cpus, int(quota) / int(period))
+
+    return cpus
+
+
+def get_memory_limit() -> Optional[int]:
+    """
+    Get the tightest `memory.max` or `memory.high` limit of this process's cgroups in bytes, or `None` if there's none
+    """
+    limit = None
+
+    for directory in _get_cgroup_dirs():
+        for name in ("memory.max", "memory.high"):
+            value = _read_cgroup_file(directory, name)
+            if value is not None and value != "max":
+                limit = int(value) if limit is None else min(limit, int(value))
+
+    return limit
+
+
+def _has_arg(args: list[str], short: str, long: str) -> bool:
+    """
+    Check if an argument is given in any of the forms ParPar accepts, i.e, `-t4`, `-t 4`, `--threads=4`
+    """
+    return any(
+        arg in (short, long) or arg.startswith(f"{long}=") or (arg.startswith(short) and not arg.startswith("--"))
+        for arg in args
+    )
+
+
+class Governor:
+    """
+    Split the CPUs and memory juicenet is allowed to use between concurrent ParPar processes.
+
+    Left alone, ParPar starts a thread for every CPU of the host and sizes it's memory use without
+    regard to the limits of the container it's in, which gets it throttled or OOM-killed.
+    This reads the cgroup v2 CPU quota and memory limit (falling back to the CPUs the process can run on)
+    and gives every ParPar process an equal share of them with `--threads` and `--memory`.
+    Anything already set in ParPar's arguments is left alone.
+
+    Attributes
+    ----------
+    jobs : int
+        Number of ParPar processes that can run at the same time.
+    cpus : float
+        Number of CPUs to split, detected if `None`.
+    memory : int, optional
+        Number of bytes of memory to split, detected if `None`. Without a memory limit, ParPar's own default is used.
+
+    Methods
+    -------
+    get_args(args: list[str]) -> list[str]
+        Get the arguments to add to a ParPar command.
+    """
+
+    def __init__(self, jobs: int = 1, cpus: Optional[float] = None, memory: Optional[int] = None) -> None:
+        self.jobs = jobs
+        self.cpus = get_cpu_limit() if cpus is None else cpus
+        self.memory = get_memory_limit() if memory is None else memory
+        logger.debug(f"Resource limits: {self.cpus:g} CPU(s), {self.memory or 'no'} bytes of memory")
+
+    @property
+    def threads(self) -> int:
+        """
+        Number of threads every ParPar process gets
+        """
+        return max(1, math.floor(self.cpus / max(self.jobs, 1)))
+
+    @property
+    def parpar_memory(self) -> Optional[int]:
+        """
+        Number of bytes of memory every ParPar process gets, `None` if there's no limit to split
+        """
+        if self.memory is None:
+            return None
+        return max(MIN_PARPAR_MEMORY, int(self.memory * PARPAR_MEMORY_SHARE / max(self.jobs, 1)))
+
+    def get_args(self, args: list[str]) -> list[str]:
+        """
+        Get the `--threads` and `--memory` arguments to add to a ParPar command with `args`
+        """
+        extra = []
+
+        if not _has_arg(args, "-t", "--threads"):
+            extra.append(f"--threads={self.threads}")
+
+        memory = self.parpar_memory
+        if memory is not None and not _has_arg(args, "-m", "--memory"):
+            extra.append(f"--memory={memory // 1024**2}M")
+
+        return extra
+
+
+@dataclass(frozen=True)
+class Priority:
+    """
+    CPU and IO scheduling priority for ParPar and Nyuu, so they don't starve everything else on the host.
+
+    Applied by running them through `nice` and `ionice`. Either is skipped with a warning if it isn't installed.
+
+    Attributes
+    ----------
+    nice : int, optional
+        Niceness from `0` (normal) to `19` (lowest priority).
+    ionice : Literal["best-effort", "idle"], optional
+        IO scheduling class. `best-effort` uses it's lowest priority, `idle` only gets IO time nobody else wants.
+
+    Methods
+    -------
+    get_prefix() -> list[str]
+        Get the command to prefix ParPar and Nyuu with.
+    """
+
+    nice: Optional[int] = None
+    ionice: Optional[Literal["best-effort", "idle"]] = None
+
+    def get_prefix(self) -> list[str]:
+        """
+        Get the command to prefix ParPar and Nyuu with, empty if there's nothing to change
+        """
+        return list(_get_prefix(self.nice, self.ionice))
+
+
+@cache
+def _get_prefix(nice: Optional[int], ionice: Optional[str]) -> tuple[str, ...]:
+    """
+    Look up `nice` and `ionice` once, rather than (and warning about them missing) for every process
+    """
+    prefix: list[str] = []
+
+    if sys.platform == "win32":
+        return ()
+
+    if nice:
+        nice_bin = shutil.which("nice")
+        if nice_bin:
+            prefix += [nice_bin, "-n", str(nice)]
+        else:
+            logger.warning("`nice` is not installed, running ParPar and Nyuu with the normal CPU priority")
+
+    if ionice:
+        ionice_bin = shutil.which("ionice")
+        if ionice_bin:
+            prefix += [ionice_bin, *IONICE_CLASSES[ionice]]
+        else:
+            logger.warning("`ionice` is not installed, running ParPar and Nyuu with the normal IO priority")
+
+    return tuple(prefix)
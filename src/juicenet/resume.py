@@ -1,10 +1,20 @@
 import csv
+import os
+import socket
+import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import Any, Union
+from typing import Literal, Optional
+from uuid import uuid4
 
 from loguru import logger
 
-from .utils import get_file_info
+from .fingerprint import combine_fingerprints, fingerprint_file
+from .utils import get_file_info, scan_path
+
+# How long a write waits for another process to finish with the database before giving up, in milliseconds
+BUSY_TIMEOUT = 30_000
 
 
 class Resume:
@@ -12,27 +22,166 @@ class Resume:
     A class representing a resume manager.
 
     Attributes:
-        - `path (Path)`: The path to the resume file.
+        - `path (Path)`: The path to the resume database.
         - `scope (str)`: The scope of the nzbs made by Nyuu (Private or Public). Useful as additional metadata.
         - `disable (bool)`: A flag to enable or disable this class.
+        - `mode (str)`: How files are identified, either by their name, size, and file count (`"name"`)
+            or by a fingerprint of their contents (`"fingerprint"`).
+        - `lease (int)`: Number of seconds a claim on a file lasts without being renewed. `0` disables claims.
+        - `shared (bool)`: Whether the database is shared between hosts over a network filesystem.
 
     Methods:
         - `log_file_info(self, file: Path) -> None`: Logs file information to the resume file if logging is enabled.
         - `filter_uploaded_files(self, files: list[Path]) -> list[Path]`: Filters out already uploaded files from
             the provided list based on resume data.
+        - `claim(self, file: Path) -> bool`: Marks a file as in progress, unless it's already uploaded
+            or in progress somewhere else.
+        - `release(self, file: Path) -> None`: Gives up the claim on a file once it's done with.
+        - `skip_reason(self, file: Path) -> Optional[str]`: Claims a file, or tells why it's skipped instead.
 
     This class is used to manage resume information, including logging file details and checking for already uploaded files.
+
+    Resume data is stored in an SQLite database keyed by `(name, size, count, scope)`,
+    so checking a file is a single indexed lookup regardless of how big the history is.
+    Older versions of juicenet stored it in a CSV file named `juicenet.resume` right next to it,
+    which is imported into the database the first time it's opened.
+
+    In `"fingerprint"` mode, files are identified by a fingerprint of their contents instead
+    (see `juicenet.fingerprint`), so renamed files are still skipped and different files that
+    happen to share a name and size are not. Files uploaded before switching to it are recognized
+    by their name, size, and file count the first time they're seen, and fingerprinted from then on. Fingerprints are cached against
+    `(st_dev, st_ino, st_size, st_mtime_ns)` so unchanged files are never hashed twice.
+
+    Several processes, or hosts sharing the appdata directory, can work on the same library at the same time.
+    Writes wait up to `BUSY_TIMEOUT` for each other instead of failing, and the database uses WAL mode so readers
+    never block writers. WAL relies on shared memory that hosts can't share, so a `shared` database falls back
+    to a rollback journal, which only relies on the filesystem's locks.
+    Before generating par2 files for a file, it's claimed with a lease of `lease` seconds that's renewed
+    in the background for as long as it's held. Other processes skip files with a live claim, so a file
+    is never uploaded twice, and claims of processes that crashed or went away simply expire.
     """
 
-    def __init__(self, path: Path, scope: str, disable: bool = False) -> None:
+    def __init__(
+        self,
+        path: Path,
+        scope: str,
+        disable: bool = False,
+        mode: Literal["name", "fingerprint"] = "name",
+        lease: int = 0,
+        shared: bool = False,
+    ) -> None:
         self.path = path
         self.scope = scope
         self.disable = disable
+        self.mode = mode
+        self.lease = lease
+        self.shared = shared
+        # Identifies this process in claims, the host and pid tell if it's still around
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._claimed: set[tuple[str, str, str, str]] = set()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @property
+    def legacy_path(self) -> Path:
+        """
+        Path to the CSV resume file used by older versions of juicenet
+        """
+        return self.path.with_name("juicenet.resume")
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """
+        Connection to the resume database, opened (and migrated if needed) on first use
+        """
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Uploads can finish on worker threads, access is serialised with `self._lock`
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+            connection.execute(f"PRAGMA journal_mode = {'DELETE' if self.shared else 'WAL'}")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS resume (
+                    name TEXT NOT NULL,
+                    size TEXT NOT NULL,
+                    count TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    PRIMARY KEY (name, size, count, scope)
+                ) WITHOUT ROWID;
+
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    fingerprint TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    PRIMARY KEY (fingerprint, scope)
+                ) WITHOUT ROWID;
+
+                CREATE TABLE IF NOT EXISTS fingerprint_cache (
+                    dev INTEGER NOT NULL,
+                    ino INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    PRIMARY KEY (dev, ino)
+                ) WITHOUT ROWID;
+
+                CREATE TABLE IF NOT EXISTS claims (
+                    name TEXT NOT NULL,
+                    size TEXT NOT NULL,
+                    count TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    PRIMARY KEY (name, size, count, scope)
+                ) WITHOUT ROWID;
+                """
+            )
+            self._migrate_legacy(connection)
+            self._connection = connection
+        return self._connection
+
+    def _migrate_legacy(self, connection: sqlite3.Connection) -> None:
+        """
+        One time import of the CSV resume file written by older versions of juicenet.
+        The CSV file is kept around as `juicenet.resume.bak` once it's imported.
+
+        Processes sharing the database can start at the same time, so the import and the rename
+        happen under the database's write lock and whoever gets it second finds nothing left to import.
+        """
+        if not self.legacy_path.is_file():
+            return
+
+        # Single transaction, the legacy file can easily have hundreds of thousands of rows
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            with self.legacy_path.open("r", encoding="utf-8", newline="") as file:
+                rows = [
+                    (row["name"], row["size"], row["count"], row["scope"])
+                    for row in csv.DictReader(
+                        file, fieldnames=["name", "size", "count", "scope"], quoting=csv.QUOTE_ALL
+                    )
+                    if None not in (row["name"], row["size"], row["count"], row["scope"])
+                ]
+
+            connection.executemany("INSERT OR IGNORE INTO resume VALUES (?, ?, ?, ?)", rows)
+            self.legacy_path.replace(self.legacy_path.with_name("juicenet.resume.bak"))
+        except FileNotFoundError:
+            # Another process migrated it while this one was waiting for the lock
+            connection.execute("ROLLBACK")
+            return
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+        logger.info(f"Migrated {len(rows)} entries from {self.legacy_path} to {self.path}")
 
     def write_resume(self, info: dict[str, str]) -> None:
         """
         This method takes a dictionary containing information
-        about a file or folder and writes it into a CSV file.
+        about a file or folder and writes it into the resume database.
         The dictionary should contain the following keys:
 
         ```py
@@ -44,15 +193,15 @@ class Resume:
         }
         ```
         """
-        csv.DictWriter(
-            self.path.open("a", encoding="utf-8"),
-            fieldnames=["name", "size", "count", "scope"],
-            quoting=csv.QUOTE_ALL,
-        ).writerow(info)
+        with self._lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO resume VALUES (?, ?, ?, ?)",
+                (info["name"], info["size"], info["count"], info["scope"]),
+            )
 
-    def read_resume(self) -> tuple[dict[Union[str, Any], Union[str, Any]], ...]:
+    def read_resume(self) -> tuple[dict[str, str], ...]:
         """
-        Reads the resume data from a CSV file written by `Resume.write_resume()`
+        Reads all the resume data written by `Resume.write_resume()`
 
         Returns a tuple of dictionaries like:
 
@@ -64,14 +213,56 @@ class Resume:
         ```
 
         """
-        data = tuple(
-            csv.DictReader(
-                self.path.open("r", encoding="utf-8"),
-                fieldnames=["name", "size", "count", "scope"],
-                quoting=csv.QUOTE_ALL,
-            )
+        with self._lock:
+            rows = self.db.execute("SELECT name, size, count, scope FROM resume").fetchall()
+
+        return tuple(dict(name=name, size=size, count=count, scope=scope) for name, size, count, scope in rows)
+
+    def _contains(self, info: dict[str, str]) -> bool:
+        """
+        Check if the given file information is present in the resume data
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT 1 FROM resume WHERE name = ? AND size = ? AND count = ? AND scope = ?",
+                (info["name"], info["size"], info["count"], info["scope"]),
+            ).fetchone()
+
+        return row is not None
+
+    def _fingerprint_file(self, file: Path) -> str:
+        """
+        Get the fingerprint of a single file, only hashing it if it has changed since it was last seen
+        """
+        stat = file.stat()
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            row = self.db.execute(
+                "SELECT fingerprint FROM fingerprint_cache WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                key,
+            ).fetchone()
+
+        if row is not None:
+            return str(row[0])
+
+        fingerprint = fingerprint_file(file)
+
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO fingerprint_cache VALUES (?, ?, ?, ?, ?)", (*key, fingerprint))
+
+        return fingerprint
+
+    def fingerprint(self, file: Path) -> str:
+        """
+        Get the fingerprint of a file or directory
+        """
+        if file.is_file():
+            return self._fingerprint_file(file)
+
+        return combine_fingerprints(
+            {member.relative_to(file).as_posix(): self._fingerprint_file(member) for member in scan_path(file).files}
         )
-        return data
 
     def log_file_info(self, file: Path) -> None:
         """
@@ -83,20 +274,54 @@ class Resume:
             self.write_resume(info)
             logger.debug(f"Saving to resume: {info}")
 
+            if self.mode == "fingerprint":
+                fingerprint = self.fingerprint(file)
+                with self._lock:
+                    self.db.execute(
+                        "INSERT OR IGNORE INTO fingerprints VALUES (?, ?, ?)", (fingerprint, self.scope, file.name)
+                    )
+                logger.debug(f"Saving fingerprint to resume: {fingerprint}")
+
+    def _seed_fingerprint(self, file: Path, fingerprint: str) -> bool:
+        """
+        Check the history from before `"fingerprint"` mode was used, which only has names, sizes, and file counts.
+        A file that matches it is taken as uploaded and it's fingerprint is added, so it's recognized from now on.
+        Names that already have a fingerprint were uploaded in `"fingerprint"` mode, a different file
+        that shares the name and size of one of those is not skipped.
+        """
+        info = get_file_info(file)
+
+        with self._lock:
+            row = self.db.execute(
+                "SELECT 1 FROM resume WHERE name = ? AND size = ? AND count = ? AND scope = ? "
+                "AND NOT EXISTS (SELECT 1 FROM fingerprints WHERE name = ? AND scope = ?)",
+                (info["name"], info["size"], info["count"], self.scope, file.name, self.scope),
+            ).fetchone()
+
+            if row is None:
+                return False
+
+            self.db.execute("INSERT OR IGNORE INTO fingerprints VALUES (?, ?, ?)", (fingerprint, self.scope, file.name))
+
+        logger.debug(f"Seeded fingerprint from resume: {file.name} -> {fingerprint}")
+        return True
+
     def already_uploaded(self, file: Path) -> bool:
         """
         Check if a given file is already uploaded by juicenet
         """
         if not self.disable:
-            resume_data = self.read_resume()
+            if self.mode == "fingerprint":
+                fingerprint = self.fingerprint(file)
+                with self._lock:
+                    row = self.db.execute(
+                        "SELECT 1 FROM fingerprints WHERE fingerprint = ? AND scope = ?", (fingerprint, self.scope)
+                    ).fetchone()
+                return row is not None or self._seed_fingerprint(file, fingerprint)
 
             info = get_file_info(file)
             info["scope"] = self.scope
-
-            if info in resume_data:
-                return True
-
-            return False
+            return self._contains(info)
 
         return False
 
@@ -106,12 +331,9 @@ class Resume:
         """
         if not self.disable:
             not_uploaded = []
-            resume_data = self.read_resume()
 
             for file in files:
-                info = get_file_info(file)
-                info["scope"] = self.scope
-                if info in resume_data:
+                if self.already_uploaded(file):
                     logger.info(f"Skipping: {file.name} - Already uploaded")
                 else:
                     not_uploaded.append(file)
@@ -121,9 +343,135 @@ class Resume:
         else:
             return files
 
+    def _get_key(self, file: Path) -> tuple[str, str, str, str]:
+        info = get_file_info(file)
+        return info["name"], info["size"], info["count"], self.scope
+
+    def _is_alive(self, owner: str) -> bool:
+        """
+        Check if the process behind a claim is still around. Only processes on this host can be checked,
+        claims of other hosts are trusted until they expire
+        """
+        host, pid, _ = owner.rsplit(":", 2)
+
+        if host != socket.gethostname() or int(pid) == os.getpid():
+            return True
+
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+        return True
+
+    def _renew(self) -> None:
+        """
+        Keep the claims of this process alive for as long as it holds any
+        """
+        while True:
+            time.sleep(self.lease / 3)
+
+            with self._lock:
+                if not self._claimed:
+                    continue
+                try:
+                    self.db.execute(
+                        "UPDATE claims SET expires = ? WHERE owner = ?", (time.time() + self.lease, self.owner)
+                    )
+                except sqlite3.Error as error:
+                    logger.warning(f"Failed to renew claims, retrying in {self.lease / 3:g}s: {error}")
+
+    def claim(self, file: Path) -> bool:
+        """
+        Mark a file as in progress so other processes skip it.
+        Returns `False` if it's already uploaded or another process has a live claim on it
+        """
+        if self.disable or not self.lease:
+            return True
+
+        key = self._get_key(file)
+
+        with self._lock:
+            # Immediate, so no other process can claim it between the check and the write
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    "SELECT owner, expires FROM claims WHERE name = ? AND size = ? AND count = ? AND scope = ?", key
+                ).fetchone()
+
+                holder = None
+                if row is not None and row[0] != self.owner and row[1] > time.time() and self._is_alive(row[0]):
+                    holder = row[0]
+                else:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO claims VALUES (?, ?, ?, ?, ?, ?)",
+                        (*key, self.owner, time.time() + self.lease),
+                    )
+            finally:
+                self.db.execute("COMMIT")
+
+            if holder is None:
+                self._claimed.add(key)
+                if self._heartbeat is None:
+                    self._heartbeat = threading.Thread(target=self._renew, name="juicenet-resume", daemon=True)
+                    self._heartbeat.start()
+
+        if holder is not None:
+            logger.debug(f"{file.name} is claimed by {holder}")
+            return False
+
+        # Another process could have finished it between checking and claiming it
+        if self.already_uploaded(file):
+            self.release(file)
+            return False
+
+        logger.debug(f"Claimed: {file.name}")
+        return True
+
+    def skip_reason(self, file: Path) -> Optional[str]:
+        """
+        Claim a file that should be uploaded. Returns why it's skipped instead if it's already uploaded
+        or another process has claimed it, or `None` if it's now claimed by this process
+        """
+        if self.already_uploaded(file):
+            return "Already uploaded"
+
+        if not self.claim(file):
+            # `claim()` also turns down files another process finished in the meantime
+            return "Already uploaded" if self.already_uploaded(file) else "Claimed by another process"
+
+        return None
+
+    def release(self, file: Path) -> None:
+        """
+        Give up the claim on a file, whether it was uploaded or not
+        """
+        if self.disable or not self.lease:
+            return
+
+        key = self._get_key(file)
+
+        with self._lock:
+            self.db.execute(
+                "DELETE FROM claims WHERE name = ? AND size = ? AND count = ? AND scope = ? AND owner = ?",
+                (*key, self.owner),
+            )
+            self._claimed.discard(key)
+
     def clear_resume(self) -> None:
         """
         Clear resume data
         """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
         self.path.unlink(missing_ok=True)
+        # WAL mode leaves these next to the database
+        self.path.with_name(f"{self.path.name}-wal").unlink(missing_ok=True)
+        self.path.with_name(f"{self.path.name}-shm").unlink(missing_ok=True)
+        self.legacy_path.unlink(missing_ok=True)
         logger.info(f"Cleared {self.path}")
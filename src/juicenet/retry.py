@@ -0,0 +1,83 @@
+import re
+import subprocess
+from dataclasses import dataclass
+
+# Nyuu exits with 2 when it's given invalid arguments, trying again won't change anything
+FATAL_RETURNCODES = frozenset({2})
+
+# Errors that'll fail every attempt the same way: bad config, missing files, and rejected credentials
+FATAL_PATTERN = re.compile(
+    r"invalid option|unknown option|invalid value|ENOENT|EACCES|EISDIR|no such file"
+    r"|authentication (?:failed|rejected)|auth(?:orization)? (?:failed|rejected)|\b481\b.*auth",
+    re.IGNORECASE,
+)
+
+# Lines Nyuu reports errors on, i.e, `[2025-01-01 00:00:00.000][ERR ] ...` or `Error: ...`.
+# Everything else on stderr, like the progress report, is never looked at
+ERROR_LINE = re.compile(r"^\s*(?:\[[^\]]*\]\s*)*?(?:\[ERR\s*\]|Error\b)", re.IGNORECASE)
+
+# Only the last few errors say why Nyuu gave up, earlier ones may have been recovered from
+ERROR_LINES = 5
+
+
+def get_errors(stderr: str) -> list[str]:
+    """
+    Get the last `ERROR_LINES` error lines of Nyuu's stderr
+    """
+    lines = re.split(r"[\r\n]+", stderr)
+    return [line for line in lines if ERROR_LINE.match(line)][-ERROR_LINES:]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How many times and how patiently a failed Nyuu upload is tried again.
+
+    Attempts are spaced out with an exponential backoff: `backoff` seconds before the second attempt,
+    twice that before the third, and so on, up to `backoff_max` seconds.
+    Failures that'll happen again no matter what (see `is_retryable()`) are never retried.
+
+    Attributes
+    ----------
+    attempts : int
+        Total number of attempts, including the first one. `1` disables retrying.
+    backoff : float
+        Number of seconds to wait before the first retry.
+    backoff_max : float
+        Maximum number of seconds to wait between attempts.
+
+    Methods
+    -------
+    delay(attempt: int) -> float
+        Get the number of seconds to wait after a failed attempt.
+    is_retryable(process: subprocess.CompletedProcess[str]) -> bool
+        Check if a failed attempt is worth trying again.
+    should_retry(attempt: int, process: subprocess.CompletedProcess[str]) -> bool
+        Check if another attempt should be made after this one.
+    """
+
+    attempts: int = 1
+    backoff: float = 30
+    backoff_max: float = 600
+
+    def delay(self, attempt: int) -> float:
+        """
+        Get the number of seconds to wait after the failed `attempt` (starting at 1)
+        """
+        return min(self.backoff * 2.0 ** (attempt - 1), self.backoff_max)
+
+    @staticmethod
+    def is_retryable(process: subprocess.CompletedProcess[str]) -> bool:
+        """
+        Check if a failed attempt is worth trying again based on Nyuu's exit code and the last errors on it's stderr.
+        Anything that isn't known to be fatal, like timeouts and dropped connections, is retryable.
+        """
+        if process.returncode in FATAL_RETURNCODES:
+            return False
+        return not any(FATAL_PATTERN.search(line) for line in get_errors(process.stderr or ""))
+
+    def should_retry(self, attempt: int, process: subprocess.CompletedProcess[str]) -> bool:
+        """
+        Check if another attempt should be made after the failed `attempt` (starting at 1)
+        """
+        return attempt < self.attempts and self.is_retryable(process)
@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+import hmac
+import json
+import os
+import secrets
+import socketserver
+import sys
+import threading
+from collections.abc import Iterator
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Union
+from urllib.parse import parse_qs, urlsplit
+
+from loguru import logger
+from pydantic import ValidationError
+
+from .api.session import JuicenetSession
+from .health import DEFAULT_HOST, DEFAULT_PORT
+from .jobs import Job, JobQueue, JobState
+from .log import get_logger
+from .main import console
+from .model import JuicenetConfig
+from .pipeline import Pipeline
+from .types import ParParOutput
+from .utils import clear_caches
+
+# How often idle runners check the queue, on top of being woken up by new jobs
+POLL_INTERVAL = 5
+
+SCOPES = ("private", "public")
+
+# Loopback addresses to listen on, and the names a client on this machine can address them by
+LOOPBACK = ("127.0.0.1", "localhost", "::1")
+LOOPBACK_NAMES = ("127.0.0.1", "localhost", "[::1]")
+
+# Where the token is written to in the appdata directory if the config doesn't have one
+TOKEN_FILE = "juicenet.serve.token"
+
+# What the ParPar stage hands over to the Nyuu stage: it's output, or why it failed
+Generated = Union[tuple[Union[list[Path], None], Union[ParParOutput, None]], Exception]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON API for submitting and inspecting jobs
+    """
+
+    server: _HTTPServer | _UnixHTTPServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def address_string(self) -> str:
+        # Clients of a Unix socket don't have an address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send(self, status: HTTPStatus, body: Any) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: HTTPStatus, message: str) -> None:
+        self._send(status, {"error": message})
+
+    def _allowed(self, authenticate: bool = True) -> bool:
+        """
+        Check the `Host` header and the token of a request, and send an error if they're not right.
+
+        Web pages can send requests to a server on localhost, the `Host` header stops them from doing
+        so through a DNS name they control, and the token stops anything that doesn't have it.
+        Neither applies to a unix socket, which is only reachable by those allowed to open it.
+        """
+        if self.server.hosts is not None and self.headers.get("Host", "").lower() not in self.server.hosts:
+            self._error(HTTPStatus.FORBIDDEN, "Invalid Host header")
+            return False
+
+        if authenticate and self.server.token is not None:
+            expected = f"Bearer {self.server.token}".encode()
+            if not hmac.compare_digest(self.headers.get("Authorization", "").encode(), expected):
+                self._error(HTTPStatus.UNAUTHORIZED, "Missing or invalid token")
+                return False
+
+        return True
+
+    def _outside_roots(self, path: Path) -> bool:
+        return not any(path.is_relative_to(root) for root in self.server.roots)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        query = parse_qs(url.query)
+        jobs = self.server.jobs
+
+        # The health check only tells if the server is up, so it doesn't need the token
+        if not self._allowed(authenticate=parts != ["health"]):
+            return
+
+        if parts == ["health"]:
+            self._send(HTTPStatus.OK, {"status": "ok", "jobs": jobs.counts()})
+
+        elif parts == ["jobs"]:
+            try:
+                state = JobState(query["state"][0]) if "state" in query else None
+                limit = int(query.get("limit", ["100"])[0])
+            except ValueError as error:
+                self._error(HTTPStatus.BAD_REQUEST, str(error))
+                return
+            self._send(HTTPStatus.OK, [job.to_dict() for job in jobs.latest(state, limit)])
+
+        elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            job = jobs.get(int(parts[1]))
+            if job is None:
+                self._error(HTTPStatus.NOT_FOUND, f"No such job: {parts[1]}")
+            else:
+                self._send(HTTPStatus.OK, job.to_dict())
+
+        else:
+            self._error(HTTPStatus.NOT_FOUND, f"No such endpoint: {url.path}")
+
+    def do_POST(self) -> None:
+        if not self._allowed():
+            return
+
+        if urlsplit(self.path).path.strip("/") != "jobs":
+            self._error(HTTPStatus.NOT_FOUND, f"No such endpoint: {self.path}")
+            return
+
+        # Browsers can only send other content types across sites without asking the server first
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._error(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Expected Content-Type: application/json")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as error:
+            self._error(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {error}")
+            return
+
+        if not isinstance(body, dict) or not isinstance(body.get("path"), str):
+            self._error(HTTPStatus.BAD_REQUEST, "Expected a JSON object with a `path`")
+            return
+
+        path = Path(body["path"]).resolve()
+        scope = body.get("scope", "private")
+        meta = body.get("meta", [])
+
+        if self._outside_roots(path):
+            self._error(HTTPStatus.FORBIDDEN, f"{path} is not inside any of SERVE_ROOTS")
+        elif not path.exists():
+            self._error(HTTPStatus.BAD_REQUEST, f"No such file or directory: {path}")
+        elif scope not in SCOPES:
+            self._error(HTTPStatus.BAD_REQUEST, f"Scope must be one of {', '.join(SCOPES)}, not {scope!r}")
+        elif not isinstance(meta, list) or not all(isinstance(tag, str) for tag in meta):
+            self._error(HTTPStatus.BAD_REQUEST, "`meta` must be a list of strings")
+        else:
+            job = self.server.jobs.submit(path, scope, meta)
+            logger.info(f"Queued: {path.name} (job {job.id}, {scope})")
+            self._send(HTTPStatus.CREATED, job.to_dict())
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], jobs: JobQueue, roots: list[Path], token: str) -> None:
+        self.jobs = jobs
+        self.roots = roots
+        self.token: str | None = token
+        super().__init__(address, _Handler)
+
+        host, port = address[0], self.server_address[1]
+        names = LOOPBACK_NAMES if host in LOOPBACK else (f"[{host}]" if ":" in host else host,)
+        # Requests have to be addressed to the server itself, the port is left out for 80
+        self.hosts: set[str] | None = {f"{name}:{port}" for name in names}
+        if port == 80:
+            self.hosts.update(names)
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path, jobs: JobQueue, roots: list[Path]) -> None:
+        self.jobs = jobs
+        self.roots = roots
+        self.token: str | None = None
+        self.hosts: set[str] | None = None
+        # A socket left behind by a previous run would fail the bind
+        if path.is_socket():
+            path.unlink()
+        super().__init__(str(path), _Handler)
+        # Only the user running the server can connect, there's no token to stop anyone else
+        os.chmod(path, 0o600)
+
+
+class Runner:
+    """
+    Run the queued jobs of one scope through the ParPar -> Nyuu pipeline of a session, forever.
+
+    Attributes
+    ----------
+    session : JuicenetSession
+        Session the jobs are run with.
+    jobs : JobQueue
+        Queue the jobs are claimed from.
+    inflight : dict[str, Job]
+        Jobs that are being run, by path. Shared between runners so no two of them
+        generate par2 files for the same path at the same time.
+    lock : threading.Lock
+        Lock guarding `inflight`.
+    """
+
+    def __init__(
+        self, session: JuicenetSession, jobs: JobQueue, inflight: dict[str, Job], lock: threading.Lock
+    ) -> None:
+        self.session = session
+        self.jobs = jobs
+        self.inflight = inflight
+        self.lock = lock
+
+    def _claim(self) -> Iterator[Path]:
+        """
+        Yield the path of every job in the queue, waiting for new ones when it's empty
+        """
+        while True:
+            with self.lock:
+                job = self.jobs.claim(self.session.scope, exclude=self.inflight)
+                if job is not None:
+                    self.inflight[job.path] = job
+
+            if job is None:
+                self.jobs.wait(POLL_INTERVAL)
+                continue
+
+            # Whatever submitted the job has probably just written it, don't trust anything cached about it
+            clear_caches()
+            logger.info(f"Processing: {Path(job.path).name} (job {job.id})")
+            yield Path(job.path)
+
+    def _produce(self, file: Path) -> Generated:
+        try:
+            return self.session._generate(file)
+        except Exception as error:  # noqa: BLE001 - a failed job must not take the server down
+            return error
+
+    def _consume(self, file: Path, result: Generated) -> None:
+        with self.lock:
+            job = self.inflight[str(file)]
+
+        try:
+            if isinstance(result, Exception):
+                raise result
+
+            self.jobs.update(job.id, JobState.UPLOADING)
+            output = self.session._upload(file, *result, meta=job.meta)
+
+            if output.claimed:
+                # It may still fail over there, so this job didn't upload anything
+                logger.info(f"Skipping: {file.name} - Claimed by another process (job {job.id})")
+                self.jobs.update(job.id, JobState.FAILED, error="Claimed by another process")
+            elif output.skipped:
+                logger.info(f"Skipping: {file.name} - Already uploaded (job {job.id})")
+                self.jobs.update(job.id, JobState.DONE)
+            elif output.nyuu.success:
+                logger.success(f"{file.name} -> {output.nyuu.nzb} (job {job.id})")
+                self.jobs.update(job.id, JobState.DONE, nzb=str(output.nyuu.nzb))
+            else:
+                error = f"Nyuu exited with {output.nyuu.returncode}"
+                if output.nyuu.log:
+                    error += f", see {output.nyuu.log}"
+                logger.error(f"{file.name}: {error} (job {job.id})")
+                self.jobs.update(job.id, JobState.FAILED, error=error)
+
+        except Exception as error:  # noqa: BLE001 - a failed job must not take the server down
+            logger.error(f"{file.name}: {error} (job {job.id})")
+            self.jobs.update(job.id, JobState.FAILED, error=str(error) or type(error).__name__)
+
+        finally:
+            with self.lock:
+                del self.inflight[str(file)]
+
+    def run(self) -> None:
+        Pipeline(
+            produce=self._produce,
+            consume=self._consume,
+            lookahead=self.session.config.parpar_lookahead,
+            workers=self.session.providers.capacity,
+        ).run(self._claim())
+
+
+def get_token(config: JuicenetConfig) -> str:
+    """
+    Get the token clients have to send over TCP, from the config or `TOKEN_FILE` in the appdata directory.
+    A random one is generated and written there, readable only by the current user, if there's neither
+    """
+    if config.serve_token:
+        return config.serve_token
+
+    path = config.appdata_dir_path / TOKEN_FILE
+
+    if path.is_file():
+        return path.read_text(encoding="utf-8").strip()
+
+    token = secrets.token_urlsafe(32)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(token)
+
+    logger.info(f"Generated a token for clients in {path}")
+    return token
+
+
+def serve(
+    config: Path,
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    unix_socket: Path | None = None,
+    skip_raw: bool = False,
+    debug: bool = False,
+) -> None:
+    """
+    Accept upload jobs over HTTP and run them until interrupted.
+
+    Only paths inside `serve_roots` are accepted. Over TCP, clients have to send the token from `get_token()`
+    and address the server by the host it listens on. A unix socket is only protected by it's permissions.
+
+    Jobs are persisted in `juicenet.jobs.sqlite` in the appdata directory, so anything
+    that was queued or running when the previous server went away is picked up again.
+    Every scope gets it's own `JuicenetSession` and ParPar -> Nyuu pipeline.
+    """
+    level = "DEBUG" if debug else "INFO"
+    log = get_logger(logger=logger, level=level, sink=console)  # type: ignore
+
+    sessions = {}
+
+    try:
+        for scope in SCOPES:
+            sessions[scope] = JuicenetSession(
+                config=config,
+                public=scope == "public",
+                # Raw articles are reposted once below, not by both sessions
+                skip_raw=skip_raw or scope == "public",
+                debug=debug,
+            )
+    except FileNotFoundError as error:
+        log.error(f"No such file: {error.filename}")
+        sys.exit(1)
+    except ValidationError as errors:
+        log.error(f"{errors.error_count()} error(s) in config")
+        for err in errors.errors():
+            log.error(f"{err.get('loc')[0]}: {err.get('msg')}")
+        sys.exit(1)
+    except (json.JSONDecodeError, KeyError) as error:
+        log.error(f"Invalid Nyuu config: {error}")
+        sys.exit(1)
+
+    roots = sessions["private"].config.serve_roots
+    if not roots:
+        log.error("SERVE_ROOTS is empty, set it to the folders jobs are allowed to upload from")
+        sys.exit(1)
+
+    # Both scopes can run ParPar at the same time, so they split the CPUs and memory between them
+    for session in sessions.values():
+        if session.parpar.governor is not None:
+            session.parpar.governor.jobs = len(sessions)
+
+    jobs = JobQueue(sessions["private"].config.appdata_dir_path / "juicenet.jobs.sqlite")
+
+    requeued = jobs.requeue_interrupted()
+    if requeued:
+        log.info(f"Requeued {requeued} interrupted job(s)")
+
+    sessions["private"].repost_raw()
+
+    inflight: dict[str, Job] = {}
+    lock = threading.Lock()
+
+    for scope, session in sessions.items():
+        runner = Runner(session, jobs, inflight, lock)
+        threading.Thread(target=runner.run, name=f"juicenet-serve-{scope}", daemon=True).start()
+
+    server: _HTTPServer | _UnixHTTPServer
+    try:
+        if unix_socket is not None:
+            server = _UnixHTTPServer(unix_socket, jobs, roots)
+            log.info(f"Listening on {unix_socket}")
+        else:
+            server = _HTTPServer((host, port), jobs, roots, get_token(sessions["private"].config))
+            log.info(f"Listening on http://{host}:{port}")
+    except OSError as error:
+        log.error(f"Failed to listen: {error}")
+        sys.exit(1)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if unix_socket is not None and unix_socket.is_socket():
+            os.unlink(unix_socket)
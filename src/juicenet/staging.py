@@ -0,0 +1,188 @@
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from .par2cache import Par2Cache
+from .utils import scan_path
+
+# `-r`/`--recovery-slices` and `-s`/`--input-slices` style sizes, i.e, `10%`, `64`, `700k`, `1.5M`
+_SIZE_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([%bkmgt]?)$", re.IGNORECASE)
+
+_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+# Used when the recovery amount is an expression only ParPar itself can evaluate, i.e, `1n*1.2`.
+# Deliberately on the high side, since running out of space mid-run is a lot worse than waiting a bit
+FALLBACK_RECOVERY_RATIO = 0.2
+
+# par2 files also carry an index of checksums and packet headers on top of the recovery data
+PAR2_OVERHEAD_RATIO = 0.01
+PAR2_OVERHEAD_BYTES = 64 * 1024
+
+# How often waiting ParPar stages re-check free space, in case something else freed some
+POLL_INTERVAL = 5
+
+
+def _get_arg(args: list[str], short: str, long: str) -> Optional[str]:
+    """
+    Get the value of the last occurence of an argument, in any of the forms ParPar accepts
+    """
+    value = None
+
+    for i, arg in enumerate(args):
+        if arg in (short, long) and i + 1 < len(args):
+            value = args[i + 1]
+        elif arg.startswith(f"{long}="):
+            value = arg.split("=", 1)[1]
+        elif arg.startswith(short) and not arg.startswith("--") and len(arg) > len(short):
+            value = arg[len(short) :]
+
+    return value
+
+
+def estimate_par2_size(size: int, args: list[str]) -> int:
+    """
+    Estimate the total size of the par2 files ParPar generates for `size` bytes of input with `args`
+
+    Handles percentages (`-r10%`), sizes (`-r500M`), and slice counts (`-r64` along with `-s700k`).
+    Anything else falls back to `FALLBACK_RECOVERY_RATIO` of the input.
+    """
+    recovery = _get_arg(args, "-r", "--recovery-slices")
+    slice_size = _get_arg(args, "-s", "--input-slices")
+
+    estimate = size * FALLBACK_RECOVERY_RATIO
+
+    if recovery is not None and (match := _SIZE_PATTERN.match(recovery)):
+        amount, unit = float(match.group(1)), match.group(2).lower()
+
+        if unit == "%":
+            estimate = size * amount / 100
+        elif unit:
+            estimate = amount * _UNITS[unit]
+        elif slice_size is not None and (slice_match := _SIZE_PATTERN.match(slice_size)):
+            slice_unit = slice_match.group(2).lower()
+            if slice_unit and slice_unit != "%":
+                estimate = amount * float(slice_match.group(1)) * _UNITS[slice_unit]
+
+    return int(estimate + size * PAR2_OVERHEAD_RATIO + PAR2_OVERHEAD_BYTES)
+
+
+class Staging:
+    """
+    Admission controller for par2 sets in the working directory.
+
+    Before ParPar runs for a file, the size of it's par2 set is estimated and the next ParPar stage
+    is held back until the filesystem it writes to has enough free space for it, on top of `reserve` bytes
+    and the estimates of any par2 sets that are still being generated. Space is freed as uploads finish
+    and delete their par2 files.
+
+    If nothing else is in flight, nothing can free up space either, so the file is let through
+    with a warning instead of waiting forever.
+
+    With a par2 `cache`, failed uploads leave their par2 sets behind once they're released,
+    so every set in the cache also counts against it's `max_size`.
+
+    Attributes
+    ----------
+    args : list[str]
+        ParPar's arguments, used for estimating the par2 size.
+    workdir : Path, optional
+        Where the par2 files are generated. Next to the input file if `None`.
+    reserve : int
+        Number of bytes to always leave free.
+    cache : Par2Cache, optional
+        The cache the par2 files are generated in, if any.
+
+    Methods
+    -------
+    acquire(file: Path, args: Optional[list[str]] = None, related_files: Optional[list[Path]] = None) -> None
+        Wait until there's enough space to generate the par2 files for a file.
+    generated(file: Path) -> None
+        Mark the par2 files of a file as generated.
+    release(file: Path) -> None
+        Mark the par2 files of a file as uploaded (and deleted) or left in the cache.
+    """
+
+    def __init__(
+        self, args: list[str], workdir: Optional[Path], reserve: int = 0, cache: Optional[Par2Cache] = None
+    ) -> None:
+        self.args = args
+        self.workdir = workdir
+        self.reserve = reserve
+        self.cache = cache
+        self._condition = threading.Condition()
+        # par2 sets being generated (not on disk yet) and generated ones waiting to be uploaded
+        self._generating: dict[Path, int] = {}
+        self._staged: set[Path] = set()
+
+    def _free_space(self, file: Path) -> int:
+        path = self.workdir or file.parent
+
+        # The working directory is only created once ParPar needs it
+        while not path.exists() and path != path.parent:
+            path = path.parent
+
+        return shutil.disk_usage(path).free
+
+    def acquire(self, file: Path, args: Optional[list[str]] = None, related_files: Optional[list[Path]] = None) -> None:
+        """
+        Wait until there's enough space to generate the par2 files for a file,
+        estimated with the ParPar arguments it'll be generated with if they differ from `args`.
+        Nothing is generated if the cache already has a complete set for it, so it doesn't wait at all.
+        """
+        args = self.args if args is None else args
+
+        if self.cache is not None and self.cache.lookup(self.cache.key(file, related_files, args)) is not None:
+            return
+
+        needed = estimate_par2_size(scan_path(file).size, args)
+        waiting = False
+
+        with self._condition:
+            while True:
+                pending = sum(self._generating.values())
+                available = self._free_space(file) - pending - self.reserve
+
+                if self.cache is not None:
+                    # Sets left behind by failed uploads take up space until they're evicted
+                    available = min(available, self.cache.max_size - self.cache.size() - pending)
+
+                if available >= needed:
+                    break
+
+                if not self._generating and not self._staged:
+                    logger.warning(
+                        f"{file.name} needs about {needed} bytes of par2 files "
+                        f"but only {max(available, 0)} are available, continuing anyway"
+                    )
+                    break
+
+                if not waiting:
+                    logger.info(f"Waiting for {needed - available} bytes of free space for {file.name}")
+                    waiting = True
+
+                self._condition.wait(timeout=POLL_INTERVAL)
+
+            self._generating[file] = needed
+
+    def generated(self, file: Path) -> None:
+        """
+        Mark the par2 files of a file as generated, they're now reflected in the free space
+        """
+        with self._condition:
+            self._generating.pop(file, None)
+            self._staged.add(file)
+            self._condition.notify_all()
+
+    def release(self, file: Path) -> None:
+        """
+        Mark the par2 files of a file as done with, i.e, uploaded and deleted,
+        or left in the cache by a failed upload where they're counted by the cache's size
+        """
+        with self._condition:
+            self._generating.pop(file, None)
+            self._staged.discard(file)
+            self._condition.notify_all()
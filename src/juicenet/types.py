@@ -10,6 +10,36 @@ ArticleFilePath: TypeAlias = Path
 StrPath: TypeAlias = Union[Path, str]
 
 
+@dataclass(frozen=True)
+class PathInfo:
+    """
+    A class used to represent the result of walking and stat'ing a file or directory once.
+
+    Attributes
+    ----------
+    files : tuple[Path, ...]
+        Every regular file in the path, or just the path itself if it's a file.
+    size : int
+        Total size of all the files in bytes.
+    count : int
+        Number of entries (files and sub directories) in the path, `1` if it's a file.
+    non_empty : bool
+        `True` if at least one of the files is bigger than 0 bytes.
+    """
+
+    files: tuple[Path, ...]
+    """Every regular file in the path, or just the path itself if it's a file."""
+
+    size: int
+    """Total size of all the files in bytes."""
+
+    count: int
+    """Number of entries (files and sub directories) in the path, `1` if it's a file."""
+
+    non_empty: bool
+    """`True` if at least one of the files is bigger than 0 bytes."""
+
+
 @dataclass(order=True)
 class NyuuOutput:
     """
@@ -26,9 +56,13 @@ class NyuuOutput:
     returncode : int
         Nyuu's exit code.
     stdout : str
-        Nyuu's stdout.
+        The last `OUTPUT_TAIL_SIZE` characters of Nyuu's stdout.
     stderr : str
-        Nyuu's stderr.
+        The last `OUTPUT_TAIL_SIZE` characters of Nyuu's stderr.
+    log : Path, optional
+        Path to the log file with Nyuu's complete output or `None` if it wasn't logged.
+    attempts : int
+        Number of times the upload was attempted, see `NYUU_ATTEMPTS`.
 
     Notes
     -----
@@ -52,10 +86,16 @@ class NyuuOutput:
     """Nyuu's exit code."""
 
     stdout: str
-    """Nyuu's stdout."""
+    """The last `OUTPUT_TAIL_SIZE` characters of Nyuu's stdout."""
 
     stderr: str
-    """Nyuu's stderr."""
+    """The last `OUTPUT_TAIL_SIZE` characters of Nyuu's stderr."""
+
+    log: Optional[Path] = None
+    """Path to the log file with Nyuu's complete output or `None` if it wasn't logged."""
+
+    attempts: int = 1
+    """Number of times the upload was attempted, see `NYUU_ATTEMPTS`."""
 
 
 @dataclass(order=True)
@@ -74,9 +114,11 @@ class RawOutput:
     returncode : int
         Nyuu's exit code.
     stdout : str
-        Nyuu's stdout.
+        The last `OUTPUT_TAIL_SIZE` characters of Nyuu's stdout.
     stderr : str
-        Nyuu's stderr.
+        The last `OUTPUT_TAIL_SIZE` characters of Nyuu's stderr.
+    log : Path, optional
+        Path to the log file with Nyuu's complete output or `None` if it wasn't logged.
 
     Notes
     -----
@@ -100,10 +142,13 @@ class RawOutput:
     """Nyuu's exit code."""
 
     stdout: str
-    """Nyuu's stdout."""
+    """The last `OUTPUT_TAIL_SIZE` characters of Nyuu's stdout."""
 
     stderr: str
-    """Nyuu's stderr."""
+    """The last `OUTPUT_TAIL_SIZE` characters of Nyuu's stderr."""
+
+    log: Optional[Path] = None
+    """Path to the log file with Nyuu's complete output or `None` if it wasn't logged."""
 
 
 @dataclass(order=True)
@@ -126,9 +171,13 @@ class ParParOutput:
     returncode : int
         ParPar's exit code.
     stdout : str
-        ParPar's stdout.
+        The last `OUTPUT_TAIL_SIZE` characters of ParPar's stdout.
     stderr : str
-        ParPar's stderr.
+        The last `OUTPUT_TAIL_SIZE` characters of ParPar's stderr.
+    log : Path, optional
+        Path to the log file with ParPar's complete output or `None` if it wasn't logged.
+    cached : bool
+        `True` if the `PAR2` files were reused from the par2 cache instead of being generated.
     """
 
     par2files: list[PAR2FilePath]
@@ -150,10 +199,16 @@ class ParParOutput:
     """ParPar's exit code."""
 
     stdout: str
-    """ParPar's stdout."""
+    """The last `OUTPUT_TAIL_SIZE` characters of ParPar's stdout."""
 
     stderr: str
-    """ParPar's stderr."""
+    """The last `OUTPUT_TAIL_SIZE` characters of ParPar's stderr."""
+
+    log: Optional[Path] = None
+    """Path to the log file with ParPar's complete output or `None` if it wasn't logged."""
+
+    cached: bool = False
+    """`True` if the `PAR2` files were reused from the par2 cache instead of being generated."""
 
 
 @dataclass(order=True)
@@ -242,7 +297,9 @@ class JuiceBox:
         Dictionary where each key is an article and the value is `RawOutput` object.
         Empty if no articles were processed.
     skipped: bool
-        True if the upload process was skipped because the file was already uploaded
+        True if the upload process was skipped because the file was already uploaded or claimed by another process
+    claimed: bool
+        True if the upload process was skipped because another process has claimed the file
     """
 
     nyuu: NyuuOutput
@@ -255,4 +312,7 @@ class JuiceBox:
     """`RawOutput` object for any processed articles or `None` if not available."""
 
     skipped: bool
-    """True if the upload process was skipped because the file was already uploaded"""
+    """True if the upload process was skipped because the file was already uploaded or claimed by another process"""
+
+    claimed: bool = False
+    """True if the upload process was skipped because another process has claimed the file"""
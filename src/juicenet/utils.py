@@ -1,22 +1,53 @@
-import glob
+import fnmatch
+import os
+import re
+from bisect import bisect_left
+from functools import cache
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from loguru import logger
 from natsort import natsorted
 
-from .types import PAR2FilePath
+from .types import PAR2FilePath, PathInfo
+
+
+def get_extension_pattern(exts: list[str]) -> re.Pattern[str]:
+    """
+    Compile a pattern that matches filenames ending in any of the extensions, case-insensitively.
+    Extensions may be given with or without the leading dot.
+    """
+    return re.compile(
+        "|".join(fnmatch.translate(f"*.{ext.strip('.')}") for ext in exts),
+        flags=re.IGNORECASE,
+    )
 
 
 def get_files(path: Path, exts: list[str]) -> list[Path]:
     """
     Get all the files with the relevant extensions
+
+    The tree is walked exactly once no matter how many extensions
+    there are, and extensions are matched case-insensitively.
+    Like `Path.rglob()`, symlinked directories are not descended into.
     """
+    pattern = get_extension_pattern(exts)
+
     files = []
+    stack = [path]
 
-    for ext in exts:
-        matches = list(path.rglob(f"*.{ext.strip('.')}"))
-        files.extend(matches)
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:  # Not a directory or not accessible
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif pattern.match(entry.name) and entry.is_file():
+                    files.append(Path(entry.path))
 
     return natsorted(files)
 
@@ -34,6 +65,84 @@ def get_glob_matches(path: Path, patterns: list[str]) -> list[Path]:
     return natsorted(files)
 
 
+class DirectoryIndex:
+    """
+    Recursive listing of every file in a directory, built once and queried by filename prefix.
+
+    Looking up related files or `.par2` files used to glob the input's parent directory
+    for every single input, so a folder with a thousand episodes was rescanned a thousand times.
+    This lists it once and answers every lookup with a binary search over the sorted filenames.
+
+    Attributes
+    ----------
+    path : Path
+        The directory being indexed.
+
+    Methods
+    -------
+    find(prefix: str, pattern: str, *, recursive: bool = True) -> list[Path]
+        Find files whose name starts with `prefix` and whose remaining name matches the glob `pattern`.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+        entries = []
+        stack = [(path, True)]
+
+        while stack:
+            directory, top_level = stack.pop()
+
+            try:
+                listing = os.scandir(directory)
+            except OSError:  # Not a directory or not accessible
+                continue
+
+            with listing:
+                for entry in listing:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((Path(entry.path), False))
+                    elif entry.is_file():
+                        # Same case sensitivity rules as globbing on this platform
+                        entries.append((os.path.normcase(entry.name), Path(entry.path), top_level))
+
+        entries.sort(key=lambda entry: entry[0])
+        self._names = [name for name, _, _ in entries]
+        self._entries = entries
+
+    def find(self, prefix: str, pattern: str, *, recursive: bool = True) -> list[Path]:
+        """
+        Find files whose name starts with `prefix` (taken literally) and whose
+        remaining name matches the glob `pattern`.
+
+        `index.find(stem, "*.srt")` is equivalent to `path.rglob(f"{glob.escape(stem)}*.srt")`
+        and `index.find(name, ".vol*.par2", recursive=False)` is equivalent to
+        `path.glob(f"{glob.escape(name)}.vol*.par2")`, except only files are returned.
+        """
+        prefix = os.path.normcase(prefix)
+        matches = []
+
+        for i in range(bisect_left(self._names, prefix), len(self._names)):
+            name, file, top_level = self._entries[i]
+
+            if not name.startswith(prefix):
+                break
+
+            if (recursive or top_level) and fnmatch.fnmatch(name[len(prefix) :], pattern):
+                matches.append(file)
+
+        return matches
+
+
+@cache
+def get_directory_index(path: Path) -> DirectoryIndex:
+    """
+    Get the cached `DirectoryIndex` of a directory.
+    Use `get_directory_index.cache_clear()` to start over.
+    """
+    return DirectoryIndex(path)
+
+
 def get_related_files(file: Path, exts: list[str]) -> Optional[list[Path]]:
     """
     Sometimes releasers include unmuxed files
@@ -51,20 +160,21 @@ def get_related_files(file: Path, exts: list[str]) -> Optional[list[Path]]:
 
     # Grab all the files which share the exact name
     # BUT different suffix
+    index = get_directory_index(file.parent)
+
     for ext in exts:
-        matches = set(file.parent.rglob(f"{glob.escape(file.stem)}*.{ext.strip('.')}"))
+        matches = set(index.find(file.stem, f"*.{ext.strip('.')}"))
         matching_files.update(matches)
 
     # These often satisfy the above conditions
     # but we don't want them
     junk = [".nzb", ".par2", ".torrent"]
 
-    # Remove any items that aren't files or junk
+    # Remove any items that are junk, the index only ever has existing files
     filtered = {
         match
         for match in matching_files
-        if match.is_file()  # MUST be an existing file
-        and match.suffix.lower() not in junk  # Extension MUST NOT be in junk extensions
+        if match.suffix.lower() not in junk  # Extension MUST NOT be in junk extensions
         and match.name != file.name  # Filename MUST NOT be identical to input
     }
 
@@ -77,6 +187,79 @@ def get_related_files(file: Path, exts: list[str]) -> Optional[list[Path]]:
     return None
 
 
+def _find_discs(folder: Path, get_disc: Callable[[Path, list[os.DirEntry[str]]], Optional[Path]]) -> list[Path]:
+    """
+    Walk `folder` looking for discs.
+
+    `get_disc` is called with every directory and it's listing and returns
+    the disc it belongs to, if any. Nothing below a disc is walked, so the
+    (often huge) media files inside a disc are never listed or stat'ed.
+    """
+    discs = []
+    stack = [folder]
+
+    while stack:
+        directory = stack.pop()
+
+        try:
+            with os.scandir(directory) as listing:
+                entries = list(listing)
+        except OSError:  # Not a directory or not accessible
+            continue
+
+        disc = get_disc(directory, entries)
+
+        if disc is not None:
+            discs.append(disc)
+        else:
+            stack.extend(Path(entry.path) for entry in entries if entry.is_dir(follow_symlinks=False))
+
+    return discs
+
+
+def _get_bdmv_disc(directory: Path, entries: list[os.DirEntry[str]]) -> Optional[Path]:
+    """
+    A directory is a BDMV disc if it has a `BDMV/index.bdmv` file
+    """
+    for entry in entries:
+        if entry.name == "BDMV" and entry.is_dir() and os.path.isfile(os.path.join(entry.path, "index.bdmv")):
+            return directory
+
+    return None
+
+
+def _get_dvd_disc(directory: Path, entries: list[os.DirEntry[str]]) -> Optional[Path]:
+    """
+    A directory is a DVD disc if it has a `VIDEO_TS.{VOB,IFO,BUP}` file, either
+    directly inside it or inside a `VIDEO_TS` folder. Names are case-insensitive.
+    """
+    recognized_files = ("video_ts.vob", "video_ts.ifo", "video_ts.bup")
+    recognized_folder = "video_ts"
+
+    def is_recognized_file(entry: os.DirEntry[str]) -> bool:
+        return entry.name.casefold().strip() in recognized_files and entry.is_file()
+
+    for entry in entries:
+        if entry.name.casefold().strip() == recognized_folder and entry.is_dir():
+            try:
+                with os.scandir(entry.path) as listing:
+                    if any(is_recognized_file(item) for item in listing):
+                        # 'COWBOY_BEBOP_1/VIDEO_TS/VIDEO_TS.VOB' -> 'COWBOY_BEBOP_1'
+                        return directory
+            except OSError:
+                pass
+
+        elif is_recognized_file(entry):
+            if directory.name.casefold().strip() == recognized_folder:
+                # Only happens if we started walking from inside the 'VIDEO_TS' folder
+                # 'COWBOY_BEBOP_1/VIDEO_TS/VIDEO_TS.VOB' -> 'COWBOY_BEBOP_1'
+                return directory.parent
+            # 'COWBOY_BEBOP_1/VIDEO_TS.VOB' -> 'COWBOY_BEBOP_1'
+            return directory
+
+    return None
+
+
 def get_bdmv_discs(path: Path, patterns: list[str]) -> list[Path]:
     """
     Finds individual discs in BDMVs by looking for `BDMV/index.bdmv`
@@ -123,18 +306,20 @@ def get_bdmv_discs(path: Path, patterns: list[str]) -> list[Path]:
 
     """
 
-    bdmvs = []
+    discs: set[Path] = set()
 
     folders = get_glob_matches(path, patterns)
 
     for folder in folders:
         if folder.is_dir():
-            index = list(folder.rglob("BDMV/index.bdmv"))
-            for file in index:
-                bdmvs.append(file.parents[1])
-                logger.info(f"BDMV: {file.parents[1].relative_to(path)}")
+            discs.update(_find_discs(folder, _get_bdmv_disc))
 
-    return natsorted(bdmvs)
+    bdmvs = natsorted(discs)
+
+    for bdmv in bdmvs:
+        logger.info(f"BDMV: {bdmv.relative_to(path)}")
+
+    return bdmvs
 
 
 def get_dvd_discs(path: Path, patterns: list[str]) -> list[Path]:
@@ -151,35 +336,72 @@ def get_dvd_discs(path: Path, patterns: list[str]) -> list[Path]:
     patterns : list of str
         Glob patterns used to match candidate directories.
     """
-    recognized_files = ("video_ts.vob", "video_ts.ifo", "video_ts.bup")
-    recognized_folder = "video_ts"
-
-    dvds = []
+    discs: set[Path] = set()
 
     folders = get_glob_matches(path, patterns)
 
     for folder in folders:
         if folder.is_dir():
-            for file in folder.rglob("*"):
-                if file.is_file():
-                    filename = file.name.casefold().strip()
-                    if filename in recognized_files:
-                        parent = file.parent.name.casefold().strip()
-                        if parent == recognized_folder:
-                            # Assuming file = 'Cowboy.Bebop.1998.DVDR.NTSC.R4.LATiNO/COWBOY_BEBOP_1/VIDEO_TS/VIDEO_TS.VOB'
-                            # file.parent = 'Cowboy.Bebop.1998.DVDR.NTSC.R4.LATiNO/COWBOY_BEBOP_1/VIDEO_TS'
-                            # file.parent.parent = 'Cowboy.Bebop.1998.DVDR.NTSC.R4.LATiNO/COWBOY_BEBOP_1'
-                            dvd = file.parent.parent
-                            dvds.append(dvd)
-                            logger.info(f"DVD: {dvd.relative_to(path)}")
-                        else:
-                            # Assuming file = 'Cowboy.Bebop.1998.DVDR.NTSC.R4.LATiNO/COWBOY_BEBOP_1/VIDEO_TS.VOB'
-                            # file.parent = 'Cowboy.Bebop.1998.DVDR.NTSC.R4.LATiNO/COWBOY_BEBOP_1'
-                            dvd = file.parent
-                            dvds.append(dvd)
-                            logger.info(f"DVD: {dvd.relative_to(path)}")
-
-    return natsorted(dvds)
+            discs.update(_find_discs(folder, _get_dvd_disc))
+
+    dvds = natsorted(discs)
+
+    for dvd in dvds:
+        logger.info(f"DVD: {dvd.relative_to(path)}")
+
+    return dvds
+
+
+@cache
+def scan_path(path: Path) -> PathInfo:
+    """
+    Walk and stat a file or directory exactly once and cache the result
+
+    Directory inputs (BDMVs, DVDs) can have thousands of files and every
+    step (empty file filtering, resume checks) needs the same information,
+    so the tree is only walked the first time a path is seen.
+    Use `scan_path.cache_clear()` to start over.
+
+    Symlinked directories are counted but not descended into,
+    which is the same behaviour as `Path.rglob("*")`.
+    """
+
+    if path.is_file():
+        size = path.stat().st_size
+        return PathInfo(files=(path,), size=size, count=1, non_empty=size > 0)
+
+    files = []
+    size = 0
+    count = 0
+    non_empty = False
+    stack = [path]
+
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:  # Not a directory or not accessible
+            continue
+
+        with entries:
+            for entry in entries:
+                count += 1
+                if entry.is_file():
+                    entry_size = entry.stat().st_size
+                    files.append(Path(entry.path))
+                    size += entry_size
+                    non_empty = non_empty or entry_size > 0
+                elif entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+
+    return PathInfo(files=tuple(files), size=size, count=count, non_empty=non_empty)
+
+
+def clear_caches() -> None:
+    """
+    Forget everything that was cached about the filesystem (`scan_path` and `get_directory_index`)
+    """
+    scan_path.cache_clear()
+    get_directory_index.cache_clear()
 
 
 def get_file_info(file: Path) -> dict[str, str]:
@@ -192,16 +414,8 @@ def get_file_info(file: Path) -> dict[str, str]:
     these from a csv file
     """
 
-    if file.is_file():
-        size = str(file.stat().st_size)
-        count = "1"
-        return dict(name=file.name, size=size, count=count)
-
-    else:  # it's a directory
-        all_files = tuple(file.rglob("*"))
-        count = str(len(all_files))
-        size = str(sum(f.stat().st_size for f in all_files if f.is_file()))
-        return dict(name=file.name, size=size, count=count)
+    info = scan_path(file)
+    return dict(name=file.name, size=str(info.size), count=str(info.count))
 
 
 def filter_par2_files(files: list[Path]) -> list[Path]:
@@ -234,15 +448,9 @@ def filter_empty_files(files: list[Path]) -> list[Path]:
     filtered = []
 
     for file in files:
-        if file.is_file() and file.stat().st_size > 0:
+        if scan_path(file).non_empty:
             filtered.append(file)
 
-        elif file.is_dir():
-            for item in list(file.rglob("*")):
-                if item.is_file() and item.stat().st_size > 0:
-                    filtered.append(file)
-                    break
-
     return natsorted(filtered)
 
 
@@ -256,14 +464,13 @@ def map_file_to_pars(basedir: Optional[Path], files: list[Path]) -> dict[Path, l
 
     for file in files:
         parent = file.parent if basedir is None else basedir
+        index = get_directory_index(parent)
         par2_files = []
         # The first par2 file doesn't have the word `vol` in it
-        first_par2_file = parent / f"{file.name}.par2"
-        if first_par2_file.is_file():
-            par2_files.append(first_par2_file)
+        par2_files.extend(index.find(file.name, ".par2", recursive=False))
 
         # Rest of the par2 files strictly follow the `foobar.mkv.vol01+02.par2` naming scheme
-        par2_files.extend(list(parent.glob(f"{glob.escape(file.name)}.vol*.par2")))
+        par2_files.extend(index.find(file.name, ".vol*.par2", recursive=False))
         mapping[file] = natsorted(par2_files)
 
     return mapping
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import ctypes
+import json
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Callable
+
+from loguru import logger
+from pydantic import ValidationError
+
+from .api.session import JuicenetSession
+from .log import get_logger
+from .main import console
+from .types import JuiceBox
+from .utils import (
+    clear_caches,
+    filter_par2_files,
+    get_bdmv_discs,
+    get_dvd_discs,
+    get_extension_pattern,
+    get_files,
+    get_glob_matches,
+)
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+EVENT = struct.Struct("iIII")
+
+# Size of the (nested) signature of a file or folder: total size, newest mtime, and number of entries
+Signature = tuple[int, int, int]
+
+
+class _Inotify:
+    """
+    Minimal recursive inotify watch on a directory, through libc so it doesn't need any dependencies
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self._watches: dict[int, Path] = {}
+
+        try:
+            self.add(path)
+        except OSError:
+            self.close()
+            raise
+
+    def add(self, directory: Path) -> list[Path]:
+        """
+        Watch a directory and everything below it, returning every file already in there
+        """
+        files: list[Path] = []
+
+        for root, _, names in os.walk(directory):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, f"Failed to watch {root}: {os.strerror(errno)}")
+            self._watches[wd] = Path(root)
+            files.extend(Path(root) / name for name in names)
+
+        return files
+
+    def read(self, timeout: float) -> tuple[list[Path], list[Path], bool]:
+        """
+        Wait up to `timeout` seconds for changes and return the changed paths, the removed
+        (deleted or moved away) paths, and whether events were dropped because the kernel's queue overflowed
+        """
+        changed: list[Path] = []
+        removed: list[Path] = []
+        overflow = False
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed, removed, overflow
+
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                name = data[offset + EVENT.size : offset + EVENT.size + length].rstrip(b"\0")
+                offset += EVENT.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+
+                directory = self._watches.get(wd)
+                if directory is None:
+                    continue
+
+                path = directory / os.fsdecode(name)
+
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    removed.append(path)
+                    continue
+
+                changed.append(path)
+
+                if mask & IN_ISDIR:
+                    # Anything that landed in a new directory before it was watched would be missed otherwise
+                    try:
+                        changed.extend(self.add(path))
+                    except OSError as error:
+                        logger.warning(error)
+
+        return changed, removed, overflow
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _get_signature(path: Path) -> Signature | None:
+    """
+    Get the total size, newest mtime, and number of entries of a file or folder, or `None` if it's gone
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+
+    if not path.is_dir():
+        return stat.st_size, stat.st_mtime_ns, 1
+
+    size, mtime, count = 0, stat.st_mtime_ns, 0
+
+    for root, dirs, files in os.walk(path):
+        for name in files + dirs:
+            try:
+                stat = os.stat(os.path.join(root, name), follow_symlinks=False)
+            except OSError:
+                continue
+            size += stat.st_size if name in files else 0
+            mtime = max(mtime, stat.st_mtime_ns)
+            count += 1
+
+    return size, mtime, count
+
+
+class Watcher:
+    """
+    Watch a directory for new or changed inputs and yield them once they've settled.
+
+    inotify is used to notice changes where it's available, everything else (and inotify failing,
+    i.e, running out of watches) falls back to running `discover` every `interval` seconds.
+    Inputs are only yielded once their size and modification time haven't changed for `settle` seconds
+    and they're not empty, so files that are still being copied or downloaded are left alone.
+
+    Attributes
+    ----------
+    path : Path
+        Directory to watch.
+    discover : Callable[[], list[Path]]
+        Find every input in `path`, the same way a normal run would.
+    match : Callable[[Path], bool], optional
+        Check if a changed file is an input on it's own, so it doesn't need a full `discover`.
+        If `None`, any change runs `discover` again, which is what discs and globs need.
+    settle : float
+        Number of seconds an input has to stay unchanged before it's yielded.
+    interval : float
+        Number of seconds between checks.
+    poll : bool
+        Always poll instead of using inotify.
+
+    Methods
+    -------
+    stop() -> None
+        Stop watching, the iterator ends at the next check.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        discover: Callable[[], list[Path]],
+        match: Callable[[Path], bool] | None = None,
+        *,
+        settle: float = 30,
+        interval: float = 5,
+        poll: bool = False,
+    ) -> None:
+        self.path = path
+        self.discover = discover
+        self.match = match
+        self.settle = settle
+        self.interval = interval
+        self.poll = poll
+        self._stop = threading.Event()
+        # Inputs waiting to settle: their last signature and since when it's been unchanged
+        self._pending: dict[Path, tuple[Signature | None, float]] = {}
+        # Signature of every input when it was last yielded, so unchanged ones aren't yielded again.
+        # Inputs that are gone are dropped from it, so it only ever holds what's still in `path`.
+        self._yielded: dict[Path, Signature] = {}
+
+    def stop(self) -> None:
+        """
+        Stop watching, the iterator ends at the next check
+        """
+        self._stop.set()
+
+    def _get_inotify(self) -> _Inotify | None:
+        if self.poll or not sys.platform.startswith("linux"):
+            return None
+
+        try:
+            return _Inotify(self.path)
+        except (OSError, AttributeError) as error:
+            logger.warning(f"Falling back to polling every {self.interval}s, inotify is unavailable: {error}")
+            return None
+
+    def _add(self, paths: list[Path]) -> None:
+        for path in filter_par2_files(paths):
+            if path not in self._pending:
+                self._pending[path] = (None, time.monotonic())
+
+    def _discover(self) -> None:
+        """
+        Run `discover` and add everything it finds, forgetting yielded inputs that it no longer finds
+        """
+        paths = self.discover()
+        found = set(paths)
+        self._yielded = {path: signature for path, signature in self._yielded.items() if path in found}
+        self._add(paths)
+
+    def _forget(self, removed: list[Path]) -> None:
+        """
+        Forget yielded inputs that were deleted or moved away, along with everything below removed directories
+        """
+        for path in list(self._yielded):
+            if any(path == gone or path.is_relative_to(gone) for gone in removed) and not path.exists():
+                del self._yielded[path]
+
+    def _settled(self) -> list[Path]:
+        """
+        Check every pending input and return the ones that have settled
+        """
+        now = time.monotonic()
+        ready = []
+
+        for path, (previous, since) in list(self._pending.items()):
+            signature = _get_signature(path)
+
+            # Deleted or moved away, or nothing new since the last time
+            if signature is None or signature == self._yielded.get(path):
+                del self._pending[path]
+            elif signature != previous or signature[0] == 0:
+                self._pending[path] = (signature, now)
+            elif now - since >= self.settle:
+                del self._pending[path]
+                self._yielded[path] = signature
+                ready.append(path)
+
+        return ready
+
+    def __iter__(self) -> Iterator[Path]:
+        inotify = self._get_inotify()
+        logger.info(f"Watching {self.path} ({'inotify' if inotify else 'polling'})")
+
+        self._discover()
+
+        try:
+            while not self._stop.is_set():
+                if inotify is None:
+                    time.sleep(self.interval)
+                    self._discover()
+                else:
+                    changed, removed, overflow = inotify.read(self.interval)
+                    self._forget(removed)
+                    if overflow or ((changed or removed) and self.match is None):
+                        self._discover()
+                    elif self.match is not None:
+                        self._add([path for path in changed if path.is_file() and self.match(path)])
+
+                ready = self._settled()
+
+                if ready:
+                    # Things have changed on disk, so don't trust anything that was cached about it
+                    clear_caches()
+
+                for path in ready:
+                    logger.info(f"Queued: {path.name}")
+                    yield path
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+
+def watch(
+    path: Path,
+    config: Path,
+    *,
+    public: bool = False,
+    extensions: list[str] | None = None,
+    glob: list[str] | None = None,
+    bdmv: bool = False,
+    dvd: bool = False,
+    settle: float = 30,
+    interval: float = 5,
+    poll: bool = False,
+    skip_raw: bool = False,
+    no_resume: bool = False,
+    debug: bool = False,
+) -> None:
+    """
+    Watch `path` and upload new files or discs as they land, until interrupted.
+
+    The config, resume database, and ParPar and Nyuu setup are shared by every upload
+    through a single `JuicenetSession`, and inputs go through the same ParPar -> Nyuu pipeline as a normal run.
+    NZBs are sorted relative to `path`, like they are by `juicenet <path>`.
+    An input that fails, i.e, because it was removed after settling, is reported and the rest are still uploaded.
+    """
+    level = "DEBUG" if debug else "INFO"
+    log = get_logger(logger=logger, level=level, sink=console)  # type: ignore
+
+    try:
+        session = JuicenetSession(
+            config=config,
+            public=public,
+            bdmv_naming=bdmv or dvd,
+            resume=not no_resume,
+            skip_raw=skip_raw,
+            debug=debug,
+        )
+    except FileNotFoundError as error:
+        log.error(f"No such file: {error.filename}")
+        sys.exit(1)
+    except ValidationError as errors:
+        log.error(f"{errors.error_count()} error(s) in config")
+        for err in errors.errors():
+            log.error(f"{err.get('loc')[0]}: {err.get('msg')}")
+        sys.exit(1)
+    except (json.JSONDecodeError, KeyError) as error:
+        log.error(f"Invalid Nyuu config: {error}")
+        sys.exit(1)
+
+    exts = extensions or session.config.extensions
+
+    def discover() -> list[Path]:
+        # Disc discovery logs every disc it finds, which is just noise when it runs every few seconds
+        logger.disable("juicenet.utils")
+        try:
+            if bdmv:
+                return get_bdmv_discs(path, glob or ["*/"])
+            if dvd:
+                return get_dvd_discs(path, glob or ["*/"])
+            if glob:
+                return get_glob_matches(path, glob)
+            return get_files(path, exts)
+        finally:
+            logger.enable("juicenet.utils")
+
+    if bdmv or dvd or glob:
+        match = None
+    else:
+        pattern = get_extension_pattern(exts)
+        match = lambda file: bool(pattern.match(file.name))
+
+    def on_done(file: Path, output: JuiceBox) -> None:
+        if output.claimed:
+            log.info(f"Skipping: {file.name} - Claimed by another process")
+        elif output.skipped:
+            log.info(f"Skipping: {file.name} - Already uploaded")
+        elif output.nyuu.success:
+            log.success(f"{file.name} -> {output.nyuu.nzb}")
+        else:
+            log.error(file.name)
+
+    def on_error(file: Path, error: Exception) -> None:
+        log.error(f"{file.name}: {error}")
+
+    watcher = Watcher(path, discover, match, settle=settle, interval=interval, poll=poll)
+    session.upload_each(watcher, on_done, base=path, on_error=on_error)